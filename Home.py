@@ -1,6 +1,6 @@
 import streamlit as st
 from login_handler import login_page
-from rag_engine import RAGEngine
+from engine_registry import get_engine
 import os
 from dotenv import load_dotenv
 
@@ -25,38 +25,63 @@ if not st.session_state.logged_in or params.get("page") == ["login"]:
     login_page()
     st.stop()
 
-# Validasi API key
+# Validasi API key; dengan EMBEDDING_PROVIDER=local aplikasi tetap jalan tanpa key (hanya retrieval)
 openai_api_key = os.getenv("OPENAI_API_KEY")
+embedding_provider = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
 if not openai_api_key:
-    st.error("OPENAI_API_KEY tidak ditemukan di .env")
-    st.stop()
+    if embedding_provider != "local":
+        st.error("OPENAI_API_KEY tidak ditemukan di .env")
+        st.stop()
+    st.warning("OPENAI_API_KEY tidak ditemukan: pencarian dokumen tetap berjalan, tetapi chatbot tidak dapat membuat jawaban.")
+
+@st.cache_data(ttl=int(os.getenv("API_HEALTH_TTL", "600")), show_spinner=False)
+def cek_api_key(api_key: str) -> bool:
+    """Cek API key dengan satu panggilan embedding.
 
-try:
+    Hanya hasil sukses yang di-cache (lintas sesi, selama TTL); error dilempar
+    sehingga dicek ulang pada sesi berikutnya.
+    """
     from langchain.embeddings.openai import OpenAIEmbeddings
     embeddings = OpenAIEmbeddings(
         model="text-embedding-ada-002",
-        openai_api_key=openai_api_key
+        openai_api_key=api_key
     )
     test_embed = embeddings.embed_query("test")
     if not test_embed:
-        st.error("API key valid tetapi respons embedding tidak valid")
+        raise ValueError("API key valid tetapi respons embedding tidak valid")
+    return True
+
+if openai_api_key:
+    try:
+        cek_api_key(openai_api_key)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    except Exception as e:
+        st.error(f"API key tidak valid atau terjadi kesalahan: {e}")
         st.stop()
-except Exception as e:
-    st.error(f"API key tidak valid atau terjadi kesalahan: {e}")
-    st.stop()
 
 if "rag_engine" not in st.session_state:
-    st.session_state.rag_engine = RAGEngine(
+    # Engine dipakai bersama oleh semua sesi dalam proses ini
+    st.session_state.rag_engine = get_engine(
         persist_directory="chroma_db",
-        openai_api_key=openai_api_key
+        # Metadata dokumen disalin ke chunk index lama sekali per engine (saat warm-up)
+        docs_directory="railway_docs",
+        openai_api_key=openai_api_key,
+        loader_workers=int(os.getenv("RAG_LOADER_WORKERS", os.cpu_count() or 1)),
+        # Re-ranking cross-encoder lokal, aktifkan dengan RAG_RERANKER=1
+        use_reranker=os.getenv("RAG_RERANKER", "0") == "1",
+        # Embedding lokal: EMBEDDING_PROVIDER=local, EMBEDDING_BACKEND=torch|quantized|onnx
+        embedding_provider=embedding_provider,
+        embedding_threads=int(os.getenv("EMBEDDING_THREADS", "0")) or None,
+        embedding_backend=os.getenv("EMBEDDING_BACKEND", "torch")
     )
 
 if "db_initialized" not in st.session_state:
     if os.path.exists("chroma_db"):
         try:
             rag = st.session_state.get("rag_engine")
-            docs = rag.vectorstore.get()
-            document_count = len(docs.get("documents", []))
+            document_count = rag.get_collection_stats()["chunk_count"]
             st.session_state.db_initialized = document_count > 0
             if document_count > 0:
                 st.success(f"Database loaded with {document_count} document chunks")
@@ -0,0 +1,178 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+
+class AnswerCache:
+    """Cache jawaban berbasis kemiripan embedding pertanyaan.
+
+    Setiap entri menyimpan embedding pertanyaan, jawaban, dan formatted_sources.
+    Entri dihapus otomatis bila salah satu file sumbernya diindeks ulang atau dihapus.
+    scope (mis. filter metadata retrieval) memisahkan jawaban: lookup hanya
+    mencocokkan entri dengan scope yang sama.
+    """
+
+    def __init__(self, path: str = ":memory:", threshold: float = 0.95, max_entries: int = 1000):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                scope TEXT NOT NULL DEFAULT ''
+            )
+        ''')
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "scope" not in columns:
+            self._conn.execute("ALTER TABLE answers ADD COLUMN scope TEXT NOT NULL DEFAULT ''")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS answer_sources (
+                answer_id INTEGER NOT NULL,
+                source_file TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_sources_file ON answer_sources (source_file)")
+        self._conn.commit()
+
+        # Salinan embedding di memori; dimuat ulang bila database berubah (juga dari proses lain)
+        self._ids: List[int] = []
+        self._scopes = np.array([], dtype=object)
+        self._matrix: Optional[np.ndarray] = None
+        self._loaded_version = None
+
+    def _data_version(self):
+        return (self._conn.execute("PRAGMA data_version").fetchone()[0], self._conn.total_changes)
+
+    def _refresh(self) -> None:
+        version = self._data_version()
+        if version == self._loaded_version:
+            return
+        rows = self._conn.execute("SELECT id, embedding, scope FROM answers ORDER BY id").fetchall()
+        self._ids = [row[0] for row in rows]
+        self._scopes = np.array([row[2] for row in rows], dtype=object)
+        if rows:
+            matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = matrix / np.maximum(norms, 1e-12)
+        else:
+            self._matrix = None
+        self._loaded_version = version
+
+    def lookup(self, embedding: List[float], scope: str = "") -> Optional[Dict[str, Any]]:
+        """Cari jawaban untuk pertanyaan paling mirip di atas threshold, dalam scope yang sama."""
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+
+        with self._lock:
+            self._refresh()
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                return None
+            similarities = self._matrix @ (query / norm)
+            similarities[self._scopes != scope] = -np.inf
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                return None
+
+            answer_id = self._ids[best]
+            row = self._conn.execute(
+                "SELECT question, answer, sources FROM answers WHERE id=?", (answer_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE answers SET hits = hits + 1 WHERE id=?", (answer_id,))
+            self._conn.commit()
+            # Penghitung hits tidak mengubah embedding: jangan muat ulang matriks pada lookup berikutnya,
+            # kecuali proses lain ikut menulis (data_version berubah)
+            version = self._data_version()
+            if version[0] == self._loaded_version[0]:
+                self._loaded_version = version
+
+        return {
+            "question": row[0],
+            "result": row[1],
+            "formatted_sources": json.loads(row[2]),
+            "similarity": round(similarity, 4),
+        }
+
+    def store(self, question: str, embedding: List[float], answer: str, sources: List[Dict[str, Any]],
+              scope: str = "") -> None:
+        source_files = sorted({s.get("file") for s in sources if s.get("file")})
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute(
+                "INSERT INTO answers (question, embedding, answer, sources, created_at, scope) VALUES (?, ?, ?, ?, ?, ?)",
+                (question, array("f", embedding).tobytes(), answer, json.dumps(sources, ensure_ascii=False),
+                 time.time(), scope)
+            )
+            answer_id = cur.lastrowid
+            cur.executemany(
+                "INSERT INTO answer_sources (answer_id, source_file) VALUES (?, ?)",
+                [(answer_id, f) for f in source_files]
+            )
+            cur.execute("SELECT COUNT(*) FROM answers")
+            overflow = cur.fetchone()[0] - self.max_entries
+            if overflow > 0:
+                old_ids = [r[0] for r in cur.execute(
+                    "SELECT id FROM answers ORDER BY created_at LIMIT ?", (overflow,)
+                ).fetchall()]
+                self._delete_ids(cur, old_ids)
+            self._conn.commit()
+
+    def invalidate_sources(self, source_files: Iterable[str]) -> int:
+        """Hapus semua jawaban yang mengutip salah satu file ini."""
+        source_files = list(set(source_files))
+        if not source_files:
+            return 0
+        with self._lock:
+            cur = self._conn.cursor()
+            placeholders = ",".join("?" for _ in source_files)
+            answer_ids = [r[0] for r in cur.execute(
+                f"SELECT DISTINCT answer_id FROM answer_sources WHERE source_file IN ({placeholders})",
+                source_files
+            ).fetchall()]
+            self._delete_ids(cur, answer_ids)
+            self._conn.commit()
+        if answer_ids:
+            print(f"Answer cache: {len(answer_ids)} jawaban dihapus karena sumber berubah")
+        return len(answer_ids)
+
+    @staticmethod
+    def _delete_ids(cur: sqlite3.Cursor, answer_ids: List[int]) -> None:
+        for start in range(0, len(answer_ids), 500):
+            batch = answer_ids[start:start + 500]
+            placeholders = ",".join("?" for _ in batch)
+            cur.execute(f"DELETE FROM answers WHERE id IN ({placeholders})", batch)
+            cur.execute(f"DELETE FROM answer_sources WHERE answer_id IN ({placeholders})", batch)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("DELETE FROM answer_sources")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
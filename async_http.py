@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Satu ClientSession (connection pool keep-alive) per event loop
+_sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_session(limit: int = 100, keepalive_timeout: float = 30.0) -> aiohttp.ClientSession:
+    """Ambil ClientSession bersama untuk event loop yang sedang berjalan."""
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=limit, keepalive_timeout=keepalive_timeout)
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+def use_openai_session(session: Optional[aiohttp.ClientSession] = None) -> aiohttp.ClientSession:
+    """Arahkan panggilan async openai (acreate) di task ini ke session bersama.
+
+    openai.aiosession adalah ContextVar, jadi pengaturan ini hanya berlaku untuk
+    task saat ini beserta task turunannya. Tanpa ini, openai membuat session
+    baru (koneksi TLS baru) untuk setiap request.
+    """
+    import openai
+
+    session = session or get_session()
+    if openai.aiosession.get() is not session:
+        openai.aiosession.set(session)
+    return session
+
+
+async def close_sessions() -> None:
+    """Tutup session milik event loop saat ini (panggil sebelum loop ditutup)."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
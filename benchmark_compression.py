@@ -0,0 +1,106 @@
+"""Benchmark recall@k kompresi vektor flat index terhadap pencarian exact float32.
+
+Vektor diambil dari chroma_db (flat_index bila ada, selain itu collection Chroma).
+Sebagian chunk dipakai sebagai query (leave-one-out: chunk itu sendiri diabaikan),
+lalu hasil top-k tiap mode kompresi dibandingkan dengan top-k exact.
+
+Contoh:
+    python benchmark_compression.py --persist-directory chroma_db --queries 200
+"""
+import os
+import time
+import argparse
+from typing import List, Tuple
+
+import numpy as np
+
+from flat_vectorstore import FlatCollection
+from vector_compression import COMPRESSION_MODES
+
+
+def load_vectors(persist_directory: str, source: str = "auto", page_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+    flat_dir = os.path.join(persist_directory, "flat_index")
+    if source == "flat" or (source == "auto" and os.path.exists(os.path.join(flat_dir, "flat_index.db"))):
+        collection = FlatCollection(flat_dir)
+    else:
+        from langchain.vectorstores import Chroma
+        collection = Chroma(persist_directory=persist_directory)._collection
+
+    ids, vectors = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+        offset += len(page["ids"])
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def build_index(ids: List[str], vectors: np.ndarray, compression=None, pca_components=256,
+                rescore_factor=4) -> FlatCollection:
+    collection = FlatCollection(
+        compression=compression, pca_components=pca_components, rescore_factor=rescore_factor,
+        initial_capacity=len(ids), min_fit_rows=1,
+    )
+    for start in range(0, len(ids), 5000):
+        collection.upsert(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000])
+    return collection
+
+
+def search(collection: FlatCollection, queries: np.ndarray, query_ids: List[str], k: int) -> Tuple[List[List[str]], float]:
+    """Top-k per query tanpa chunk query itu sendiri; mengembalikan (hasil, ms per query)."""
+    found = []
+    start = time.perf_counter()
+    for query, query_id in zip(queries, query_ids):
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k + 1, include=[])
+        found.append([chunk_id for chunk_id in result["ids"][0] if chunk_id != query_id][:k])
+    return found, (time.perf_counter() - start) * 1000 / max(1, len(query_ids))
+
+
+def recall_at_k(truth: List[List[str]], found: List[List[str]]) -> float:
+    scores = [len(set(t) & set(f)) / len(t) for t, f in zip(truth, found) if t]
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall kompresi vektor (float16/int8/pca)")
+    parser.add_argument("--persist-directory", default="chroma_db", help="Folder chroma_db")
+    parser.add_argument("--source", choices=["auto", "flat", "chroma"], default="auto", help="Sumber vektor")
+    parser.add_argument("--queries", type=int, default=200, help="Jumlah chunk yang dipakai sebagai query")
+    parser.add_argument("--k", type=int, default=5, help="Recall@k")
+    parser.add_argument("--modes", default=",".join(COMPRESSION_MODES), help="Mode kompresi, dipisah koma")
+    parser.add_argument("--pca-components", type=int, default=256, help="Dimensi tujuan PCA")
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Kandidat yang diskor ulang = k x faktor")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ids, vectors = load_vectors(args.persist_directory, args.source)
+    if len(ids) <= args.k:
+        print(f"❌ Hanya {len(ids)} chunk, tidak cukup untuk benchmark recall@{args.k}.")
+        return
+    print(f"📦 {len(ids)} chunk, {vectors.shape[1]} dimensi ({vectors.shape[1] * 4} byte/vektor float32)")
+
+    rng = np.random.default_rng(args.seed)
+    picked = np.sort(rng.choice(len(ids), min(args.queries, len(ids)), replace=False))
+    queries, query_ids = vectors[picked], [ids[i] for i in picked]
+
+    exact = build_index(ids, vectors)
+    truth, exact_ms = search(exact, queries, query_ids, args.k)
+    print(f"{'mode':<10} {'recall@' + str(args.k):>9} {'tanpa skor ulang':>17} {'byte/vektor':>12} {'ms/query':>9}")
+    print(f"{'float32':<10} {1.0:>9.3f} {1.0:>17.3f} {vectors.shape[1] * 4:>12} {exact_ms:>9.2f}")
+
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        index = build_index(ids, vectors, mode, args.pca_components, args.rescore_factor)
+        found, ms = search(index, queries, query_ids, args.k)
+        index.rescore_factor = 1
+        coarse, _ = search(index, queries, query_ids, args.k)
+        codes = index._codes
+        bytes_per_vector = codes.shape[1] * codes.dtype.itemsize if codes is not None else vectors.shape[1] * 4
+        print(f"{mode:<10} {recall_at_k(truth, found):>9.3f} {recall_at_k(truth, coarse):>17.3f} "
+              f"{bytes_per_vector:>12} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import gzip
+import json
+import threading
+from collections import Counter
+from typing import Dict, Any, List
+
+from chat_log_store import SEGMENT_RE
+
+
+class ChatLogAggregator:
+    """Agregat jumlah pertanyaan, jawaban, dan feedback dari folder chat_logs.
+
+    Segmen event (chat_logs/events/*.jsonl) dibaca mulai dari offset byte
+    terakhir, jadi refresh() hanya memproses event baru. Log JSON lama disimpan
+    bersama mtime dan ukurannya dan hanya di-parse ulang bila berubah.
+    """
+
+    def __init__(self, log_folder: str = "chat_logs", state_path: str = None):
+        self.log_folder = log_folder
+        self.state_path = state_path or os.path.join(log_folder, ".monitoring_cache")
+        self._lock = threading.Lock()
+        self.events_dir = os.path.join(log_folder, "events")
+        state = self._load_state()
+        self._files: Dict[str, Dict[str, Any]] = state.get("files", {})
+        self._segments: Dict[str, Dict[str, Any]] = state.get("segments", {})
+        self.errors: Dict[str, str] = {}
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"files": self._files, "segments": self._segments}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Gagal menyimpan cache monitoring: {e}")
+
+    @staticmethod
+    def _parse_file(filename: str, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        questions = 0
+        answers = 0
+        feedback = Counter()
+        negatives = []
+        for i, item in enumerate(data):
+            if item.get("role") == "user":
+                questions += 1
+            elif item.get("role") == "assistant":
+                answers += 1
+                if item.get("feedback"):
+                    feedback[item.get("feedback")] += 1
+                    if item.get("feedback") == "NOT_OK":
+                        previous = data[i - 1] if i > 0 and data[i - 1].get("role") == "user" else {"content": "(tidak ditemukan)"}
+                        negatives.append({
+                            "file": filename,
+                            "timestamp": item.get("timestamp", "-"),
+                            "pertanyaan": previous.get("content"),
+                            "jawaban": item.get("content"),
+                            "sources": item.get("sources", [])
+                        })
+        return {"questions": questions, "answers": answers, "feedback": dict(feedback), "negatives": negatives}
+
+    def refresh(self) -> int:
+        """Baca ulang hanya file log yang berubah; kembalikan jumlah file yang di-parse."""
+        with self._lock:
+            try:
+                filenames = sorted(f for f in os.listdir(self.log_folder) if f.endswith(".json"))
+            except FileNotFoundError:
+                filenames = []
+
+            parsed = 0
+            changed = False
+            for filename in filenames:
+                filepath = os.path.join(self.log_folder, filename)
+                try:
+                    st = os.stat(filepath)
+                except OSError:
+                    continue
+                entry = self._files.get(filename)
+                if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                    continue
+                try:
+                    with open(filepath, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except Exception as e:
+                    self.errors[filename] = str(e)
+                    continue
+                self.errors.pop(filename, None)
+                self._files[filename] = {"mtime": st.st_mtime_ns, "size": st.st_size, **self._parse_file(filename, data)}
+                parsed += 1
+                changed = True
+
+            # File log yang sudah dihapus ikut keluar dari agregat
+            for filename in set(self._files) - set(filenames):
+                del self._files[filename]
+                changed = True
+
+            parsed += self._refresh_segments()
+            if changed or parsed:
+                self._save_state()
+            return parsed
+
+    @staticmethod
+    def _empty_entry() -> Dict[str, Any]:
+        return {"offset": 0, "done": False, "questions": 0, "answers": 0, "feedback": {}, "negatives": []}
+
+    def _refresh_segments(self) -> int:
+        """Proses event baru di tiap segmen; kembalikan jumlah segmen yang dibaca."""
+        try:
+            filenames = os.listdir(self.events_dir)
+        except FileNotFoundError:
+            return 0
+
+        paths = {}
+        for filename in filenames:
+            match = SEGMENT_RE.match(filename)
+            if match and (match.group(1) not in paths or not match.group(2)):
+                paths[match.group(1)] = os.path.join(self.events_dir, filename)
+
+        parsed = 0
+        for day in sorted(paths):
+            path = paths[day]
+            entry = self._segments.setdefault(day, self._empty_entry())
+            compressed = path.endswith(".gz")
+            if entry["done"] or (not compressed and os.path.getsize(path) == entry["offset"]):
+                continue
+            # Isi .gz identik dengan .jsonl aslinya, jadi offset tetap berlaku
+            opener = gzip.open if compressed else open
+            try:
+                with opener(path, "rb") as f:
+                    f.seek(entry["offset"])
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        entry["offset"] += len(line)
+                        try:
+                            self._apply_event(day, entry, json.loads(line))
+                        except ValueError:
+                            continue
+            except OSError as e:
+                self.errors[os.path.basename(path)] = str(e)
+                continue
+            entry["done"] = compressed
+            parsed += 1
+        return parsed
+
+    @staticmethod
+    def _apply_event(day: str, entry: Dict[str, Any], event: Dict[str, Any]) -> None:
+        if event.get("type") == "message":
+            if event.get("role") == "user":
+                entry["questions"] += 1
+            elif event.get("role") == "assistant":
+                entry["answers"] += 1
+        elif event.get("type") == "feedback" and event.get("feedback"):
+            value = event["feedback"]
+            entry["feedback"][value] = entry["feedback"].get(value, 0) + 1
+            if value == "NOT_OK":
+                entry["negatives"].append({
+                    "file": f"{event.get('username', '-')}_{day}",
+                    "timestamp": event.get("timestamp", "-"),
+                    "pertanyaan": event.get("question") or "(tidak ditemukan)",
+                    "jawaban": event.get("answer"),
+                    "sources": event.get("sources", [])
+                })
+
+    def totals(self) -> Dict[str, Any]:
+        """Jumlah total dari semua file: questions, answers, feedback (Counter), negatives."""
+        with self._lock:
+            feedback = Counter()
+            negatives = []
+            questions = answers = 0
+            entries = [self._files[f] for f in sorted(self._files)]
+            entries += [self._segments[d] for d in sorted(self._segments)]
+            for entry in entries:
+                questions += entry["questions"]
+                answers += entry["answers"]
+                feedback.update(entry["feedback"])
+                negatives.extend(entry["negatives"])
+            return {"questions": questions, "answers": answers, "feedback": feedback, "negatives": negatives}
@@ -0,0 +1,247 @@
+import os
+import re
+import gzip
+import json
+import atexit
+import threading
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Optional, Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: cukup kunci per proses
+    fcntl = None
+
+SEGMENT_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl(\.gz)?$")
+LEGACY_RE = re.compile(r"^(.+)_(\d{4}-\d{2}-\d{2})\.json$")
+
+DateLike = Union[str, date, None]
+
+
+def _to_day(value: DateLike) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+class ChatLogStore:
+    """Log chat append-only: satu segmen JSONL per hari di chat_logs/events/.
+
+    Setiap pesan dan setiap feedback ditulis sebagai satu event baru (tidak ada
+    penulisan ulang file). Event ditampung lalu ditulis per batch dengan O_APPEND
+    dan flock, sehingga beberapa tab atau proses bisa menulis bersamaan tanpa
+    saling menimpa. Segmen yang lebih tua dari kemarin dikompres menjadi .jsonl.gz.
+    """
+
+    def __init__(self, log_folder: str = "chat_logs", batch_size: int = 20, flush_interval: float = 1.0):
+        self.log_folder = log_folder
+        self.events_dir = os.path.join(log_folder, "events")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._last_day: Optional[str] = None
+        os.makedirs(self.events_dir, exist_ok=True)
+        atexit.register(self.flush)
+
+    # ---------- Penulisan ----------
+
+    def segment_path(self, day: str, compressed: bool = False) -> str:
+        return os.path.join(self.events_dir, f"{day}.jsonl" + (".gz" if compressed else ""))
+
+    def append(self, events: List[Dict[str, Any]]) -> None:
+        """Tampung event; ditulis saat batch penuh atau setelah flush_interval detik."""
+        now = datetime.now()
+        with self._lock:
+            for event in events:
+                event = dict(event)
+                event.setdefault("logged_at", now.isoformat())
+                self._buffer.append(event)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def log_message(self, message: Dict[str, Any], username: str, session_id: str) -> None:
+        event = {k: v for k, v in message.items() if k not in ("feedback", "feedback_timestamp")}
+        self.append([{"type": "message", "username": username, "session_id": session_id, **event}])
+
+    def log_feedback(self, message: Dict[str, Any], question: Optional[str], username: str, session_id: str) -> None:
+        """Feedback dicatat sebagai event tersendiri beserta salinan tanya-jawabnya."""
+        self.append([{
+            "type": "feedback",
+            "username": username,
+            "session_id": session_id,
+            "msg_id": message.get("msg_id"),
+            "feedback": message.get("feedback"),
+            "feedback_timestamp": message.get("feedback_timestamp"),
+            "timestamp": message.get("timestamp"),
+            "question": question,
+            "answer": message.get("content"),
+            "sources": message.get("sources", []),
+        }])
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+
+        by_day: Dict[str, List[str]] = {}
+        for event in self._buffer:
+            by_day.setdefault(event["logged_at"][:10], []).append(json.dumps(event, ensure_ascii=False) + "\n")
+
+        for day, lines in by_day.items():
+            payload = "".join(lines).encode("utf-8")
+            fd = os.open(self.segment_path(day), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    os.write(fd, payload)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        self._buffer = []
+
+        # Rotasi harian: saat hari berganti, segmen lama dikompres
+        today = max(by_day)
+        if self._last_day is not None and today != self._last_day:
+            self.compress_old_segments()
+        self._last_day = today
+
+    def compress_old_segments(self, keep_days: int = 1) -> int:
+        """Kompres segmen yang lebih tua dari `keep_days` hari; kembalikan jumlahnya."""
+        cutoff = (date.today() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+        compressed = 0
+        for filename in sorted(os.listdir(self.events_dir)):
+            match = SEGMENT_RE.match(filename)
+            if not match or match.group(2) or match.group(1) >= cutoff:
+                continue
+            source = os.path.join(self.events_dir, filename)
+            target = self.segment_path(match.group(1), compressed=True)
+            tmp_target = target + ".tmp"
+            try:
+                with open(source, "rb") as src, gzip.open(tmp_target, "wb") as dst:
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        dst.write(block)
+                os.replace(tmp_target, target)
+                os.remove(source)
+                compressed += 1
+            except OSError as e:
+                print(f"Gagal mengompres {filename}: {e}")
+        return compressed
+
+    # ---------- Pembacaan ----------
+
+    def segments(self, start_date: DateLike = None, end_date: DateLike = None) -> List[str]:
+        """Path segmen (terurut per hari) dalam rentang tanggal, termasuk yang terkompres."""
+        start, end = _to_day(start_date), _to_day(end_date)
+        found = {}
+        for filename in os.listdir(self.events_dir):
+            match = SEGMENT_RE.match(filename)
+            if not match:
+                continue
+            day = match.group(1)
+            if (start and day < start) or (end and day > end):
+                continue
+            # Jika versi .jsonl dan .gz sama-sama ada (kompresi terputus), pakai .jsonl
+            if day not in found or not match.group(2):
+                found[day] = os.path.join(self.events_dir, filename)
+        return [found[day] for day in sorted(found)]
+
+    @staticmethod
+    def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # baris terakhir belum selesai ditulis
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def read_messages(
+        self,
+        start_date: DateLike = None,
+        end_date: DateLike = None,
+        username: Optional[str] = None,
+        feedback: Optional[str] = None,
+        include_legacy: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Daftar pesan terurut waktu, dengan feedback terbaru sudah digabungkan.
+
+        Filter opsional: rentang tanggal (inklusif, "YYYY-MM-DD" atau date),
+        username, dan nilai feedback ("OK"/"NOT_OK"). Log JSON lama
+        (chat_logs/<user>_<tanggal>.json) ikut dibaca bila include_legacy.
+        """
+        self.flush()
+        start, end = _to_day(start_date), _to_day(end_date)
+        messages: List[Dict[str, Any]] = []
+        by_id: Dict[str, Dict[str, Any]] = {}
+
+        # Feedback bisa diberikan setelah tengah malam, jadi baca satu hari setelah end
+        feedback_end = (datetime.strptime(end, "%Y-%m-%d").date() + timedelta(days=1)) if end else None
+        for path in self.segments(start, feedback_end):
+            day = SEGMENT_RE.match(os.path.basename(path)).group(1)
+            for event in self.read_segment(path):
+                if username and event.get("username") != username:
+                    continue
+                if event.get("type") == "message":
+                    if end and day > end:
+                        continue
+                    message = {k: v for k, v in event.items() if k != "type"}
+                    message.setdefault("feedback", None)
+                    messages.append(message)
+                    if message.get("msg_id"):
+                        by_id[message["msg_id"]] = message
+                elif event.get("type") == "feedback" and event.get("msg_id") in by_id:
+                    by_id[event["msg_id"]]["feedback"] = event.get("feedback")
+                    by_id[event["msg_id"]]["feedback_timestamp"] = event.get("feedback_timestamp")
+
+        if include_legacy:
+            messages.extend(self._read_legacy(start, end, username))
+            messages.sort(key=lambda m: m.get("timestamp") or "")
+
+        if feedback is not None:
+            messages = [m for m in messages if m.get("feedback") == feedback]
+        return messages
+
+    def _read_legacy(self, start: Optional[str], end: Optional[str], username: Optional[str]) -> List[Dict[str, Any]]:
+        messages = []
+        try:
+            filenames = sorted(os.listdir(self.log_folder))
+        except FileNotFoundError:
+            return messages
+        for filename in filenames:
+            match = LEGACY_RE.match(filename)
+            if not match:
+                continue
+            user, day = match.groups()
+            if (username and user != username) or (start and day < start) or (end and day > end):
+                continue
+            try:
+                with open(os.path.join(self.log_folder, filename), "r", encoding="utf-8") as f:
+                    history = json.load(f)
+            except Exception as e:
+                print(f"Gagal membaca log lama {filename}: {e}")
+                continue
+            for item in history:
+                messages.append({"username": user, "session_id": None, **item})
+        return messages
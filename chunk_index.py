@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Iterable, Tuple
+
+
+class ChunkIndex:
+    """Peta chunk_id -> id Chroma di SQLite agar satu chunk bisa diambil tanpa scan collection."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                id TEXT NOT NULL,
+                source_file TEXT
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_index_source ON chunks (source_file)")
+        self._conn.commit()
+
+    def add(self, rows: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+        """Simpan baris (chunk_id, id, source_file); chunk_id yang sama ditimpa."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, id, source_file) VALUES (?, ?, ?)", list(rows)
+            )
+            self._conn.commit()
+
+    def get_id(self, chunk_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM chunks WHERE chunk_id=?", (chunk_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete_source(self, source_file: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE source_file=?", (source_file,))
+            self._conn.commit()
+
+    def delete_ids(self, ids: List[str]) -> None:
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
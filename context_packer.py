@@ -0,0 +1,132 @@
+import math
+from typing import List, Dict, Any, Tuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+
+class TokenCounter:
+    """Hitung token dengan tiktoken; bila encoding tidak tersedia (mis. offline), pakai estimasi karakter."""
+
+    def __init__(self, model_name: str = "gpt-3.5-turbo", chars_per_token: float = 3.0):
+        self.model_name = model_name
+        self.chars_per_token = chars_per_token
+        self._encoding = None
+        self._loaded = False
+
+    def _get_encoding(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.model_name)
+            except Exception as e:
+                print(f"tiktoken tidak tersedia ({e}), jumlah token diestimasi dari panjang teks")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return encoding.decode(encoding.encode(text)[:max_tokens])
+        return text[:int(max_tokens * self.chars_per_token)]
+
+
+def _suffix_prefix_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Panjang terpanjang k sehingga akhir `left` sama dengan awal `right` (minimal 20 karakter)."""
+    for k in range(min(max_overlap, len(left), len(right)), 19, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class ContextPacker:
+    """Susun konteks prompt dalam batas token.
+
+    Chunk dari file dan halaman yang sama yang tumpang tindih (overlap splitter)
+    digabung tanpa mengulang teks, chunk yang isinya sudah termuat dibuang, lalu
+    potongan diisi berurutan menurut peringkat retrieval sampai token_budget.
+    """
+
+    def __init__(self, token_budget: int = 1500, model_name: str = "gpt-3.5-turbo",
+                 separator: str = "\n\n", max_overlap: int = 400, min_tokens: int = 50):
+        self.token_budget = token_budget
+        self.separator = separator
+        self.max_overlap = max_overlap
+        self.min_tokens = min_tokens
+        self.counter = TokenCounter(model_name)
+
+    def _merge_groups(self, docs_and_scores: List[Tuple["Document", float]]) -> List[Dict[str, Any]]:
+        """Gabungkan chunk bertetangga per (file, halaman); peringkat grup = peringkat anggota terbaik."""
+        by_page: Dict[Tuple[Any, Any], List[Tuple[int, "Document", float]]] = {}
+        for rank, (doc, score) in enumerate(docs_and_scores):
+            key = (doc.metadata.get("source_file"), doc.metadata.get("page"))
+            by_page.setdefault(key, []).append((rank, doc, score))
+
+        groups = []
+        for members in by_page.values():
+            members.sort(key=lambda m: (m[1].metadata.get("start_index") is None, m[1].metadata.get("start_index") or 0, m[0]))
+            current = None
+            for rank, doc, score in members:
+                text = doc.page_content or ""
+                if current is not None:
+                    overlap = _suffix_prefix_overlap(current["text"], text, self.max_overlap)
+                    if overlap:
+                        current["text"] += text[overlap:]
+                        current["members"].append((doc, score))
+                        current["rank"] = min(current["rank"], rank)
+                        continue
+                current = {"text": text, "members": [(doc, score)], "rank": rank}
+                groups.append(current)
+        groups.sort(key=lambda g: g["rank"])
+        return groups
+
+    def pack(self, docs_and_scores: List[Tuple["Document", float]]) -> Tuple[str, List[Tuple["Document", float]], Dict[str, Any]]:
+        """Kembalikan (konteks, chunk yang terpakai, laporan)."""
+        groups = self._merge_groups(docs_and_scores)
+        separator_tokens = self.counter.count(self.separator)
+
+        pieces: List[str] = []
+        used: List[Tuple["Document", float]] = []
+        seen_text: List[str] = []
+        total = 0
+        report = {"budget": self.token_budget, "chunks_in": len(docs_and_scores), "merged": 0,
+                  "duplicates_dropped": 0, "dropped": 0, "truncated": False}
+
+        for group in groups:
+            normalized = _normalize(group["text"])
+            if any(normalized in other for other in seen_text):
+                report["duplicates_dropped"] += len(group["members"])
+                continue
+
+            text = group["text"]
+            cost = self.counter.count(text) + (separator_tokens if pieces else 0)
+            remaining = self.token_budget - total
+            if cost > remaining:
+                # Potong kelompok terbaik yang masih muat sebagian, sisanya dilewati
+                available = remaining - (separator_tokens if pieces else 0)
+                if available < self.min_tokens:
+                    report["dropped"] += len(group["members"])
+                    continue
+                text = self.counter.truncate(text, available)
+                cost = self.counter.count(text) + (separator_tokens if pieces else 0)
+                report["truncated"] = True
+
+            pieces.append(text)
+            seen_text.append(normalized)
+            used.extend(group["members"])
+            report["merged"] += len(group["members"]) - 1
+            total += cost
+
+        report["tokens"] = total
+        report["chunks_used"] = len(used)
+        return self.separator.join(pieces), used, report
@@ -1,21 +1,111 @@
 # context_refiner.py
 
+import re
+import asyncio
+import functools
+
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, AIMessage
 
-def refine_question_with_history(history: list, new_question: str, model_name="gpt-3.5-turbo", temperature=0.2) -> str:
+from async_http import use_openai_session
+
+# Kata yang merujuk ke percakapan sebelumnya; pertanyaan tanpa kata ini dianggap berdiri sendiri.
+# "itu"/"ini" tidak termasuk karena dipakai di pertanyaan biasa ("Apa itu PPKA?"); keduanya
+# hanya dianggap rujukan di akhir pertanyaan ("sistem itu?", "aturan ini")
+_REFERRING_WORDS = {
+    "tersebut", "tadi", "sebelumnya", "diatas", "dia", "mereka",
+    "beliau", "nya", "lainnya", "selanjutnya", "berikutnya", "sana", "situ",
+}
+_TRAILING_REFERENCES = {"itu", "ini"}
+# Kata tanya dan pengisi: pertanyaan pendek yang hanya berisi kata ini ("Kenapa?",
+# "Jelaskan lebih lanjut") tidak punya topik sendiri
+_FILLER_WORDS = {
+    "apa", "apakah", "siapa", "kapan", "dimana", "mana", "mengapa", "kenapa", "bagaimana", "gimana",
+    "berapa", "yang", "itu", "ini", "adalah", "maksud", "dimaksud", "dengan", "lagi", "juga", "sama",
+    "jelaskan", "lebih", "lanjut", "detail", "contoh", "contohnya", "tolong", "bisa", "dong", "ya",
+}
+_CONTINUATION_STARTS = ("dan ", "atau ", "lalu ", "terus ", "kalau ", "kalo ", "bagaimana dengan ",
+                        "gimana dengan ", "trus ", "jadi ", "lantas ", "kemudian ")
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+
+def needs_refinement(history: list, new_question: str, min_words: int = 4) -> bool:
+    """Heuristik lokal: apakah pertanyaan perlu diperjelas dengan konteks percakapan.
+
+    Giliran pertama tidak pernah perlu. Selain itu perlu bila pertanyaan pendek tanpa
+    topik sendiri, diawali kata sambung ("kalau ...", "bagaimana dengan ..."), memakai
+    kata rujukan seperti "tersebut", "tadi", akhiran "-nya", atau diakhiri "itu"/"ini".
+    """
+    if not any(msg.get("role") == "assistant" for msg in history):
+        return False
+
+    text = " ".join(new_question.lower().split())
+    words = _WORD_RE.findall(text)
+    if not words:
+        return True
+    if len(words) < min_words and all(word in _FILLER_WORDS for word in words):
+        return True
+    if text.startswith(_CONTINUATION_STARTS):
+        return True
+    if words[-1] in _TRAILING_REFERENCES and len(words) > 1 and words[-2] not in _FILLER_WORDS:
+        return True
+    for word in words:
+        if word in _REFERRING_WORDS:
+            return True
+        if word.endswith("nya") and len(word) > 5:
+            return True
+    return False
+
+
+@functools.lru_cache(maxsize=4)
+def _get_llm(model_name: str, temperature: float) -> ChatOpenAI:
+    # Klien dibuat sekali per model, bukan setiap giliran chat
+    return ChatOpenAI(model_name=model_name, temperature=temperature)
+
+
+def refine_question_with_history(history: list, new_question: str, model_name="gpt-3.5-turbo", temperature=0.2,
+                                 force: bool = False) -> str:
     """
     Mengubah pertanyaan pengguna menjadi pertanyaan lengkap berdasarkan konteks chat sebelumnya.
-    
+
     Args:
         history (list): Riwayat chat berupa list of dict (role, content).
         new_question (str): Pertanyaan terbaru dari pengguna.
         model_name (str): Nama model LLM yang digunakan.
         temperature (float): Temperatur kreativitas LLM.
+        force (bool): Tetap panggil LLM walaupun needs_refinement() bilang tidak perlu.
 
     Returns:
         str: Pertanyaan yang telah diperjelas konteksnya.
     """
+    if not force and not needs_refinement(history, new_question):
+        return new_question
+
+    llm = _get_llm(model_name, temperature)
+    response = llm(_build_messages(history, new_question))
+    return response.content.strip()
+
+
+async def arefine_question_with_history(history: list, new_question: str, model_name="gpt-3.5-turbo",
+                                        temperature=0.2, force: bool = False, timeout: float = 15.0) -> str:
+    """Versi async refine_question_with_history dengan session HTTP bersama.
+
+    Bila LLM tidak menjawab dalam `timeout` detik, pertanyaan asli dipakai apa adanya.
+    """
+    if not force and not needs_refinement(history, new_question):
+        return new_question
+
+    use_openai_session()
+    llm = _get_llm(model_name, temperature)
+    try:
+        response = await asyncio.wait_for(llm.apredict_messages(_build_messages(history, new_question)), timeout)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Refine pertanyaan melewati {timeout} detik, memakai pertanyaan asli")
+        return new_question
+    return response.content.strip()
+
+
+def _build_messages(history: list, new_question: str) -> list:
     messages = []
 
     # Gunakan hanya 3 interaksi terakhir (6 pesan: 3 user + 3 assistant)
@@ -31,6 +121,4 @@ Tolong ubah pertanyaan ini menjadi versi lengkap yang lebih jelas berdasarkan ko
 Jangan tambahkan penjelasan tambahan. Jika pertanyaan baru oleh pengguna di luar konteks percakapan sebelumnya, maka kembalikan ulang pertanyaan pengguna. Hanya berikan satu kalimat pertanyaan lengkap saja sebagai output.
 """))
 
-    llm = ChatOpenAI(model_name=model_name, temperature=temperature)
-    response = llm(messages)
-    return response.content.strip()
+    return messages
@@ -0,0 +1,226 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from document_meta import document_metadata, read_document_metadata
+
+# Sama dengan pemisah kata tokenizer unicode61 (garis bawah juga pemisah)
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fts5_available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class DocumentCatalog:
+    """Katalog dokumen di railway_docs (nama file + isi .meta.json) dalam SQLite.
+
+    Halaman Lihat Dokumen cukup satu query per rerun (pencarian, filter jenis, dan
+    paginasi) tanpa os.listdir dan tanpa membaca setiap .meta.json. Upload, edit
+    metadata, dan hapus dokumen memperbarui katalog; sync() menyamakan dengan isi
+    folder bila file diubah dari luar aplikasi. Pencarian memakai FTS5 (peringkat
+    BM25, nama file berbobot lebih tinggi) dan jatuh ke pencarian potongan teks (LIKE)
+    bila FTS5 tidak ada atau tidak menemukan apa pun.
+    """
+
+    def __init__(self, path: str = "document_catalog.db", name_weight: float = 5.0):
+        self.path = path
+        self.name_weight = name_weight
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                filename TEXT PRIMARY KEY,
+                jenis_dokumen TEXT NOT NULL,
+                deskripsi TEXT NOT NULL,
+                upload_by TEXT NOT NULL,
+                upload_at TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                meta_mtime_ns INTEGER NOT NULL
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_jenis ON documents (jenis_dokumen, filename)")
+        self.use_fts = _fts5_available(self._conn)
+        if self.use_fts:
+            # rowid sama dengan rowid di tabel documents
+            self._conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts
+                USING fts5(filename, deskripsi, tokenize='unicode61 remove_diacritics 2')
+            ''')
+        self._conn.commit()
+
+    # ---------- Penulisan ----------
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[int, int, int]:
+        stat = os.stat(path)
+        meta_path = path + ".meta.json"
+        meta_mtime = os.stat(meta_path).st_mtime_ns if os.path.exists(meta_path) else 0
+        return stat.st_size, stat.st_mtime_ns, meta_mtime
+
+    def _upsert(self, cur: sqlite3.Cursor, path: str, metadata: Optional[Dict[str, Any]]) -> None:
+        filename = os.path.basename(path)
+        fields = read_document_metadata(path) if metadata is None else document_metadata(metadata)
+        size, mtime_ns, meta_mtime_ns = self._stat(path)
+        cur.execute('''
+            INSERT INTO documents (filename, jenis_dokumen, deskripsi, upload_by, upload_at, size, mtime_ns, meta_mtime_ns)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+                jenis_dokumen=excluded.jenis_dokumen, deskripsi=excluded.deskripsi,
+                upload_by=excluded.upload_by, upload_at=excluded.upload_at,
+                size=excluded.size, mtime_ns=excluded.mtime_ns, meta_mtime_ns=excluded.meta_mtime_ns
+        ''', (filename, fields["jenis_dokumen"], fields["deskripsi"], fields["upload_by"], fields["upload_at"],
+              size, mtime_ns, meta_mtime_ns))
+        if self.use_fts:
+            rowid = cur.execute("SELECT rowid FROM documents WHERE filename=?", (filename,)).fetchone()[0]
+            cur.execute("DELETE FROM documents_fts WHERE rowid=?", (rowid,))
+            cur.execute("INSERT INTO documents_fts (rowid, filename, deskripsi) VALUES (?, ?, ?)",
+                        (rowid, filename, fields["deskripsi"]))
+
+    def _remove(self, cur: sqlite3.Cursor, filename: str) -> bool:
+        row = cur.execute("SELECT rowid FROM documents WHERE filename=?", (filename,)).fetchone()
+        if row is None:
+            return False
+        if self.use_fts:
+            cur.execute("DELETE FROM documents_fts WHERE rowid=?", (row[0],))
+        cur.execute("DELETE FROM documents WHERE filename=?", (filename,))
+        return True
+
+    def upsert(self, path: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Tambah atau perbarui satu dokumen; metadata default dibaca dari <path>.meta.json."""
+        with self._lock:
+            cur = self._conn.cursor()
+            self._upsert(cur, path, metadata)
+            self._conn.commit()
+
+    def remove(self, filename: str) -> bool:
+        with self._lock:
+            removed = self._remove(self._conn.cursor(), os.path.basename(filename))
+            self._conn.commit()
+            return removed
+
+    def sync(self, directory: str) -> Dict[str, int]:
+        """Samakan katalog dengan isi folder; hanya file yang ukuran/mtime-nya berubah dibaca ulang."""
+        current = {}
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.endswith(".meta.json"):
+                        current[entry.name] = entry.path
+
+        summary = {"updated": 0, "removed": 0, "unchanged": 0}
+        with self._lock:
+            cur = self._conn.cursor()
+            known = {
+                row[0]: tuple(row[1:])
+                for row in cur.execute("SELECT filename, size, mtime_ns, meta_mtime_ns FROM documents")
+            }
+            for filename in sorted(set(known) - set(current)):
+                self._remove(cur, filename)
+                summary["removed"] += 1
+            for filename, path in sorted(current.items()):
+                try:
+                    if known.get(filename) == self._stat(path):
+                        summary["unchanged"] += 1
+                        continue
+                    self._upsert(cur, path, None)
+                    summary["updated"] += 1
+                except FileNotFoundError:
+                    # Terhapus di tengah sinkronisasi
+                    self._remove(cur, filename)
+            self._conn.commit()
+        if summary["updated"] or summary["removed"]:
+            print(f"Katalog {directory}: {summary['updated']} diperbarui, {summary['removed']} dihapus")
+        return summary
+
+    # ---------- Pembacaan ----------
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def _select(self, source: str, conditions: List[str], params: List[Any], order: str, limit: int,
+                offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM {source} {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT d.filename, d.jenis_dokumen, d.deskripsi, d.upload_by, d.upload_at, d.size "
+                f"FROM {source} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        columns = ("filename", "jenis_dokumen", "deskripsi", "upload_by", "upload_at", "size")
+        return [dict(zip(columns, row)) for row in rows], total
+
+    def search(self, query: str = "", jenis_dokumen: Optional[str] = None, limit: int = 20,
+               offset: int = 0, extensions: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Cari dokumen menurut nama file/deskripsi; mengembalikan (satu halaman hasil, total cocok).
+
+        Setiap kata query dicocokkan sebagai awalan (semua kata harus ada) dan diurutkan
+        menurut peringkat BM25. Bila tidak ada yang cocok, query dicari sebagai potongan
+        teks biasa ("ahun", "69_ta") seperti pencarian lama. Tanpa query hasil diurutkan
+        menurut nama file. extensions membatasi akhiran nama file, mis. (".pdf", ".txt").
+        """
+        conditions, params = [], []
+        if jenis_dokumen:
+            conditions.append("d.jenis_dokumen = ?")
+            params.append(jenis_dokumen)
+        if extensions:
+            conditions.append("(" + " OR ".join("lower(d.filename) LIKE ? ESCAPE '\\'" for _ in extensions) + ")")
+            params.extend("%" + _escape_like(ext.lower()) for ext in extensions)
+
+        text = " ".join((query or "").lower().split())
+        if not text:
+            return self._select("documents d", conditions, params, "d.filename", limit, offset)
+
+        words = _WORD_RE.findall(text)
+        if words and self.use_fts:
+            found = self._select(
+                "documents_fts f JOIN documents d ON d.rowid = f.rowid",
+                conditions + ["documents_fts MATCH ?"],
+                params + [" AND ".join('"' + word.replace('"', '""') + '"*' for word in words)],
+                f"bm25(documents_fts, {float(self.name_weight)}, 1.0), d.filename", limit, offset
+            )
+            if found[1]:
+                return found
+
+        pattern = "%" + _escape_like(text) + "%"
+        return self._select(
+            "documents d",
+            conditions + ["(lower(d.filename) LIKE ? ESCAPE '\\' OR lower(d.deskripsi) LIKE ? ESCAPE '\\')"],
+            params + [pattern, pattern], "d.filename", limit, offset
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_catalogs: Dict[str, DocumentCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path: str = "document_catalog.db", docs_directory: str = "railway_docs") -> DocumentCatalog:
+    """Katalog bersama untuk path ini, dibuat (dan disamakan dengan docs_directory) sekali per proses."""
+    key = os.path.abspath(path)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = DocumentCatalog(path)
+            catalog.sync(docs_directory)
+            _catalogs[key] = catalog
+        return catalog
@@ -0,0 +1,35 @@
+"""Metadata dokumen dari sidecar <file>.meta.json.
+
+Modul kecil tanpa dependensi berat agar bisa dipakai rag_engine maupun document_catalog
+(halaman daftar dokumen tidak perlu mengimpor engine RAG).
+"""
+import os
+import json
+from typing import Any, Dict, Optional
+
+
+# Field .meta.json yang disalin ke setiap chunk sehingga bisa dipakai sebagai filter retrieval
+DOCUMENT_METADATA_FIELDS = ("jenis_dokumen", "upload_by", "upload_at", "deskripsi")
+DEFAULT_DOCUMENT_TYPE = "Umum"
+RESTRICTED_DOCUMENT_TYPE = "Rahasia"
+
+
+def document_metadata(metadata: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Ambil field metadata dokumen (string, tanpa None) dari isi .meta.json."""
+    metadata = metadata or {}
+    fields = {field: str(metadata.get(field) or "") for field in DOCUMENT_METADATA_FIELDS}
+    fields["jenis_dokumen"] = fields["jenis_dokumen"] or DEFAULT_DOCUMENT_TYPE
+    return fields
+
+
+def read_document_metadata(path: str) -> Dict[str, str]:
+    """Baca sidecar <file>.meta.json; file tanpa sidecar dianggap dokumen Umum."""
+    meta_path = path + ".meta.json"
+    data = {}
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read metadata {meta_path}: {e}")
+    return document_metadata(data)
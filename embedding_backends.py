@@ -0,0 +1,191 @@
+import os
+import asyncio
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+# Model multilingual (termasuk bahasa Indonesia), 384 dimensi, cukup cepat di CPU
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_OPENAI_MODEL = "text-embedding-ada-002"
+
+LOCAL_BACKENDS = ("torch", "quantized", "onnx")
+
+
+# Mode pooling sentence-transformers (1_Pooling/config.json) yang didukung backend ONNX
+ONNX_POOLING_MODES = ("cls", "mean", "max", "mean_sqrt_len_tokens")
+
+
+def backend_model_name(model: str, backend: Optional[str] = None) -> str:
+    """Nama model beserta backend lokal, mis. "paraphrase-...@onnx".
+
+    Backend selain torch menghasilkan vektor yang sedikit berbeda, sehingga dicatat
+    terpisah di collection dan di cache embedding. torch tetap memakai nama model saja.
+    """
+    return model if backend in (None, "torch") else f"{model}@{backend}"
+
+
+def embedding_signature(provider: str, model: str, backend: Optional[str] = None) -> str:
+    """Nama model yang dicatat di metadata collection, mis. "local:paraphrase-..."."""
+    return f"{provider}:{backend_model_name(model, backend)}"
+
+
+class LocalEmbeddings:
+    """Embedding lokal dengan sentence-transformers, inferensi batch di CPU.
+
+    backend:
+      - "torch": model apa adanya
+      - "quantized": quantization dinamis int8 pada layer Linear (lebih cepat di CPU)
+      - "onnx": model diekspor sekali ke ONNX lalu dijalankan dengan onnxruntime
+
+    sentence-transformers, torch, dan onnxruntime baru diimpor saat model pertama kali dipakai.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_LOCAL_MODEL,
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        backend: str = "torch",
+        device: str = "cpu",
+        cache_folder: Optional[str] = None,
+        max_seq_length: int = 256,
+    ):
+        if backend not in LOCAL_BACKENDS:
+            raise ValueError(f"backend harus salah satu dari {LOCAL_BACKENDS}, bukan {backend!r}")
+        self.model = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.backend = backend
+        self.device = device
+        self.cache_folder = cache_folder
+        self.max_seq_length = max_seq_length
+        self._model = None
+        self._onnx_session = None
+        self._pooling_mode = "mean"
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            model = SentenceTransformer(self.model, device=self.device, cache_folder=self.cache_folder)
+            model.max_seq_length = self.max_seq_length
+            if self.backend == "quantized":
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            elif self.backend == "onnx":
+                self._pooling_mode = self._read_pooling_mode(model)
+                self._onnx_session = self._load_onnx(model)
+            self._model = model
+            print(f"Model embedding lokal dimuat: {self.model} (backend={self.backend})")
+            return model
+
+    def _onnx_path(self) -> str:
+        folder = self.cache_folder or os.path.join(os.path.expanduser("~"), ".cache", "rag_onnx")
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, self.model.replace("/", "__") + ".onnx")
+
+    @staticmethod
+    def _read_pooling_mode(model) -> str:
+        """Mode pooling dari modul Pooling model (isi 1_Pooling/config.json)."""
+        for module in model:
+            if not hasattr(module, "get_pooling_mode_str"):
+                continue
+            config = module.get_config_dict()
+            if config.get("pooling_mode_cls_token"):
+                mode = "cls"
+            elif config.get("pooling_mode_max_tokens"):
+                mode = "max"
+            elif config.get("pooling_mode_mean_sqrt_len_tokens"):
+                mode = "mean_sqrt_len_tokens"
+            elif config.get("pooling_mode_mean_tokens"):
+                mode = "mean"
+            else:
+                mode = module.get_pooling_mode_str()
+            if mode not in ONNX_POOLING_MODES:
+                raise ValueError(f"Pooling '{mode}' belum didukung backend onnx; gunakan backend torch")
+            return mode
+        return "mean"
+
+    @staticmethod
+    def _pool(hidden: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+        if mode == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(np.float32)
+        if mode == "max":
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+        summed = (hidden * mask).sum(axis=1)
+        lengths = np.clip(mask.sum(axis=1), 1e-9, None)
+        if mode == "mean_sqrt_len_tokens":
+            return summed / np.sqrt(lengths)
+        return summed / lengths
+
+    def _load_onnx(self, model):
+        """Ekspor transformer ke ONNX (sekali, disimpan di cache_folder) lalu buka dengan onnxruntime."""
+        import torch
+        import onnxruntime
+
+        path = self._onnx_path()
+        if not os.path.exists(path):
+            transformer = model[0].auto_model
+            sample = model.tokenizer(["contoh kalimat"], return_tensors="pt")
+            names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+            dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+            tmp_path = path + ".tmp"
+            with torch.no_grad():
+                torch.onnx.export(
+                    transformer, tuple(sample[name] for name in names), tmp_path,
+                    input_names=names, output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic, opset_version=14,
+                )
+            os.replace(tmp_path, path)
+            print(f"Model diekspor ke ONNX: {path}")
+
+        options = onnxruntime.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def _encode_onnx(self, texts: List[str]) -> np.ndarray:
+        tokenizer = self._model.tokenizer
+        input_names = {i.name for i in self._onnx_session.get_inputs()}
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = tokenizer(
+                texts[start:start + self.batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np",
+            )
+            feeds = {name: batch[name].astype(np.int64) for name in input_names}
+            hidden = self._onnx_session.run(None, feeds)[0]
+            # Pooling sesuai konfigurasi model, seperti sentence-transformers
+            outputs.append(self._pool(hidden, batch["attention_mask"], self._pooling_mode))
+        vectors = np.vstack(outputs)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        model = self._load()
+        if self._onnx_session is not None:
+            vectors = self._encode_onnx(texts)
+        else:
+            vectors = model.encode(
+                texts, batch_size=self.batch_size, convert_to_numpy=True,
+                normalize_embeddings=True, show_progress_bar=False,
+            )
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
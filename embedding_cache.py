@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from typing import List, Optional, Dict, Any
+
+
+def normalize_text(text: str) -> str:
+    """Normalisasi teks sebelum di-hash: rapikan spasi dan baris baru."""
+    return " ".join((text or "").split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Penyimpanan embedding di SQLite dengan kunci (nama model, hash teks)."""
+
+    def __init__(self, path: str = "embedding_cache.db", max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Ambil embedding yang sudah ada di cache untuk daftar hash."""
+        found = {}
+        if not hashes:
+            return found
+        unique_hashes = list(dict.fromkeys(hashes))
+        now = time.time()
+        with self._lock:
+            cur = self._conn.cursor()
+            # SQLite membatasi jumlah parameter per query
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                cur.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model=? AND text_hash IN ({placeholders})",
+                    [model] + batch
+                )
+                for h, blob in cur.fetchall():
+                    found[h] = array("f", blob).tolist()
+            if found:
+                cur.executemany(
+                    "UPDATE embeddings SET last_used=? WHERE model=? AND text_hash=?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        """Simpan embedding baru lalu buang entri terlama jika melebihi batas."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(model, h, array("f", vector).tobytes(), now) for h, vector in items.items()]
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            cur.execute("SELECT COUNT(*) FROM embeddings")
+            overflow = cur.fetchone()[0] - self.max_entries
+            if overflow > 0:
+                cur.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+class CachedEmbeddings:
+    """Pembungkus Embeddings yang hanya memanggil API untuk teks yang belum ada di cache.
+
+    Sengaja tidak mewarisi kelas Embeddings dari langchain agar modul ini tidak
+    memicu impor langchain; Chroma hanya butuh embed_documents dan embed_query.
+    """
+
+    def __init__(self, embeddings: Any, cache: EmbeddingCache, model_name: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.model_name, fresh)
+            cached.update(fresh)
+
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        h = text_hash(text)
+        cached = self.cache.get_many(self.model_name, [h])
+        if h in cached:
+            self.hits += 1
+            return cached[h]
+
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.model_name, {h: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+        missing = {h: t for h, t in zip(hashes, texts) if h not in cached}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            new_vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.model_name, fresh)
+            cached.update(fresh)
+        return [cached[h] for h in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Versi async embed_query; cache SQLite lokal tetap dibaca langsung (cepat)."""
+        h = text_hash(text)
+        cached = self.cache.get_many(self.model_name, [h])
+        if h in cached:
+            self.hits += 1
+            return cached[h]
+
+        self.misses += 1
+        vector = await self.embeddings.aembed_query(text)
+        self.cache.put_many(self.model_name, {h: vector})
+        return vector
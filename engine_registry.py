@@ -0,0 +1,33 @@
+import os
+import threading
+from typing import Dict, Optional
+
+from rag_engine import RAGEngine
+
+# Satu RAGEngine per persist_directory untuk seluruh proses Streamlit
+_engines: Dict[str, RAGEngine] = {}
+_lock = threading.Lock()
+
+
+def get_engine(persist_directory: str = "chroma_db", docs_directory: Optional[str] = None, **kwargs) -> RAGEngine:
+    """Ambil engine bersama untuk persist_directory ini, dibuat sekali per proses.
+
+    kwargs hanya dipakai saat engine pertama kali dibuat. Semua sesi dan halaman
+    memakai objek yang sama sehingga upload dari satu sesi langsung terlihat di sesi lain.
+    docs_directory: folder dokumen yang metadatanya disinkronkan ke chunk sekali saat warm-up.
+    """
+    key = os.path.abspath(persist_directory)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = RAGEngine(persist_directory=persist_directory, **kwargs)
+            _engines[key] = engine
+            # Index dimuat di background agar pertanyaan pertama tidak paling lambat
+            engine.warm_up(background=True, docs_directory=docs_directory)
+        return engine
+
+
+def clear_engines() -> None:
+    """Lupakan semua engine bersama (mis. setelah chroma_db direset dari luar)."""
+    with _lock:
+        _engines.clear()
@@ -0,0 +1,609 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from metadata_filter import matches
+from vector_compression import make_codec
+
+MATRIX_FILE = "vectors.npy"
+CODES_FILE = "codes.npy"
+CODEC_FILE = "codec.npz"
+TABLE_FILE = "flat_index.db"
+
+
+def _grow(array: Optional[np.ndarray], path: Optional[str], capacity: int, width: int, dtype, n_rows: int) -> np.ndarray:
+    """Alokasikan matriks (capacity, width) dan salin n_rows baris pertama dari array lama.
+
+    Untuk file: tulis ke file sementara lalu ganti atomik; proses lain me-map ulang saat inode berubah.
+    """
+    if path:
+        tmp_path = path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(capacity, width))
+        if array is not None and n_rows:
+            grown[:n_rows] = array[:n_rows]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode="r+")
+    grown = np.zeros((capacity, width), dtype=dtype)
+    if array is not None and n_rows:
+        grown[:n_rows] = array[:n_rows]
+    return grown
+
+
+def _copy_rows(array: np.ndarray, tmp_path: Optional[str], rows: np.ndarray, capacity: int,
+               block_rows: int) -> Optional[np.ndarray]:
+    """Salin baris `rows` ke matriks baru (capacity baris) per blok.
+
+    Untuk file: ditulis ke tmp_path (pemanggil yang mengganti file lama) dan mengembalikan None.
+    """
+    shape = (capacity, array.shape[1])
+    if tmp_path:
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=array.dtype, shape=shape)
+    else:
+        out = np.zeros(shape, dtype=array.dtype)
+    for start in range(0, len(rows), block_rows):
+        end = min(start + block_rows, len(rows))
+        out[start:end] = array[rows[start:end]]
+    if tmp_path:
+        out.flush()
+        del out
+        return None
+    return out
+
+
+class FlatCollection:
+    """Index vektor datar: matriks float32 di file .npy yang di-memory-map, metadata dan id di SQLite.
+
+    Pencarian exact top-k dalam satu perkalian matriks (jarak L2 kuadrat, sama seperti
+    Chroma). Baris baru ditambahkan di akhir matriks, hapus hanya menandai baris sebagai
+    tombstone. Karena matriks dibaca lewat mmap, beberapa proses Streamlit berbagi halaman
+    yang sama di page cache OS. Antarmukanya meniru subset Collection Chroma yang dipakai
+    RAGEngine (count, get, query, upsert, update, delete, modify, metadata).
+
+    compression ("float16", "int8", "pca") menambahkan matriks kode terkompresi yang
+    dipindai saat pencarian; rescore_factor * k kandidat terbaiknya lalu diskor ulang
+    dengan vektor float32 asli, yang hanya dibaca untuk baris kandidat. int8 dan pca
+    baru dilatih setelah ada min_fit_rows chunk; sebelum itu pencarian tetap exact.
+
+    directory=None menyimpan semuanya di memori (untuk use_in_memory dan test).
+    """
+
+    def __init__(self, directory: Optional[str] = None, initial_capacity: int = 1024,
+                 compact_min_tombstones: int = 1000, compression: Optional[str] = None,
+                 pca_components: int = 256, rescore_factor: int = 4, min_fit_rows: int = 256,
+                 block_rows: int = 32768):
+        self.directory = directory
+        self.initial_capacity = initial_capacity
+        self.compact_min_tombstones = compact_min_tombstones
+        self.compression = compression
+        self.pca_components = pca_components
+        self.rescore_factor = max(1, rescore_factor)
+        self.min_fit_rows = min_fit_rows
+        self.block_rows = block_rows
+        self._lock = threading.RLock()
+        self._codec = None
+        self._codes = None
+        if compression:
+            make_codec(compression, 1)  # validasi nama mode
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.matrix_path = os.path.join(directory, MATRIX_FILE)
+            self.codes_path = os.path.join(directory, CODES_FILE)
+            self.codec_path = os.path.join(directory, CODEC_FILE)
+            table_path = os.path.join(directory, TABLE_FILE)
+        else:
+            self.matrix_path = self.codes_path = self.codec_path = None
+            table_path = ":memory:"
+
+        # isolation_level=None: transaksi diatur sendiri lewat BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(table_path, check_same_thread=False, isolation_level=None)
+        if directory:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT,
+                document TEXT,
+                metadata TEXT,
+                norm REAL NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rows_id ON rows (id) WHERE deleted = 0")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+
+        self._load()
+        # Index lama tanpa kode (atau dengan mode kompresi lain) dikodekan ulang dari vektor float32
+        if self.compression and self._codes is None and self._ready_to_fit():
+            self.fit_compression()
+
+    # ---------- status di memori ----------
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _setting(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _load(self) -> None:
+        """Muat ulang id, metadata, dan norma dari SQLite lalu map ulang matriks."""
+        dim = self._setting("dim")
+        self._dim = int(dim) if dim else None
+        rows = self._conn.execute("SELECT row, id, metadata, norm, deleted FROM rows ORDER BY row").fetchall()
+        self._n_rows = rows[-1][0] + 1 if rows else 0
+
+        if self.matrix_path and os.path.exists(self.matrix_path):
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self._matrix_stat = self._stat()
+        elif self.matrix_path is None and getattr(self, "_matrix", None) is not None:
+            pass  # matriks di memori tetap dipakai
+        else:
+            self._matrix = None
+            self._matrix_stat = None
+
+        capacity = max(self._n_rows, self._matrix.shape[0] if self._matrix is not None else 0)
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._metas: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._norms2 = np.zeros(capacity, dtype=np.float32)
+        self._row_of: Dict[str, int] = {}
+        for row, chunk_id, metadata, norm, deleted in rows:
+            if deleted:
+                continue
+            self._ids[row] = chunk_id
+            self._metas[row] = json.loads(metadata) if metadata else None
+            self._alive[row] = True
+            self._norms2[row] = norm * norm
+            self._row_of[chunk_id] = row
+        if self.matrix_path:
+            self._load_codec()
+        self._version = self._data_version()
+
+    def _load_codec(self) -> None:
+        self._codec, self._codes = None, None
+        if not self.compression or self._dim is None:
+            return
+        codec = make_codec(self.compression, self._dim, self.pca_components)
+        if self._setting("compression") == self.compression and os.path.exists(self.codes_path):
+            if os.path.exists(self.codec_path):
+                with np.load(self.codec_path) as state:
+                    codec.load_state({key: state[key] for key in state.files})
+            if codec.fitted:
+                self._codes = np.load(self.codes_path, mmap_mode="r+")
+        self._codec = codec
+
+    def _stat(self):
+        st = os.stat(self.matrix_path)
+        return st.st_ino, st.st_size
+
+    def _refresh(self) -> None:
+        """Muat ulang bila proses lain mengubah index sejak pembacaan terakhir."""
+        if self._data_version() != self._version:
+            self._load()
+        elif self.matrix_path and self._matrix is not None and self._stat() != self._matrix_stat:
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self._matrix_stat = self._stat()
+            if self._codes is not None:
+                self._codes = np.load(self.codes_path, mmap_mode="r+")
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                yield
+                if self._matrix is not None and self.matrix_path:
+                    self._matrix.flush()
+                    if self._codes is not None:
+                        self._codes.flush()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._load()
+                raise
+            # Perubahan dari koneksi sendiri tidak menaikkan data_version
+            self._version = self._data_version()
+
+    def _ensure_capacity(self, rows_needed: int, dim: int) -> None:
+        current = self._matrix.shape[0] if self._matrix is not None else 0
+        if current >= rows_needed:
+            return
+        capacity = max(self.initial_capacity, rows_needed, current * 2)
+        if self._codes is not None:
+            self._codes = _grow(self._codes, self.codes_path, capacity, self._codec.code_dim,
+                                self._codec.dtype, self._n_rows)
+        self._matrix = _grow(self._matrix, self.matrix_path, capacity, dim, np.float32, self._n_rows)
+        if self.matrix_path:
+            self._matrix_stat = self._stat()
+
+        extra = capacity - len(self._ids)
+        if extra > 0:
+            self._ids.extend([None] * extra)
+            self._metas.extend([None] * extra)
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+            self._norms2 = np.concatenate([self._norms2, np.zeros(extra, dtype=np.float32)])
+
+    # ---------- kompresi ----------
+
+    def _ready_to_fit(self) -> bool:
+        if not self.compression or self._dim is None or not self._row_of:
+            return False
+        if self.compression == "float16":
+            return True
+        needed = max(self.min_fit_rows, self.pca_components if self.compression == "pca" else 0)
+        return len(self._row_of) >= needed
+
+    def _fit_codec(self) -> None:
+        """Latih codec pada semua vektor hidup lalu kodekan seluruh matriks (di dalam transaksi tulis)."""
+        codec = make_codec(self.compression, self._dim, self.pca_components)
+        alive = np.flatnonzero(self._alive[:self._n_rows])
+        codec.fit(np.asarray(self._matrix[alive], dtype=np.float32))
+
+        capacity = self._matrix.shape[0]
+        codes = _grow(None, self.codes_path, capacity, codec.code_dim, codec.dtype, 0)
+        for start in range(0, self._n_rows, self.block_rows):
+            end = min(start + self.block_rows, self._n_rows)
+            codes[start:end] = codec.encode(self._matrix[start:end])
+        if self.codec_path:
+            tmp_path = self.codec_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **codec.state())
+            os.replace(tmp_path, self.codec_path)
+        # codec_version berubah -> data_version berubah -> proses lain memuat ulang kode
+        version = int(self._setting("codec_version") or 0) + 1
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            [("compression", self.compression), ("codec_version", str(version))]
+        )
+        self._codec, self._codes = codec, codes
+        print(f"Kompresi {self.compression} dilatih untuk {len(alive)} chunk "
+              f"({self._dim} -> {codec.code_dim} dimensi, {np.dtype(codec.dtype).name})")
+
+    def fit_compression(self) -> None:
+        """Latih ulang codec kompresi (mis. setelah korpus bertambah banyak)."""
+        if not self.compression:
+            return
+        with self._write():
+            if self._ready_to_fit():
+                self._fit_codec()
+
+    def _encode_rows(self, rows: List[int], vectors: np.ndarray) -> None:
+        if self._codes is not None:
+            self._codes[rows] = self._codec.encode(vectors)
+        elif self._ready_to_fit():
+            self._fit_codec()
+
+    # ---------- API ala Chroma ----------
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._setting("collection_metadata")
+        return json.loads(value) if value else None
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        if metadata is None:
+            return
+        with self._write():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('collection_metadata', ?)",
+                (json.dumps(metadata),)
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._row_of)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: Iterable[List[float]],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+        documents: Optional[List[Optional[str]]] = None,
+    ) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Jumlah embedding harus sama dengan jumlah id")
+        metadatas = metadatas or [None] * len(ids)
+        documents = documents or [None] * len(ids)
+
+        with self._write():
+            dim = vectors.shape[1]
+            if self._dim is None:
+                self._dim = dim
+                self._conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dim', ?)", (str(dim),))
+            elif dim != self._dim:
+                raise ValueError(f"Dimensi embedding {dim} tidak sama dengan dimensi index {self._dim}")
+
+            # id yang sama dalam satu panggilan: yang terakhir menang
+            latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            rows = []
+            n_rows = self._n_rows
+            for chunk_id in latest:
+                row = self._row_of.get(chunk_id)
+                if row is None:
+                    row = n_rows
+                    n_rows += 1
+                rows.append(row)
+            self._ensure_capacity(n_rows, dim)
+
+            order = list(latest.values())
+            self._matrix[rows] = vectors[order]
+            norms = np.linalg.norm(vectors[order], axis=1)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows (row, id, document, metadata, norm, deleted) VALUES (?, ?, ?, ?, ?, 0)",
+                [
+                    (row, chunk_id, documents[i], json.dumps(metadatas[i]) if metadatas[i] is not None else None,
+                     float(norm))
+                    for row, (chunk_id, i), norm in zip(rows, latest.items(), norms)
+                ]
+            )
+            self._n_rows = n_rows
+            for row, (chunk_id, i), norm in zip(rows, latest.items(), norms):
+                self._ids[row] = chunk_id
+                self._metas[row] = metadatas[i]
+                self._alive[row] = True
+                self._norms2[row] = norm * norm
+                self._row_of[chunk_id] = row
+            if self.compression:
+                self._encode_rows(rows, vectors[order])
+
+    def add(self, ids, embeddings, metadatas=None, documents=None) -> None:
+        self.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def update(
+        self,
+        ids: List[str],
+        embeddings: Optional[Iterable[List[float]]] = None,
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+        documents: Optional[List[Optional[str]]] = None,
+    ) -> None:
+        """Ubah baris yang sudah ada; metadata digabung per key (nilai None menghapus key)."""
+        with self._write():
+            for i, chunk_id in enumerate(ids):
+                row = self._row_of.get(chunk_id)
+                if row is None:
+                    continue
+                if embeddings is not None:
+                    vector = np.asarray(embeddings[i], dtype=np.float32)
+                    if vector.shape[0] != self._dim:
+                        raise ValueError(f"Dimensi embedding {vector.shape[0]} tidak sama dengan dimensi index {self._dim}")
+                    self._matrix[row] = vector
+                    if self._codes is not None:
+                        self._codes[row] = self._codec.encode(vector[None, :])[0]
+                    norm = float(np.linalg.norm(vector))
+                    self._norms2[row] = norm * norm
+                    self._conn.execute("UPDATE rows SET norm=? WHERE row=?", (norm, row))
+                if metadatas is not None and metadatas[i] is not None:
+                    merged = dict(self._metas[row] or {})
+                    for key, value in metadatas[i].items():
+                        if value is None:
+                            merged.pop(key, None)
+                        else:
+                            merged[key] = value
+                    self._metas[row] = merged
+                    self._conn.execute("UPDATE rows SET metadata=? WHERE row=?", (json.dumps(merged), row))
+                if documents is not None and documents[i] is not None:
+                    self._conn.execute("UPDATE rows SET document=? WHERE row=?", (documents[i], row))
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Tandai baris sebagai tombstone; ruangnya diambil kembali oleh compact()."""
+        with self._write():
+            rows = self._select_rows(ids, where)
+            self._conn.executemany(
+                "UPDATE rows SET deleted=1, id=NULL, document=NULL, metadata=NULL WHERE row=?",
+                [(int(row),) for row in rows]
+            )
+            for row in rows:
+                self._row_of.pop(self._ids[row], None)
+                self._ids[row] = None
+                self._metas[row] = None
+                self._alive[row] = False
+
+        tombstones = self._n_rows - len(self._row_of)
+        if tombstones >= self.compact_min_tombstones and tombstones > len(self._row_of):
+            self.compact()
+
+    def compact(self) -> int:
+        """Tulis ulang matriks tanpa tombstone; mengembalikan jumlah baris yang dibuang.
+
+        Matriks dan kode baru ditulis ke file sementara dulu; file lama baru diganti
+        (os.replace) setelah semuanya tertulis, dan penomoran baris di SQLite di-commit
+        sesudahnya. Gagal di tengah jalan berarti index lama tetap utuh.
+        """
+        tmp_paths = []
+        try:
+            with self._write():
+                alive_rows = np.flatnonzero(self._alive[:self._n_rows])
+                removed = self._n_rows - len(alive_rows)
+                if not removed:
+                    return 0
+                capacity = max(self.initial_capacity, len(alive_rows))
+                replacements = []
+                for attr, path in (("_matrix", self.matrix_path), ("_codes", self.codes_path)):
+                    array = getattr(self, attr)
+                    if array is None:
+                        continue
+                    tmp_path = path + ".compact.tmp" if path else None
+                    if tmp_path:
+                        tmp_paths.append(tmp_path)
+                    replacements.append((attr, path, tmp_path,
+                                         _copy_rows(array, tmp_path, alive_rows, capacity, self.block_rows)))
+
+                stored = self._conn.execute(
+                    "SELECT id, document, metadata, norm FROM rows WHERE deleted = 0 ORDER BY row"
+                ).fetchall()
+                self._conn.execute("DELETE FROM rows")
+                self._conn.executemany(
+                    "INSERT INTO rows (row, id, document, metadata, norm, deleted) VALUES (?, ?, ?, ?, ?, 0)",
+                    [(new_row,) + tuple(values) for new_row, values in enumerate(stored)]
+                )
+
+                # Semua sudah tertulis: ganti file, COMMIT menyusul saat keluar dari _write
+                for attr, path, tmp_path, compacted in replacements:
+                    if tmp_path:
+                        os.replace(tmp_path, path)
+                        tmp_paths.remove(tmp_path)
+                        compacted = np.load(path, mmap_mode="r+")
+                    setattr(self, attr, compacted)
+                if self.matrix_path and self._matrix is not None:
+                    self._matrix_stat = self._stat()
+        finally:
+            for tmp_path in tmp_paths:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        self._load()
+        print(f"Flat index dipadatkan: {removed} tombstone dibuang")
+        return removed
+
+    def _select_rows(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> List[int]:
+        if ids is not None:
+            rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+        else:
+            rows = np.flatnonzero(self._alive[:self._n_rows]).tolist()
+        if where:
+            rows = [row for row in rows if matches(self._metas[row], where)]
+        return rows
+
+    def _documents(self, rows: List[int]) -> List[Optional[str]]:
+        found = {}
+        for start in range(0, len(rows), 500):
+            batch = [int(row) for row in rows[start:start + 500]]
+            placeholders = ",".join("?" for _ in batch)
+            found.update(self._conn.execute(
+                f"SELECT row, document FROM rows WHERE row IN ({placeholders})", batch
+            ).fetchall())
+        return [found.get(int(row)) for row in rows]
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        include = ["metadatas", "documents"] if include is None else include
+        with self._lock:
+            self._refresh()
+            rows = self._select_rows(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "embeddings": self._matrix[rows].tolist() if "embeddings" in include and rows else
+                              ([] if "embeddings" in include else None),
+                "metadatas": [self._metas[row] for row in rows] if "metadatas" in include else None,
+                "documents": self._documents(rows) if "documents" in include else None,
+            }
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        include = ["metadatas", "documents", "distances"] if include is None else include
+        with self._lock:
+            self._refresh()
+            # Snapshot referensi; perkalian matriks berjalan di luar lock
+            n_rows, matrix = self._n_rows, self._matrix
+            codec, codes = self._codec, self._codes
+            norms2, ids, metas = self._norms2[:n_rows], self._ids, self._metas
+            candidates = self._alive[:n_rows].copy()
+            if where:
+                for row in np.flatnonzero(candidates):
+                    candidates[row] = matches(metas[row], where)
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        result = {"ids": [], "embeddings": None, "metadatas": None, "documents": None, "distances": None}
+        for key in ("metadatas", "documents", "distances", "embeddings"):
+            if key in include:
+                result[key] = []
+
+        k = min(n_results, int(candidates.sum()))
+        if k == 0 or matrix is None:
+            for _ in queries:
+                result["ids"].append([])
+                for key in ("metadatas", "documents", "distances", "embeddings"):
+                    if key in include:
+                        result[key].append([])
+            return result
+
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2 untuk semua baris sekaligus
+        query_norms2 = np.sum(queries * queries, axis=1)
+        if codes is not None:
+            # Pindai kode terkompresi per blok (tanpa salinan float32 seluruh matriks)
+            projected, bias = codec.query_terms(queries)
+            dots = np.empty((n_rows, len(queries)), dtype=np.float32)
+            for start in range(0, n_rows, self.block_rows):
+                end = min(start + self.block_rows, n_rows)
+                dots[start:end] = codes[start:end].astype(np.float32) @ projected.T
+            dots += bias[None, :]
+        else:
+            dots = np.asarray(matrix[:n_rows]) @ queries.T
+        distances = norms2[:, None] - 2.0 * dots + query_norms2[None, :]
+        np.maximum(distances, 0.0, out=distances)
+        distances[~candidates] = np.inf
+
+        shortlist = min(k * self.rescore_factor, int(candidates.sum())) if codes is not None else k
+        for column in range(queries.shape[0]):
+            column_distances = distances[:, column]
+            top = np.argpartition(column_distances, shortlist - 1)[:shortlist]
+            if codes is not None:
+                # Skor ulang kandidat dengan vektor float32 asli
+                top = np.sort(top)
+                exact = np.sum((np.asarray(matrix[top]) - queries[column]) ** 2, axis=1)
+                order = np.lexsort((top, exact))[:k]
+                top, top_distances = top[order], exact[order]
+            else:
+                # Urutan deterministik: jarak, lalu nomor baris
+                top = top[np.lexsort((top, column_distances[top]))]
+                top_distances = column_distances[top]
+            rows = top.tolist()
+            result["ids"].append([ids[row] for row in rows])
+            if "distances" in include:
+                result["distances"].append([float(distance) for distance in top_distances])
+            if "metadatas" in include:
+                result["metadatas"].append([metas[row] for row in rows])
+            if "embeddings" in include:
+                result["embeddings"].append(np.asarray(matrix[rows]).tolist())
+            if "documents" in include:
+                with self._lock:
+                    result["documents"].append(self._documents(rows))
+        return result
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._matrix is not None and self.matrix_path:
+                self._matrix.flush()
+                if self._codes is not None:
+                    self._codes.flush()
+
+
+class FlatVectorStore:
+    """Pembungkus tipis agar FlatCollection bisa dipakai di tempat vectorstore Chroma."""
+
+    def __init__(self, persist_directory: Optional[str] = None, embedding_function: Any = None,
+                 compression: Optional[str] = None):
+        self.persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self._collection = FlatCollection(persist_directory, compression=compression)
+
+    @property
+    def embeddings(self) -> Any:
+        return self._embedding_function
+
+    def persist(self) -> None:
+        self._collection.flush()
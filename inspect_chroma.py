@@ -5,11 +5,11 @@ load_dotenv()
 from rag_engine import RAGEngine
 
 def list_documents(rag: RAGEngine):
-    docs = rag.list_indexed_files()
+    docs = rag.aggregate_files()
     if docs:
         print(f"📚 {len(docs)} dokumen terindeks:")
-        for i, d in enumerate(docs, 1):
-            print(f"{i}. {d}")
+        for i, (d, info) in enumerate(docs.items(), 1):
+            print(f"{i}. {d} ({info['chunks']} chunk, {info['pages']} halaman)")
     else:
         print("❌ Tidak ada dokumen yang terindeks.")
 
@@ -20,10 +20,18 @@ def delete_document(rag: RAGEngine, filename: str):
     except Exception as e:
         print(f"❌ Gagal menghapus dokumen: {e}")
 
+def remove_duplicates(rag: RAGEngine):
+    try:
+        removed = rag.remove_duplicate_chunks()
+        print(f"✅ {removed} chunk duplikat dihapus.")
+    except Exception as e:
+        print(f"❌ Gagal menghapus duplikat: {e}")
+
 def main():
     parser = argparse.ArgumentParser(description="CLI untuk mengelola Chroma vectorstore")
     parser.add_argument("--list", action="store_true", help="Lihat semua dokumen yang terindeks")
     parser.add_argument("--delete", type=str, help="Hapus dokumen dari vectorstore berdasarkan nama file")
+    parser.add_argument("--dedupe", action="store_true", help="Hapus chunk duplikat hasil ingest berulang")
     parser.add_argument("--reset", action="store_true", help="Reset chroma_db dan hapus semua isi")
     args = parser.parse_args()
 
@@ -42,5 +50,8 @@ def main():
     if args.delete:
         delete_document(rag, args.delete)
 
+    if args.dedupe:
+        remove_duplicates(rag)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from metadata_filter import matches
+
+STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "dengan", "untuk", "pada", "adalah", "ialah", "itu", "ini",
+    "atau", "dalam", "oleh", "sebagai", "akan", "telah", "sudah", "juga", "tidak", "bahwa", "para",
+    "apa", "apakah", "bagaimana", "siapa", "kapan", "mengapa", "berapa", "dimana", "mana", "saja",
+    "tersebut", "serta", "secara", "dapat", "harus", "wajib", "ada", "bagi", "kepada", "terhadap",
+    "antara", "setiap", "masing", "hal", "tentang", "jika", "maka", "karena", "agar", "sehingga",
+    "dimaksud", "yaitu", "yakni", "se", "nya", "no", "nomor", "the", "of", "and",
+}
+
+# Jenis rujukan hukum yang diikuti nomor, mis. "Pasal 35" -> "pasal_35"
+REFERENCE_WORDS = {
+    "pasal", "ayat", "bab", "bagian", "paragraf", "huruf", "angka", "lampiran",
+    "uu", "pp", "pm", "perpres", "permen", "kepmen", "perda", "tahun", "nomor", "no",
+}
+
+PHRASES = {
+    ("undang", "undang"): "uu",
+    ("peraturan", "pemerintah"): "pp",
+    ("peraturan", "menteri"): "pm",
+    ("peraturan", "presiden"): "perpres",
+    ("keputusan", "menteri"): "kepmen",
+    ("peraturan", "daerah"): "perda",
+}
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+_PARTICLES = ("nya", "lah", "kah", "pun")
+
+
+def _strip_particle(word: str) -> str:
+    for particle in _PARTICLES:
+        if word.endswith(particle) and len(word) - len(particle) >= 4:
+            return word[:-len(particle)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenisasi sederhana untuk teks regulasi berbahasa Indonesia.
+
+    Huruf kecil, normalisasi Unicode, singkatan peraturan ("undang-undang" -> "uu"),
+    token gabungan rujukan ("pasal 35" -> "pasal_35", "uu nomor 23" -> "uu_23"),
+    buang stopword, dan buang partikel -nya/-lah/-kah/-pun.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    words = _WORD_RE.findall(text)
+
+    merged = []
+    i = 0
+    while i < len(words):
+        if i + 1 < len(words) and (words[i], words[i + 1]) in PHRASES:
+            merged.append(PHRASES[(words[i], words[i + 1])])
+            i += 2
+        else:
+            merged.append(words[i])
+            i += 1
+
+    tokens = []
+    for i, word in enumerate(merged):
+        if word in REFERENCE_WORDS:
+            j = i + 1
+            if word not in ("nomor", "no") and j < len(merged) and merged[j] in ("nomor", "no"):
+                j += 1
+            if j < len(merged) and merged[j].isdigit():
+                tokens.append(f"{word}_{merged[j]}")
+        if word in STOPWORDS:
+            continue
+        tokens.append(_strip_particle(word))
+    return tokens
+
+
+class LexicalIndex:
+    """Inverted index BM25 di SQLite untuk pencarian kata kunci dan rujukan pasal."""
+
+    def __init__(self, path: str = ":memory:", k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._stats = None
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                source_file TEXT,
+                length INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, id)
+            ) WITHOUT ROWID
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_id ON postings (id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source_file)")
+        self._conn.commit()
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Tambah atau ganti chunk (id yang sama ditimpa)."""
+        with self._lock:
+            cur = self._conn.cursor()
+            self._delete_ids(cur, ids)
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                counts = Counter(tokenize(text))
+                cur.execute(
+                    "INSERT INTO chunks (id, source_file, length, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, metadata.get("source_file"), sum(counts.values()), text,
+                     json.dumps(metadata, ensure_ascii=False))
+                )
+                cur.executemany(
+                    "INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in counts.items()]
+                )
+            self._conn.commit()
+            self._stats = None
+
+    def update_metadata(self, ids: List[str], fields: Dict[str, Any]) -> None:
+        """Gabungkan field metadata ke chunk yang sudah ada (tanpa tokenisasi ulang)."""
+        with self._lock:
+            cur = self._conn.cursor()
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                rows = cur.execute(f"SELECT id, metadata FROM chunks WHERE id IN ({placeholders})", batch).fetchall()
+                cur.executemany(
+                    "UPDATE chunks SET metadata=? WHERE id=?",
+                    [(json.dumps({**json.loads(metadata), **fields}, ensure_ascii=False), chunk_id)
+                     for chunk_id, metadata in rows]
+                )
+            self._conn.commit()
+
+    def delete_ids(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._delete_ids(self._conn.cursor(), list(ids))
+            self._conn.commit()
+            self._stats = None
+
+    def delete_source(self, source_file: str) -> None:
+        with self._lock:
+            cur = self._conn.cursor()
+            ids = [r[0] for r in cur.execute("SELECT id FROM chunks WHERE source_file=?", (source_file,))]
+            self._delete_ids(cur, ids)
+            self._conn.commit()
+            self._stats = None
+
+    @staticmethod
+    def _delete_ids(cur: sqlite3.Cursor, ids: List[str]) -> None:
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" for _ in batch)
+            cur.execute(f"DELETE FROM postings WHERE id IN ({placeholders})", batch)
+            cur.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+            self._stats = None
+
+    def _corpus_stats(self) -> Tuple[int, float]:
+        if self._stats is None:
+            count, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            self._stats = (count, avg_length or 0.0)
+        return self._stats
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._corpus_stats()[0]
+
+    def search(self, query: str, k: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, str, Dict[str, Any]]]:
+        """Kembalikan (id, skor BM25, teks, metadata) dengan skor tertinggi.
+
+        where (filter metadata ala Chroma) diterapkan sebelum k hasil teratas diambil.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs, avg_length = self._corpus_stats()
+            if n_docs == 0:
+                return []
+
+            scores = Counter()
+            cur = self._conn.cursor()
+            for term in terms:
+                rows = cur.execute(
+                    "SELECT p.id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.id WHERE p.term=?",
+                    (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for chunk_id, tf, length in rows:
+                    norm = self.k1 * (1 - self.b + self.b * length / max(avg_length, 1e-9))
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            # Metadata kandidat diambil per batch (bukan satu query per chunk); berhenti begitu k lolos filter
+            ranked = scores.most_common(None if where else k)
+            batch_size = min(500, max(4 * k, 100) if where else max(k, 1))
+            results = []
+            for start in range(0, len(ranked), batch_size):
+                batch = ranked[start:start + batch_size]
+                placeholders = ",".join("?" for _ in batch)
+                found = {
+                    chunk_id: (text, metadata)
+                    for chunk_id, text, metadata in cur.execute(
+                        f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})",
+                        [chunk_id for chunk_id, _ in batch]
+                    )
+                }
+                for chunk_id, score in batch:
+                    text, metadata = found[chunk_id]
+                    metadata = json.loads(metadata)
+                    if where and not matches(metadata, where):
+                        continue
+                    results.append((chunk_id, score, text, metadata))
+                    if len(results) == k:
+                        return results
+        return results
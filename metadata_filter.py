@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional
+
+_COMPARATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches(metadata: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    """Cocokkan metadata dengan filter bergaya Chroma.
+
+    Mendukung {"field": nilai}, {"field": {"$eq"|"$ne"|"$gt"|"$gte"|"$lt"|"$lte"|"$in"|"$nin": ...}},
+    serta {"$and": [...]} dan {"$or": [...]}. Beberapa field dalam satu dict berarti AND.
+    Seperti Chroma, metadata yang tidak punya field tersebut tidak pernah cocok (juga untuk $ne/$nin).
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, sub) for sub in condition):
+                return False
+        elif key not in metadata:
+            return False
+        elif isinstance(condition, dict):
+            value = metadata[key]
+            for operator, target in condition.items():
+                if operator not in _COMPARATORS:
+                    raise ValueError(f"Operator filter tidak dikenal: {operator}")
+                try:
+                    if not _COMPARATORS[operator](value, target):
+                        return False
+                except TypeError:
+                    # Tipe berbeda (mis. str vs int) dianggap tidak cocok
+                    return False
+        elif metadata[key] != condition:
+            return False
+    return True
@@ -0,0 +1,83 @@
+import re
+import zlib
+import unicodedata
+from typing import List, Dict, Optional
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+
+class MinHasher:
+    """MinHash atas shingle kata, dengan LSH banding untuk mencari kandidat mirip."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 5, seed: int = 42):
+        if num_perm % bands:
+            raise ValueError("num_perm harus habis dibagi bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        # Kata apa adanya (tanpa stopword/token gabungan) agar shingle mengikuti urutan teks asli
+        words = _WORD_RE.findall(unicodedata.normalize("NFKC", text or "").lower())
+        if len(words) < self.shingle_size:
+            grams = [" ".join(words)] if words else []
+        else:
+            grams = [" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)]
+        return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        shingles = self.shingles(text)
+        if shingles.size == 0:
+            return None
+        # (a*x + b) mod p untuk semua permutasi sekaligus; a, x < 2^32 sehingga tidak overflow
+        hashes = (np.outer(self._a, shingles) + self._b[:, None]) % _MERSENNE_PRIME
+        return hashes.min(axis=1)
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+
+def find_near_duplicates(
+    texts: List[str],
+    threshold: float = 0.85,
+    hasher: Optional[MinHasher] = None,
+) -> Dict[int, int]:
+    """Cari chunk yang hampir sama (estimasi Jaccard >= threshold).
+
+    Mengembalikan {indeks duplikat: indeks representatif}; representatif adalah
+    chunk pertama dalam kelompoknya, sehingga urutan input menentukan yang dipertahankan.
+    Hanya texts yang diberikan yang dibandingkan satu sama lain; tidak ada signature
+    yang disimpan, jadi chunk yang sudah terindeks sebelumnya tidak ikut dicek.
+    """
+    hasher = hasher or MinHasher()
+    signatures = [hasher.signature(text) for text in texts]
+    buckets: Dict[bytes, List[int]] = {}
+    duplicates: Dict[int, int] = {}
+
+    for i, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        keys = hasher.band_keys(signature)
+        candidates = set()
+        for key in keys:
+            candidates.update(buckets.get(key, ()))
+        best = None
+        for j in sorted(candidates):
+            if float(np.mean(signatures[j] == signature)) >= threshold:
+                best = j
+                break
+        if best is not None:
+            duplicates[i] = duplicates.get(best, best)
+            continue
+        # Hanya representatif yang masuk bucket, jadi perbandingan tetap sedikit
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return duplicates
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import json
+from document_catalog import get_catalog
 
 # Cek login
 if not st.session_state.get("logged_in"):
@@ -25,12 +26,18 @@ if not os.path.exists(docs_folder):
     st.warning("📭 Belum ada dokumen yang diupload.")
     st.stop()
 
-# Ambil semua file
-all_files = sorted([f for f in os.listdir(docs_folder) if not f.endswith(".meta.json")])
-if not all_files:
+# Satu katalog per proses (dipakai juga halaman Upload); disamakan dengan folder sekali saat dibuat
+catalog = get_catalog("document_catalog.db", docs_folder)
+if catalog.count() == 0:
     st.info("📭 Folder kosong. Belum ada file.")
+    # File bisa saja disalin langsung ke folder setelah katalog dibuat
+    if st.button("🔄 Muat Ulang Daftar"):
+        catalog.sync(docs_folder)
+        st.rerun()
     st.stop()
 
+PAGE_SIZE = 20
+
 # ===============================
 # 🔀 Mode: Lihat Detail atau Daftar
 # ===============================
@@ -47,6 +54,7 @@ if selected_file:
 
     if not os.path.exists(file_path):
         st.error("❌ File tidak ditemukan.")
+        catalog.remove(selected_file)
         st.session_state.pop("selected_file", None)
         st.stop()
 
@@ -82,6 +90,11 @@ if selected_file:
             metadata["deskripsi"] = new_deskripsi
             with open(meta_path, "w") as f:
                 json.dump(metadata, f, indent=2)
+            rag_engine = st.session_state.get("rag_engine")
+            if rag_engine:
+                # Metadata chunk ikut diperbarui agar filter jenis dokumen langsung berlaku
+                rag_engine.update_document_metadata(file_path, metadata)
+            catalog.upsert(file_path, metadata)
             st.success("✅ Metadata diperbarui.")
             st.rerun()
 
@@ -92,6 +105,7 @@ if selected_file:
                 os.remove(file_path)
                 if os.path.exists(meta_path):
                     os.remove(meta_path)
+                catalog.remove(selected_file)
 
                 rag_engine = st.session_state.get("rag_engine")
                 if rag_engine:
@@ -112,29 +126,47 @@ else:
     search_query = st.text_input("Cari nama/deskripsi dokumen:")
     jenis_opsi = ["Semua", "Umum", "Rahasia", "D1", "D2", "D3", "D4", "D5", "D6", "D7", "D8"]
     filter_jenis = st.selectbox("Filter berdasarkan jenis dokumen:", jenis_opsi)
+    if st.button("🔄 Muat Ulang Daftar"):
+        # Untuk file yang ditambah/diubah langsung di folder, di luar aplikasi
+        catalog.sync(docs_folder)
+
+    # Kembali ke halaman pertama bila pencarian atau filter berubah
+    filter_key = (search_query, filter_jenis)
+    if st.session_state.get("catalog_filter") != filter_key:
+        st.session_state.catalog_filter = filter_key
+        st.session_state.catalog_page = 1
+
+    page = st.session_state.get("catalog_page", 1)
+    filtered_files, total = catalog.search(
+        search_query,
+        jenis_dokumen=None if filter_jenis == "Semua" else filter_jenis,
+        limit=PAGE_SIZE,
+        offset=(page - 1) * PAGE_SIZE
+    )
+
+    if total and not filtered_files:
+        # Halaman terakhir kosong setelah dokumen dihapus
+        st.session_state.catalog_page = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+        st.rerun()
 
-    filtered_files = []
-
-    for filename in all_files:
-        file_path = os.path.join(docs_folder, filename)
-        meta_path = file_path + ".meta.json"
-        metadata = {}
-
-        if os.path.exists(meta_path):
-            with open(meta_path, "r") as f:
-                metadata = json.load(f)
-
-        match_search = search_query.lower() in filename.lower() or search_query.lower() in metadata.get("deskripsi", "").lower()
-        match_jenis = filter_jenis == "Semua" or metadata.get("jenis_dokumen") == filter_jenis
-
-        if match_search and match_jenis:
-            filtered_files.append((filename, metadata))
-
-    if not filtered_files:
+    if not total:
         st.info("Tidak ada dokumen yang cocok dengan filter.")
     else:
+        total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
         st.subheader("📄 Daftar Dokumen")
-        for i, (filename, metadata) in enumerate(filtered_files, 1):
+        st.caption(f"{total} dokumen · halaman {page} dari {total_pages}")
+        for document in filtered_files:
+            filename = document["filename"]
             if st.button(f"📂 {filename}", key=f"select_{filename}"):
                 st.session_state.selected_file = filename
                 st.rerun()
+
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if page > 1 and st.button("⬅️ Sebelumnya"):
+                st.session_state.catalog_page = page - 1
+                st.rerun()
+        with col_next:
+            if page < total_pages and st.button("Berikutnya ➡️"):
+                st.session_state.catalog_page = page + 1
+                st.rerun()
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 import json
 from datetime import datetime
+from document_catalog import get_catalog
 
 # Cek login
 if not st.session_state.get("logged_in"):
@@ -25,35 +26,63 @@ with st.sidebar:
         st.experimental_set_query_params(page="login")
         st.rerun()
 
+# Katalog daftar dokumen, sama dengan yang dipakai halaman Lihat Dokumen
+catalog = get_catalog("document_catalog.db", "railway_docs")
+
+def tampilkan_progres(placeholder):
+    """Buat callback yang menampilkan progres ingest dari RAGEngine."""
+    def callback(progress):
+        total = max(progress.get("total_batches", 0), 1)
+        placeholder.progress(
+            min(progress.get("completed_batches", 0) / total, 1.0),
+            text=(
+                f"Batch {progress.get('completed_batches', 0)}/{progress.get('total_batches', 0)} · "
+                f"{progress.get('indexed_chunks', 0)}/{progress.get('total_chunks', 0)} chunks · "
+                f"retry {progress.get('retries', 0)} · gagal {progress.get('failed_batches', 0)}"
+            )
+        )
+    return callback
+
+def tampilkan_laporan_duplikat(report):
+    """Ringkasan chunk near-duplicate yang dibuang/ditandai saat ingest."""
+    if not report or not (report["removed"] or report["marked"]):
+        return
+    with st.expander(f"🧹 Near-duplicate: {report['removed']} dibuang, {report['marked']} ditandai "
+                     f"dari {report['chunks_in']} chunk"):
+        for item in report["examples"]:
+            st.markdown(f"- `{item['chunk_id']}` ≈ `{item['duplicate_of']}`: {item['preview']}…")
+
 # Database Management Section
 st.subheader("🔄 Database Management")
 col1, col2 = st.columns(2)
 
 with col1:
     if st.button("🔄 Re-indeks Semua Dokumen"):
-        with st.spinner("Mengindeks ulang semua dokumen..."):
+        with st.spinner("Menyinkronkan index dengan folder dokumen..."):
             try:
-                from rag_engine import RAGEngine
-                import os
-                
-                # Reset database dengan instance baru
-                openai_api_key = os.getenv("OPENAI_API_KEY")
-                rag_engine = RAGEngine(
-                    persist_directory="chroma_db",
-                    openai_api_key=openai_api_key,
-                    reset_db=True  # Reset database sebelum indexing
-                )
-                st.session_state.rag_engine = rag_engine
-                
-                # Reindex all documents
-                if os.path.exists("railway_docs"):
-                    num_chunks = rag_engine.load_and_index_documents("railway_docs")
-                    st.session_state.db_initialized = num_chunks > 0
-                    st.success(f"📚 {num_chunks} chunks berhasil diindeks!")
+                rag_engine = st.session_state.get("rag_engine")
+                if not rag_engine:
+                    st.error("Engine tidak ditemukan di session.")
+                elif os.path.exists("railway_docs"):
+                    # Hanya file baru, berubah, atau terhapus yang diproses ulang
+                    summary = rag_engine.sync_directory(
+                        "railway_docs",
+                        progress_callback=tampilkan_progres(st.empty())
+                    )
+                    catalog.sync("railway_docs")
+                    st.session_state.db_initialized = True
+                    st.success(
+                        f"📚 Sinkronisasi selesai: {len(summary['added'])} baru, "
+                        f"{len(summary['changed'])} berubah, {len(summary['removed'])} dihapus, "
+                        f"{summary['unchanged']} tidak berubah ({summary['chunks']} chunks diindeks)."
+                    )
+                    tampilkan_laporan_duplikat(summary.get("dedup"))
                 else:
                     st.error("❌ Folder 'railway_docs' tidak ditemukan!")
             except Exception as e:
                 st.error(f"❌ Gagal re-indeks: {e}")
+                if rag_engine and rag_engine.ingest_progress.get("status") == "failed":
+                    st.info("Progres tersimpan. Klik Re-indeks lagi untuk melanjutkan batch yang gagal.")
 
 with col2:
     if st.button("🔍 Cek Status Database"):
@@ -62,9 +91,11 @@ with col2:
             if not rag_engine:
                 st.error("Engine tidak ditemukan di session.")
             else:
-                file_counts = rag_engine.list_indexed_files()
-                total_chunks = sum(file_counts.values())
+                stats = rag_engine.get_collection_stats()
+                file_counts = stats["per_file"]
+                total_chunks = stats["chunk_count"]
                 st.success(f"Database berisi {total_chunks} chunks dari {len(file_counts)} dokumen")
+                st.caption(f"Terakhir diubah: {stats['last_modified'] or '-'}")
                 
                 # Tampilkan daftar dokumen
                 if file_counts:
@@ -111,6 +142,7 @@ if uploaded_file:
         }
         with open(filepath + ".meta.json", "w") as f:
             json.dump(metadata, f, indent=2)
+        catalog.upsert(filepath, metadata)
 
         st.success(f"✅ Dokumen `{final_filename}` berhasil diunggah dan metadata disimpan.")
 
@@ -121,38 +153,51 @@ if uploaded_file:
                 if not rag_engine:
                     st.error("Engine tidak ditemukan di session.")
                 else:
-                    # Indeks hanya file baru
-                    single_docs = rag_engine.load_documents(filepath)
-                    chunks = rag_engine.process_documents(single_docs)
-                    rag_engine.index_documents(chunks)
+                    # Indeks hanya file baru (chunk lama dengan nama sama diganti)
+                    num_chunks = rag_engine.index_file(
+                        filepath,
+                        progress_callback=tampilkan_progres(st.empty())
+                    )
                     st.session_state.db_initialized = True
-                    st.success(f"📚 Dokumen berhasil diproses dan disimpan ke vectorstore dalam {len(chunks)} chunk.")
+                    st.success(f"📚 Dokumen berhasil diproses dan disimpan ke vectorstore dalam {num_chunks} chunk.")
+                    tampilkan_laporan_duplikat(rag_engine.last_dedup_report)
             except Exception as e:
                 st.error(f"❌ Gagal indexing dokumen ke vectorstore: {e}")
+                if rag_engine and rag_engine.ingest_progress.get("status") == "failed":
+                    st.info("Progres tersimpan. Simpan ulang dokumen yang sama atau klik Re-indeks untuk melanjutkan.")
 
 # Daftar dokumen yang ada
 st.subheader("📚 Dokumen Terindeks")
-if os.path.exists("railway_docs"):
-    files = [f for f in os.listdir("railway_docs") if f.endswith('.pdf') or f.endswith('.txt')]
-    if files:
-        for file in files:
-            meta_path = os.path.join("railway_docs", file + ".meta.json")
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, 'r') as f:
-                        metadata = json.load(f)
-                    st.markdown(f"""
-                    **{file}**  
-                    - Jenis: {metadata.get('jenis_dokumen', 'N/A')}
-                    - Deskripsi: {metadata.get('deskripsi', 'N/A')}
-                    - Diupload oleh: {metadata.get('upload_by', 'N/A')}
-                    - Tanggal: {metadata.get('upload_at', 'N/A')}
-                    """)
-                except:
-                    st.write(f"- {file}")
-            else:
-                st.write(f"- {file}")
-    else:
-        st.info("Belum ada dokumen yang diunggah.")
+PAGE_SIZE = 20
+page = st.session_state.get("upload_catalog_page", 1)
+documents, total = catalog.search(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE, extensions=(".pdf", ".txt"))
+if total and not documents:
+    # Halaman terakhir kosong setelah dokumen dihapus
+    st.session_state.upload_catalog_page = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+    st.rerun()
+
+if documents:
+    total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    st.caption(f"{total} dokumen · halaman {page} dari {total_pages}")
+    for metadata in documents:
+        st.markdown(f"""
+        **{metadata['filename']}**  
+        - Jenis: {metadata['jenis_dokumen'] or 'N/A'}
+        - Deskripsi: {metadata['deskripsi'] or 'N/A'}
+        - Diupload oleh: {metadata['upload_by'] or 'N/A'}
+        - Tanggal: {metadata['upload_at'] or 'N/A'}
+        """)
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if page > 1 and st.button("⬅️ Sebelumnya"):
+            st.session_state.upload_catalog_page = page - 1
+            st.rerun()
+    with col_next:
+        if page < total_pages and st.button("Berikutnya ➡️"):
+            st.session_state.upload_catalog_page = page + 1
+            st.rerun()
+elif os.path.exists("railway_docs"):
+    st.info("Belum ada dokumen yang diunggah.")
 else:
-    st.info("Folder dokumen belum dibuat.")
\ No newline at end of file
+    st.info("Folder dokumen belum dibuat.")
@@ -1,7 +1,9 @@
 import streamlit as st
-import os, json, hashlib
+import os, hashlib, uuid
 from datetime import datetime
-from context_refiner import refine_question_with_history  # 👉 Impor modul baru
+from concurrent.futures import ThreadPoolExecutor
+from context_refiner import refine_question_with_history, needs_refinement  # 👉 Impor modul baru
+from chat_log_store import ChatLogStore
 
 st.set_page_config(page_title="Chatbot KMS", layout="wide")
 st.title("💬 Chatbot KMS")
@@ -17,25 +19,41 @@ os.makedirs("chat_logs", exist_ok=True)
 def get_message_id(index, role, content):
     return hashlib.md5(f"{index}-{role}-{content[:50]}".encode()).hexdigest()
 
-def get_chat_log_filename():
-    tanggal = datetime.now().strftime("%Y-%m-%d")
-    return f"chat_logs/{username}_{tanggal}.json"
+@st.cache_resource
+def get_chat_log_store() -> ChatLogStore:
+    # Satu store per proses, dipakai bersama semua sesi
+    return ChatLogStore("chat_logs")
 
-def simpan_chat_log():
-    with open(get_chat_log_filename(), "w", encoding="utf-8") as f:
-        json.dump(st.session_state.history, f, indent=2, ensure_ascii=False)
+chat_log_store = get_chat_log_store()
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = uuid.uuid4().hex
+
+def simpan_chat_log(message):
+    """Tambahkan satu pesan ke log (append-only, tanpa menulis ulang histori)."""
+    chat_log_store.log_message(message, username, st.session_state.chat_session_id)
 
 def save_feedback(index):
     msg = st.session_state.history[index]
     feedback_value = st.session_state.get(f"feedback_{index}")
     msg["feedback"] = "OK" if feedback_value == 1 else "NOT_OK"
     msg["feedback_timestamp"] = datetime.now().isoformat()
-    simpan_chat_log()
+    previous = st.session_state.history[index - 1] if index > 0 else {}
+    question = previous.get("content") if previous.get("role") == "user" else None
+    chat_log_store.log_feedback(msg, question, username, st.session_state.chat_session_id)
 
 # Inisialisasi histori
 if "history" not in st.session_state:
     st.session_state.history = []
 
+# Filter jenis dokumen; dokumen Rahasia hanya untuk admin
+role = st.session_state.get("role")
+jenis_opsi = ["Umum", "Rahasia", "D1", "D2", "D3", "D4", "D5", "D6", "D7", "D8"]
+if role != "admin":
+    jenis_opsi.remove("Rahasia")
+with st.sidebar:
+    jenis_dipilih = st.multiselect("Batasi jenis dokumen:", jenis_opsi)
+filters = {"jenis_dokumen": jenis_dipilih} if jenis_dipilih else None
+
 # Tampilkan histori dan feedback
 for i, message in enumerate(st.session_state.history):
     with st.chat_message(message["role"]):
@@ -60,48 +78,67 @@ if prompt := st.chat_input("Tanyakan sesuatu berdasarkan dokumen..."):
         "msg_id": get_message_id(len(st.session_state.history), "user", prompt)
     }
     st.session_state.history.append(user_msg)
+    simpan_chat_log(user_msg)
 
     with st.chat_message("user"):
         st.write(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("🔍 Memahami konteks pertanyaan..."):
-            try:
+        try:
+            with st.spinner("🔍 Memahami konteks pertanyaan..."):
                 rag = st.session_state.get("rag_engine")
                 if not rag:
                     raise ValueError("❌ RAG Engine belum tersedia")
 
-                # 🎯 Gunakan context_refiner untuk pertanyaan context-aware
-                contextualized_prompt = refine_question_with_history(st.session_state.history[:-1], prompt)
+                # 🎯 Pertanyaan yang berdiri sendiri (atau tanpa LLM sama sekali) langsung dipakai
+                riwayat = st.session_state.history[:-1]
+                speculative = None
+                if rag.llm is not None and needs_refinement(riwayat, prompt):
+                    # Retrieval untuk pertanyaan mentah berjalan bersamaan dengan context_refiner,
+                    # hasilnya dipakai ulang bila pertanyaan hasil refine cukup mirip
+                    with ThreadPoolExecutor(max_workers=1) as executor:
+                        future = executor.submit(rag.prepare_query, prompt, filters, role)
+                        contextualized_prompt = refine_question_with_history(riwayat, prompt, force=True)
+                        speculative = future.result()
+                else:
+                    contextualized_prompt = prompt
                 st.markdown(f"**📌 Pertanyaan setelah dipahami konteks:** `{contextualized_prompt}`")
 
-                result = rag.query(contextualized_prompt, debug=True)
-                answer = result.get("result", "Maaf, tidak ada jawaban.")
+                # Sumber sudah tersedia sebelum token pertama dari LLM
+                result = rag.stream_query(contextualized_prompt, debug=True, speculative=speculative,
+                                          filters=filters, role=role)
                 sources = result.get("formatted_sources", [])
 
-                print("\n📄 Daftar Chunk & Skor Similarity:")
-                for i, src in enumerate(sources):
-                    file = src.get("file", "-")
-                    page = src.get("page", "-")
-                    score = round(src.get("score", 0), 4)
-                    preview = src.get("chunk_preview", "").strip().replace("\n", " ")[:100]
-                    print(f"{i+1}. [{score}] {file} (hal. {page}) → {preview}...")
-
-                st.write(answer)
-
-                assistant_msg = {
-                    "role": "assistant",
-                    "content": answer,
-                    "timestamp": datetime.now().isoformat(),
-                    "msg_id": get_message_id(len(st.session_state.history), "assistant", answer),
-                    "query": contextualized_prompt,
-                    "sources": sources,
-                    "feedback": None,
-                    "feedback_timestamp": None
-                }
-                st.session_state.history.append(assistant_msg)
-                simpan_chat_log()
-                st.rerun()
-
-            except Exception as e:
-                st.error(f"Terjadi error: {e}")
+            print("\n📄 Daftar Chunk & Skor Similarity:")
+            for i, src in enumerate(sources):
+                file = src.get("file", "-")
+                page = src.get("page", "-")
+                score = round(src.get("score", 0), 4)
+                preview = src.get("chunk_preview", "").strip().replace("\n", " ")[:100]
+                print(f"{i+1}. [{score}] {file} (hal. {page}) → {preview}...")
+
+            # Tampilkan jawaban token demi token
+            answer_placeholder = st.empty()
+            answer = ""
+            for token in result["stream"]:
+                answer += token
+                answer_placeholder.markdown(answer + "▌")
+            answer_placeholder.markdown(answer)
+            answer = result.get("result") or answer or "Maaf, tidak ada jawaban."
+
+            assistant_msg = {
+                "role": "assistant",
+                "content": answer,
+                "timestamp": datetime.now().isoformat(),
+                "msg_id": get_message_id(len(st.session_state.history), "assistant", answer),
+                "query": contextualized_prompt,
+                "sources": sources,
+                "feedback": None,
+                "feedback_timestamp": None
+            }
+            st.session_state.history.append(assistant_msg)
+            simpan_chat_log(assistant_msg)
+            st.rerun()
+
+        except Exception as e:
+            st.error(f"Terjadi error: {e}")
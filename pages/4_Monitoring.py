@@ -1,8 +1,8 @@
 import streamlit as st
 import os
-import json
-from collections import Counter
-from langchain.docstore.document import Document
+from datetime import date, timedelta
+from chat_log_stats import ChatLogAggregator
+from chat_log_store import ChatLogStore
 
 st.set_page_config(page_title="Monitoring Sistem", layout="wide")
 st.title("\U0001F4CA Monitoring Sistem Chatbot KMS")
@@ -15,49 +15,42 @@ if not st.session_state.get("logged_in") or st.session_state.get("role") != "adm
 LOG_FOLDER = "chat_logs"
 os.makedirs(LOG_FOLDER, exist_ok=True)
 
-jumlah_pertanyaan = 0
-jumlah_jawaban = 0
 jumlah_dokumen = 0
 jumlah_chunk = 0
-feedback_counter = Counter()
-chat_negatif = []
-
-# Ambil data dari log
-for filename in os.listdir(LOG_FOLDER):
-    if filename.endswith(".json"):
-        filepath = os.path.join(LOG_FOLDER, filename)
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for i, item in enumerate(data):
-                    if item.get("role") == "user":
-                        jumlah_pertanyaan += 1
-                    elif item.get("role") == "assistant":
-                        jumlah_jawaban += 1
-                        if item.get("feedback"):
-                            feedback_counter[item.get("feedback")] += 1
-                            if item.get("feedback") == "NOT_OK":
-                                previous = data[i - 1] if i > 0 and data[i - 1]["role"] == "user" else {"content": "(tidak ditemukan)"}
-                                chat_negatif.append({
-                                    "file": filename,
-                                    "timestamp": item.get("timestamp", "-"),
-                                    "pertanyaan": previous["content"],
-                                    "jawaban": item.get("content"),
-                                    "sources": item.get("sources", [])
-                                })
-        except Exception as e:
-            st.warning(f"Gagal membaca {filename}: {e}")
+dokumen_unik = set()
+
+
+@st.cache_resource
+def get_log_aggregator(log_folder: str) -> ChatLogAggregator:
+    return ChatLogAggregator(log_folder)
+
+
+@st.cache_resource
+def get_chat_log_store(log_folder: str) -> ChatLogStore:
+    return ChatLogStore(log_folder)
+
+
+# Ambil data dari log: hanya file yang berubah sejak rerun terakhir yang di-parse ulang
+aggregator = get_log_aggregator(LOG_FOLDER)
+aggregator.refresh()
+for filename, error in aggregator.errors.items():
+    st.warning(f"Gagal membaca {filename}: {error}")
+
+totals = aggregator.totals()
+jumlah_pertanyaan = totals["questions"]
+jumlah_jawaban = totals["answers"]
+feedback_counter = totals["feedback"]
+chat_negatif = totals["negatives"]
 
 # Ambil jumlah dokumen dari RAG
 rag = st.session_state.get("rag_engine")
 if rag:
     try:
-        vs_data = rag.vectorstore.get()
-        all_chunks = vs_data.get("documents", [])
-        all_metadatas = vs_data.get("metadatas", [])
-        dokumen_unik = {meta.get("source") or meta.get("file") or meta.get("filename") for meta in all_metadatas if meta}
-        jumlah_dokumen = len(dokumen_unik)
-        jumlah_chunk = len(all_chunks)
+        # Statistik di memori engine (diperbarui saat ingest/hapus), tanpa scan collection
+        stats = rag.get_collection_stats()
+        jumlah_dokumen = stats["file_count"]
+        jumlah_chunk = stats["chunk_count"]
+        dokumen_unik = set(stats["per_file"])
     except:
         jumlah_dokumen = 0
         jumlah_chunk = 0
@@ -90,14 +83,13 @@ if clicked == "\U0001F44E Negatif" and chat_negatif:
                 st.markdown(f"- **Chunk ID**: `{chunk_id}`")
                 st.markdown(f"- **Skor**: `{source.get('score', '-')}`")
 
-                # Ambil isi lengkap chunk dari vectorstore
+                # Ambil isi lengkap chunk lewat index chunk_id
                 chunk_full_text = ""
+                chunk = None
                 try:
-                    all_data = rag.vectorstore.get()
-                    for content, meta in zip(all_data["documents"], all_data["metadatas"]):
-                        if meta.get("chunk_id") == chunk_id:
-                            chunk_full_text = content
-                            break
+                    chunk = rag.get_chunk(chunk_id)
+                    if chunk:
+                        chunk_full_text = chunk["text"]
                 except Exception as e:
                     st.warning(f"Gagal mengambil isi chunk lengkap: {e}")
 
@@ -106,29 +98,8 @@ if clicked == "\U0001F44E Negatif" and chat_negatif:
 
                 if st.button(f"💾 Simpan Revisi Chunk {j+1}", key=f"simpan_{chunk_id}_{i}_{j}"):
                     try:
-                        doc = Document(
-                            page_content=revised,
-                            metadata={
-                                "chunk_id": chunk_id,
-                                "source_file": source.get("file", "unknown"),
-                                "page": source.get("page", "N/A"),
-                                "chunk": revised[:100]
-                            }
-                        )
-                        # rag.vectorstore.delete(filter={"chunk_id": chunk_id})
-
-                        # Cari dan hapus berdasarkan chunk_id
-                        all_data = rag.vectorstore.get()
-                        delete_ids = []
-                        for idx, meta in enumerate(all_data["metadatas"]):
-                            if meta.get("chunk_id") == chunk_id:
-                                delete_ids.append(all_data["ids"][idx])
-                        if delete_ids:
-                            rag.vectorstore.delete(ids=delete_ids)
-
-
-                        rag.vectorstore.add_documents([doc])
-                        rag.vectorstore.persist()
+                        # Satu embedding ulang, id chunk tetap sama
+                        rag.update_chunk(chunk_id, revised)
                         st.success("✅ Chunk berhasil diperbarui.")
                     except Exception as e:
                         st.error(f"❌ Gagal memperbarui chunk: {e}")
@@ -136,6 +107,24 @@ if clicked == "\U0001F44E Negatif" and chat_negatif:
 elif clicked == "\U0001F44E Negatif":
     st.info("Tidak ada jawaban yang mendapat feedback negatif.")
 
+# Telusuri riwayat chat berdasarkan tanggal, user, dan feedback
+with st.expander("\U0001F5C2 Riwayat Chat"):
+    col_tgl, col_user, col_fb = st.columns(3)
+    rentang = col_tgl.date_input("Rentang tanggal", value=(date.today() - timedelta(days=7), date.today()))
+    filter_user = col_user.text_input("Username")
+    filter_fb = col_fb.selectbox("Feedback", ["Semua", "OK", "NOT_OK"])
+    if isinstance(rentang, (tuple, list)) and len(rentang) == 2:
+        pesan = get_chat_log_store(LOG_FOLDER).read_messages(
+            start_date=rentang[0],
+            end_date=rentang[1],
+            username=filter_user.strip() or None,
+            feedback=None if filter_fb == "Semua" else filter_fb,
+        )
+        st.caption(f"{len(pesan)} pesan ditemukan")
+        for item in pesan[-200:]:
+            label = "❓" if item.get("role") == "user" else "💬"
+            st.markdown(f"{label} `{item.get('timestamp', '-')}` **{item.get('username', '-')}**: {item.get('content', '')}")
+
 # Tampilkan daftar dokumen
 with st.expander("\U0001F4C2 Daftar Nama Dokumen"):
     if jumlah_dokumen > 0:
@@ -1,15 +1,155 @@
+from __future__ import annotations
+
 import os
+import asyncio
 import shutil
 import json
-from typing import List, Dict, Any, Optional
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import TextLoader, PyPDFLoader
-from langchain.docstore.document import Document
-from langchain.chat_models import ChatOpenAI
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+import random
+import time
+import functools
+from datetime import datetime
+import importlib
+import threading
+from contextlib import contextmanager
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Callable, Tuple, Iterator, TYPE_CHECKING
 import numpy as np
+from embedding_cache import EmbeddingCache, CachedEmbeddings, text_hash, normalize_text
+from answer_cache import AnswerCache
+from lexical_index import LexicalIndex
+from chunk_index import ChunkIndex
+from near_duplicates import find_near_duplicates
+from async_http import use_openai_session
+from context_packer import ContextPacker
+from reranker import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+from flat_vectorstore import FlatVectorStore
+from embedding_backends import DEFAULT_LOCAL_MODEL, DEFAULT_OPENAI_MODEL, backend_model_name, embedding_signature
+from document_meta import (
+    DOCUMENT_METADATA_FIELDS, DEFAULT_DOCUMENT_TYPE, RESTRICTED_DOCUMENT_TYPE, document_metadata, read_document_metadata,
+)
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+# langchain dan chromadb butuh beberapa detik untuk diimpor, jadi baru dimuat saat
+# pertama kali dipakai. Nama-nama ini tetap bisa diakses (dan di-patch) sebagai rag_engine.X
+_LAZY_IMPORTS = {
+    "OpenAIEmbeddings": "langchain.embeddings.openai",
+    "Chroma": "langchain.vectorstores",
+    "RecursiveCharacterTextSplitter": "langchain.text_splitter",
+    "TextLoader": "langchain.document_loaders",
+    "PyPDFLoader": "langchain.document_loaders",
+    "Document": "langchain.docstore.document",
+    "ChatOpenAI": "langchain.chat_models",
+    "LocalEmbeddings": "embedding_backends",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _lazy(name: str):
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+def make_chunk_id(source_file: str, page: Any, start_index: Any, text: str) -> str:
+    """Id chunk deterministik dari file, halaman, offset, dan hash isi.
+
+    Dipakai sekaligus sebagai id di Chroma, sehingga mengindeks ulang chunk yang
+    sama menimpa vektor lama (upsert) alih-alih menumpuk duplikat.
+    """
+    return f"{source_file}_p{page}_{start_index}_{text_hash(text)[:16]}"
+
+
+def load_single_file(path: str) -> List[Document]:
+    """Load a single file based on its extension (module-level agar bisa dipakai process pool)."""
+    doc_metadata = read_document_metadata(path)
+    if path.endswith(".pdf"):
+        try:
+            loader = _lazy("PyPDFLoader")(path)
+            pages = loader.load()
+            for i, page in enumerate(pages):
+                page.metadata.update(doc_metadata)
+                page.metadata["source_file"] = os.path.basename(path)
+                page.metadata["page"] = str(i + 1)
+            print(f"Loaded PDF: {path} with {len(pages)} pages")
+            return pages
+        except Exception as e:
+            print(f"Error loading PDF {path}: {e}")
+            return []
+            
+    elif path.endswith(".txt"):
+        try:
+            loader = _lazy("TextLoader")(path, encoding="utf-8")
+            text_docs = loader.load()
+            for doc in text_docs:
+                doc.metadata.update(doc_metadata)
+                doc.metadata["source_file"] = os.path.basename(path)
+                doc.metadata["page"] = "1"
+            print(f"Loaded TXT: {path} with {len(text_docs)} documents")
+            return text_docs
+        except Exception as e:
+            print(f"Error loading TXT {path}: {e}")
+            return []
+    else:
+        print(f"Unsupported file format: {path}")
+        return []
+
+
+class ReadWriteLock:
+    """Banyak pembaca bersamaan, satu penulis; penulis yang menunggu didahulukan."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _exclusive(method):
+    """Serialisasi operasi tulis (ingest, sync, hapus) antar sesi yang berbagi satu engine."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._ingest_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class RAGEngine:
     def __init__(
@@ -18,30 +158,172 @@ class RAGEngine:
         use_in_memory: bool = False,
         openai_api_key: Optional[str] = None,
         reset_db: bool = False,
+        use_embedding_cache: bool = True,
+        embedding_cache_path: Optional[str] = None,
+        embedding_cache_size: int = 50000,
+        loader_workers: int = 1,
+        embed_batch_size: int = 64,
+        embed_concurrency: int = 4,
+        embed_max_retries: int = 5,
+        use_answer_cache: bool = True,
+        answer_cache_threshold: float = 0.95,
+        use_hybrid_search: bool = True,
+        hybrid_candidates: int = 20,
+        near_duplicate_threshold: Optional[float] = 0.85,
+        dedup_mode: str = "collapse",
+        speculative_reuse_threshold: float = 0.95,
+        embed_timeout: float = 15.0,
+        retrieval_timeout: float = 10.0,
+        llm_timeout: float = 60.0,
+        context_token_budget: Optional[int] = 1500,
+        use_reranker: bool = False,
+        reranker_model: str = DEFAULT_RERANKER_MODEL,
+        rerank_candidates: int = 20,
+        rerank_top_n: int = 5,
+        rerank_threshold: Optional[float] = None,
+        embedding_provider: Optional[str] = None,
+        embedding_model: Optional[str] = None,
+        embedding_threads: Optional[int] = None,
+        embedding_backend: str = "torch",
+        vector_store: Optional[str] = None,
+        vector_compression: Optional[str] = None,
     ):
         self.use_in_memory = use_in_memory
         self.persist_directory = persist_directory if not use_in_memory else None
         self.openai_api_key = openai_api_key or os.environ.get("OPENAI_API_KEY")
         self.reset_db = reset_db
+        # "chroma" (HNSW) atau "flat" (matriks .npy ter-mmap, pencarian exact)
+        self.vector_store = (vector_store or os.environ.get("VECTOR_STORE") or "chroma").lower()
+        if self.vector_store not in ("chroma", "flat"):
+            raise ValueError(f"vector_store tidak dikenal: {self.vector_store!r} (pilih 'chroma' atau 'flat')")
+        # Kompresi embedding (float16/int8/pca) dengan skor ulang float32, hanya untuk flat index
+        self.vector_compression = (vector_compression or os.environ.get("VECTOR_COMPRESSION") or "").lower() or None
+        if self.vector_compression and self.vector_store != "flat":
+            raise ValueError("vector_compression hanya didukung dengan vector_store='flat'")
+
+        # Engine dipakai bersama oleh semua sesi: penulis diserialisasi lewat _ingest_lock,
+        # sedangkan _rw_lock hanya dikunci tulis sesaat saat collection benar-benar diubah
+        self._ingest_lock = threading.RLock()
+        self._rw_lock = ReadWriteLock()
+        self.loader_workers = max(1, loader_workers)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.embed_max_retries = embed_max_retries
+        self.embed_retry_base_delay = 1.0
 
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-ada-002",
-            openai_api_key=self.openai_api_key
+        # Progres ingest terakhir, bisa ditampilkan di halaman upload
+        self.ingest_progress: Dict[str, Any] = {"status": "idle"}
+        self._journal: Dict[str, Any] = {}
+
+        # Provider embedding: "openai" (default) atau "local" (sentence-transformers di CPU)
+        self.embedding_provider = (embedding_provider or os.environ.get("EMBEDDING_PROVIDER") or "openai").lower()
+        if self.embedding_provider == "openai":
+            self.embedding_model = embedding_model or os.environ.get("EMBEDDING_MODEL") or DEFAULT_OPENAI_MODEL
+            self.embeddings = _lazy("OpenAIEmbeddings")(
+                model=self.embedding_model,
+                openai_api_key=self.openai_api_key
+            )
+        elif self.embedding_provider == "local":
+            self.embedding_model = embedding_model or os.environ.get("EMBEDDING_MODEL") or DEFAULT_LOCAL_MODEL
+            self.embeddings = _lazy("LocalEmbeddings")(
+                model_name=self.embedding_model,
+                batch_size=self.embed_batch_size,
+                num_threads=embedding_threads,
+                backend=embedding_backend,
+            )
+        else:
+            raise ValueError(f"embedding_provider tidak dikenal: {self.embedding_provider!r} (pilih 'openai' atau 'local')")
+        # Backend lokal ikut dicatat: vektor torch/quantized/onnx tidak boleh tercampur
+        self.embedding_backend = embedding_backend if self.embedding_provider == "local" else None
+        # Nama model yang dicatat di metadata collection agar vektor dua model tidak tercampur
+        self.embedding_signature = embedding_signature(
+            self.embedding_provider, self.embedding_model, self.embedding_backend
         )
 
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        # Cache embedding disimpan di samping chroma_db agar tetap ada setelah reset_db
+        self.embedding_cache = None
+        if use_embedding_cache:
+            if embedding_cache_path is None:
+                if self.persist_directory:
+                    parent_dir = os.path.dirname(os.path.normpath(self.persist_directory))
+                    embedding_cache_path = os.path.join(parent_dir, "embedding_cache.db")
+                else:
+                    embedding_cache_path = ":memory:"
+            self.embedding_cache = EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_size)
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                self.embedding_cache,
+                model_name=backend_model_name(self.embedding_model, self.embedding_backend)
+            )
+
+        self.text_splitter = _lazy("RecursiveCharacterTextSplitter")(
             chunk_size=2000,
             chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
+            separators=["\n\n", "\n", ". ", " ", ""],
+            add_start_index=True
         )
 
+        # Deteksi near-duplicate saat ingest; None untuk menonaktifkan
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.dedup_mode = dedup_mode
+        self.last_dedup_report: Optional[Dict[str, Any]] = None
+
         self._initialize_vectorstore()
 
-        self.llm = ChatOpenAI(
-            model_name="gpt-3.5-turbo",
-            temperature=0.2,
-            openai_api_key=self.openai_api_key
+        # Statistik collection di memori: jumlah chunk, per file, dan waktu perubahan terakhir
+        self._stats: Dict[str, Any] = {"chunk_count": 0, "per_file": {}, "last_modified": None}
+        self.refresh_stats()
+
+        # Manifest file yang sudah terindeks (hash isi, ukuran, versi .meta.json)
+        self._manifest = self._load_manifest()
+
+        # Cache jawaban ada di dalam chroma_db sehingga ikut terhapus saat reset_db
+        self.answer_cache = None
+        if use_answer_cache:
+            answer_cache_path = (
+                os.path.join(self.persist_directory, "answer_cache.db") if self.persist_directory else ":memory:"
+            )
+            self.answer_cache = AnswerCache(answer_cache_path, threshold=answer_cache_threshold)
+
+        # Anggaran token konteks prompt; None berarti semua chunk disertakan utuh
+        self.context_packer = ContextPacker(context_token_budget) if context_token_budget else None
+
+        # Re-ranking opsional: ambil rerank_candidates kandidat, kirim rerank_top_n terbaik ke LLM
+        self.reranker = CrossEncoderReranker(reranker_model) if use_reranker else None
+        self.rerank_candidates = rerank_candidates
+        self.rerank_top_n = rerank_top_n
+        self.rerank_threshold = rerank_threshold
+
+        # Batas waktu per tahap untuk aquery()
+        self.stage_timeouts = {"embedding": embed_timeout, "retrieval": retrieval_timeout, "llm": llm_timeout}
+
+        # Retrieval spekulatif (pertanyaan mentah) dipakai ulang bila kemiripannya di atas ambang ini
+        self.speculative_reuse_threshold = speculative_reuse_threshold
+
+        # Index BM25 untuk rujukan pasal dan singkatan, disimpan bersama chroma_db
+        self.hybrid_candidates = hybrid_candidates
+        self.lexical_index = None
+        if use_hybrid_search:
+            lexical_path = (
+                os.path.join(self.persist_directory, "lexical_index.db") if self.persist_directory else ":memory:"
+            )
+            self.lexical_index = LexicalIndex(lexical_path)
+            self._backfill_lexical_index()
+
+        # Peta chunk_id -> id Chroma untuk get_chunk
+        self.chunk_index = ChunkIndex(
+            os.path.join(self.persist_directory, "chunk_index.db") if self.persist_directory else ":memory:"
         )
+        self._backfill_chunk_index()
+
+        # Dengan embedding lokal tanpa API key retrieval tetap jalan, hanya jawaban LLM yang tidak tersedia
+        self.llm = None
+        if self.openai_api_key or self.embedding_provider == "openai":
+            self.llm = _lazy("ChatOpenAI")(
+                model_name="gpt-3.5-turbo",
+                temperature=0.2,
+                openai_api_key=self.openai_api_key
+            )
 
         self.template = """
         [INSTRUKSI]
@@ -68,111 +350,525 @@ class RAGEngine:
                 print(f"Created directory: {self.persist_directory}")
             
             # Initialize the vectorstore
-            self.vectorstore = Chroma(
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory
-            )
+            if self.vector_store == "flat":
+                self.vectorstore = FlatVectorStore(
+                    os.path.join(self.persist_directory, "flat_index") if self.persist_directory else None,
+                    embedding_function=self.embeddings,
+                    compression=self.vector_compression
+                )
+                self._import_from_chroma()
+            else:
+                self.vectorstore = _lazy("Chroma")(
+                    embedding_function=self.embeddings,
+                    persist_directory=self.persist_directory
+                )
             print(f"Vectorstore initialized with persist_directory: {self.persist_directory}")
             
             # Try to check if documents exist
+            count = 0
             try:
                 collection = self.vectorstore._collection
                 count = collection.count()
                 print(f"Found {count} documents in vectorstore")
             except Exception as e:
                 print(f"Could not get document count: {e}")
+
+            self._check_embedding_model(count)
                 
         except Exception as e:
             print(f"Error initializing vectorstore: {e}")
             raise
 
-    def load_documents(self, path: str) -> List[Document]:
-        """Load documents from a file or directory."""
-        docs = []
+    def _import_from_chroma(self, page_size: int = 1000) -> None:
+        """Salin vektor dari collection Chroma yang sudah ada ke flat index kosong, tanpa embedding ulang."""
+        target = self.vectorstore._collection
+        if not self.persist_directory or target.count() > 0:
+            return
+        if not os.path.exists(os.path.join(self.persist_directory, "chroma.sqlite3")):
+            return
+
+        source = _lazy("Chroma")(persist_directory=self.persist_directory)._collection
+        if source.count() == 0:
+            return
+        if source.metadata:
+            target.modify(metadata=source.metadata)
+        offset = 0
+        while True:
+            page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            target.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                          metadatas=page["metadatas"], documents=page["documents"])
+            offset += len(page["ids"])
+        print(f"Flat index diisi dari collection Chroma: {offset} chunk")
+
+    def _check_embedding_model(self, count: int) -> None:
+        """Pastikan collection dibangun dengan model embedding yang sama; catat bila belum ada."""
+        collection = self.vectorstore._collection
+        metadata = collection.metadata
+        if metadata is None:
+            metadata = {}
+        elif not isinstance(metadata, dict):
+            return
+
+        recorded = metadata.get("embedding_model")
+        if recorded is None and count > 0:
+            # Collection lama sebelum ada pencatatan model selalu dibangun dengan ada-002
+            recorded = embedding_signature("openai", DEFAULT_OPENAI_MODEL)
+        if recorded is not None and recorded != self.embedding_signature:
+            raise ValueError(
+                f"Collection di {self.persist_directory} dibangun dengan model embedding '{recorded}', "
+                f"bukan '{self.embedding_signature}'. Gunakan provider/model yang sama "
+                f"(EMBEDDING_PROVIDER/EMBEDDING_MODEL/EMBEDDING_BACKEND) atau reset database lalu indeks ulang dokumen."
+            )
+        if metadata.get("embedding_model") != self.embedding_signature:
+            collection.modify(metadata={**metadata, "embedding_model": self.embedding_signature})
+            print(f"Model embedding collection dicatat: {self.embedding_signature}")
+
+    def warm_up(self, background: bool = True, docs_directory: Optional[str] = None) -> Optional[threading.Thread]:
+        """Muat index HNSW Chroma, index BM25, dan model reranker (bila aktif) sebelum pertanyaan pertama.
+
+        Tidak memanggil API: vektor contoh diambil dari collection sendiri. Bila docs_directory
+        diberikan, metadata dokumen yang belum ada di chunk sekalian disalin (sync_document_metadata).
+        """
+        def _run():
+            start = time.time()
+            try:
+                with self._rw_lock.read():
+                    collection = self.vectorstore._collection
+                    sample = collection.get(limit=1, include=["embeddings"])
+                    if sample["embeddings"]:
+                        collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+                    if self.lexical_index is not None:
+                        self.lexical_index.search("kereta api", k=1)
+                if self.reranker is not None:
+                    self.reranker.warm_up()
+                print(f"Warm-up selesai dalam {time.time() - start:.2f}s")
+            except Exception as e:
+                print(f"Warm-up gagal: {e}")
+            if docs_directory and os.path.isdir(docs_directory):
+                try:
+                    self.sync_document_metadata(docs_directory)
+                except Exception as e:
+                    print(f"Sinkronisasi metadata dokumen gagal: {e}")
+
+        if not background:
+            _run()
+            return None
+        thread = threading.Thread(target=_run, name="rag-engine-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def refresh_stats(self) -> Dict[str, Any]:
+        """Hitung ulang statistik dari collection lewat scan metadata per halaman."""
+        try:
+            chunk_count = 0
+            per_file = {}
+            for _, meta in self.iter_metadatas():
+                chunk_count += 1
+                filename = meta.get("source_file")
+                if filename:
+                    per_file[filename] = per_file.get(filename, 0) + 1
+            last_modified = self._stats.get("last_modified")
+            if last_modified is None and self.persist_directory:
+                sqlite_path = os.path.join(self.persist_directory, "chroma.sqlite3")
+                if os.path.exists(sqlite_path):
+                    last_modified = datetime.fromtimestamp(os.path.getmtime(sqlite_path)).isoformat()
+            self._stats = {
+                "chunk_count": chunk_count,
+                "per_file": per_file,
+                "last_modified": last_modified,
+            }
+        except Exception as e:
+            print(f"Could not compute collection stats: {e}")
+        return self.get_collection_stats()
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """Statistik collection dari memori: chunk_count, per_file, last_modified."""
+        stats = dict(self._stats)
+        stats["per_file"] = dict(sorted(stats["per_file"].items()))
+        stats["file_count"] = len(stats["per_file"])
+        return stats
+
+    def _record_added(self, metadatas: List[Dict[str, Any]]) -> None:
+        per_file = self._stats["per_file"]
+        for meta in metadatas:
+            filename = meta.get("source_file")
+            if filename:
+                per_file[filename] = per_file.get(filename, 0) + 1
+        self._stats["chunk_count"] += len(metadatas)
+        self._stats["last_modified"] = datetime.now().isoformat()
+
+    def _record_deleted(self, filename: str) -> None:
+        removed = self._stats["per_file"].pop(filename, 0)
+        self._stats["chunk_count"] = max(0, self._stats["chunk_count"] - removed)
+        self._stats["last_modified"] = datetime.now().isoformat()
+
+    def load_documents(self, path: str, workers: Optional[int] = None) -> List[Document]:
+        """Load documents from a file or directory.
+
+        Dengan workers > 1, file di-parse paralel dalam process pool. Urutan hasil
+        selalu mengikuti urutan nama file sehingga tetap deterministik.
+        """
         if os.path.isdir(path):
             # Process directory
+            file_paths = []
             for root, _, files in os.walk(path):
                 for file in files:
                     if file.endswith(".meta.json"):  # Skip metadata files
                         continue
-                    file_path = os.path.join(root, file)
-                    loaded_docs = self._load_single_file(file_path)
-                    docs.extend(loaded_docs)
+                    file_paths.append(os.path.join(root, file))
+            file_paths.sort()
         else:
             # Process single file
-            loaded_docs = self._load_single_file(path)
-            docs.extend(loaded_docs)
-        
+            file_paths = [path]
+
+        docs = self._load_files(file_paths, workers)
         print(f"Loaded {len(docs)} documents from {path}")
         return docs
 
+    def _load_files(self, file_paths: List[str], workers: Optional[int] = None) -> List[Document]:
+        workers = self.loader_workers if workers is None else workers
+        if workers <= 1 or len(file_paths) <= 1:
+            return [doc for file_path in file_paths for doc in load_single_file(file_path)]
+
+        docs = []
+        try:
+            # spawn, bukan fork: proses Streamlit sudah punya banyak thread dan lock (Chroma, sqlite, tornado)
+            # yang bisa membuat child hasil fork macet
+            with ProcessPoolExecutor(max_workers=min(workers, len(file_paths)),
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                # executor.map menjaga urutan input
+                for loaded_docs in executor.map(load_single_file, file_paths):
+                    docs.extend(loaded_docs)
+        except Exception as e:
+            print(f"Parallel loading failed, falling back to serial: {e}")
+            docs = [doc for file_path in file_paths for doc in load_single_file(file_path)]
+        return docs
+
     def _load_single_file(self, path: str) -> List[Document]:
         """Load a single file based on its extension."""
-        if path.endswith(".pdf"):
-            try:
-                loader = PyPDFLoader(path)
-                pages = loader.load()
-                for i, page in enumerate(pages):
-                    page.metadata["source_file"] = os.path.basename(path)
-                    page.metadata["page"] = str(i + 1)
-                print(f"Loaded PDF: {path} with {len(pages)} pages")
-                return pages
-            except Exception as e:
-                print(f"Error loading PDF {path}: {e}")
-                return []
-                
-        elif path.endswith(".txt"):
-            try:
-                loader = TextLoader(path, encoding="utf-8")
-                text_docs = loader.load()
-                for doc in text_docs:
-                    doc.metadata["source_file"] = os.path.basename(path)
-                    doc.metadata["page"] = "1"
-                print(f"Loaded TXT: {path} with {len(text_docs)} documents")
-                return text_docs
-            except Exception as e:
-                print(f"Error loading TXT {path}: {e}")
-                return []
-        else:
-            print(f"Unsupported file format: {path}")
-            return []
+        return load_single_file(path)
 
     def process_documents(self, documents: List[Document]) -> List[Document]:
+        self.last_dedup_report = None
         if not documents:
             print("No documents to process")
             return []
             
         chunks = self.text_splitter.split_documents(documents)
         print(f"Split {len(documents)} documents into {len(chunks)} chunks")
-        
-        for i, chunk in enumerate(chunks):
+
+        unique_chunks = []
+        seen_ids = set()
+        for chunk in chunks:
             chunk.metadata["chunk"] = chunk.page_content[:100]
             chunk.metadata["page"] = chunk.metadata.get("page", "N/A")
-            chunk.metadata["chunk_id"] = f"{chunk.metadata.get('source_file', 'unknown')}_{i}"
             chunk.metadata["source_file"] = chunk.metadata.get("source_file", "unknown")
-        
+            # Tanpa jenis_dokumen, chunk tidak akan lolos filter role (mis. pengguna biasa)
+            chunk.metadata.setdefault("jenis_dokumen", DEFAULT_DOCUMENT_TYPE)
+            chunk.metadata["chunk_id"] = make_chunk_id(
+                chunk.metadata["source_file"], chunk.metadata["page"],
+                chunk.metadata.get("start_index", 0), chunk.page_content
+            )
+            # File yang sama ikut termuat dua kali menghasilkan id yang sama
+            if chunk.metadata["chunk_id"] in seen_ids:
+                continue
+            seen_ids.add(chunk.metadata["chunk_id"])
+            unique_chunks.append(chunk)
+        if len(unique_chunks) < len(chunks):
+            print(f"Skipped {len(chunks) - len(unique_chunks)} duplicate chunks")
+        chunks = unique_chunks
+
+        if self.near_duplicate_threshold:
+            chunks = self._handle_near_duplicates(chunks)
+
         if chunks:
             print(f"Sample chunk: {chunks[0].page_content[:50]}...")
         
         return chunks
 
-    def index_documents(self, documents: List[Document]) -> None:
+    def _handle_near_duplicates(self, chunks: List[Document]) -> List[Document]:
+        """Buang atau tandai chunk yang hampir sama (MinHash/LSH) dan simpan laporannya.
+
+        Mode "collapse" membuang duplikat dalam file yang sama; duplikat lintas file
+        (dan semua duplikat pada mode "mark") tetap disimpan dengan metadata
+        duplicate_of, agar hapus dokumen tidak menghilangkan isi file lain.
+        Retrieval hanya mengembalikan satu chunk per kelompok duplicate_of.
+
+        Batasan: hanya chunk dalam satu pemanggilan ingest yang dibandingkan. Boilerplate
+        di file yang baru diunggah tidak dicocokkan dengan dokumen yang sudah terindeks;
+        sync_directory atas banyak file sekaligus (atau re-indeks penuh) menangkapnya.
+        """
+        duplicates = find_near_duplicates([c.page_content for c in chunks], self.near_duplicate_threshold)
+        kept = []
+        removed = 0
+        marked = 0
+        examples = []
+        for i, chunk in enumerate(chunks):
+            rep = duplicates.get(i)
+            if rep is None:
+                kept.append(chunk)
+                continue
+            rep_meta = chunks[rep].metadata
+            if len(examples) < 10:
+                examples.append({
+                    "chunk_id": chunk.metadata["chunk_id"],
+                    "duplicate_of": rep_meta["chunk_id"],
+                    "preview": chunk.page_content[:100],
+                })
+            if self.dedup_mode == "collapse" and rep_meta.get("source_file") == chunk.metadata.get("source_file"):
+                removed += 1
+                continue
+            chunk.metadata["duplicate_of"] = rep_meta["chunk_id"]
+            marked += 1
+            kept.append(chunk)
+
+        self.last_dedup_report = {
+            "chunks_in": len(chunks),
+            "chunks_out": len(kept),
+            "removed": removed,
+            "marked": marked,
+            "examples": examples,
+        }
+        if removed or marked:
+            print(f"Near-duplicate: {removed} chunk dibuang, {marked} ditandai dari {len(chunks)} chunk")
+        return kept
+
+    @_exclusive
+    def index_documents(
+        self,
+        documents: List[Document],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        replace_sources: Optional[List[str]] = None,
+    ) -> bool:
+        """Embed dan simpan chunk per batch secara paralel.
+
+        Progres dicatat di journal sehingga pemanggilan ulang dengan chunk yang sama
+        melanjutkan dari batch yang belum selesai, bukan mengulang dari awal.
+        Untuk file di replace_sources, chunk baru di-upsert dulu; chunk lama yang id-nya
+        tidak lagi dipakai baru dihapus setelah semua batch berhasil, sehingga file itu
+        tetap bisa ditemukan selama ingest berjalan.
+        """
         if not documents:
+            for filename in replace_sources or []:
+                self.delete_document(filename)
             print("No documents to index")
-            return
-            
-        print(f"Indexing {len(documents)} chunks")
-        try:
-            self.vectorstore.add_documents(documents)
-            if not self.use_in_memory and self.persist_directory:
+            return True
+
+        # Id = chunk_id deterministik; id yang sama dalam satu batch cukup ditulis sekali
+        texts = []
+        metadatas = []
+        seen_ids = set()
+        for doc in documents:
+            metadata = dict(doc.metadata)
+            metadata["chunk_id"] = metadata.get("chunk_id") or make_chunk_id(
+                metadata.get("source_file", "unknown"), metadata.get("page", "N/A"),
+                metadata.get("start_index", 0), doc.page_content
+            )
+            if metadata["chunk_id"] in seen_ids:
+                continue
+            seen_ids.add(metadata["chunk_id"])
+            texts.append(doc.page_content)
+            metadatas.append(metadata)
+        ids = [m["chunk_id"] for m in metadatas]
+        batches = [
+            list(range(start, min(start + self.embed_batch_size, len(texts))))
+            for start in range(0, len(texts), self.embed_batch_size)
+        ]
+
+        job_id = hashlib.sha256(
+            "\n".join(text_hash(t) + json.dumps(m, sort_keys=True) for t, m in zip(texts, metadatas)).encode("utf-8")
+        ).hexdigest()
+        journal = self._load_journal()
+        if journal.get("job_id") == job_id:
+            completed = set(journal.get("completed_batches", []))
+            print(f"Resuming ingest: {len(completed)}/{len(batches)} batches already done")
+        else:
+            completed = set()
+            journal = {"job_id": job_id, "completed_batches": []}
+            self._save_journal(journal)
+
+        progress = self.ingest_progress
+        progress.update({
+            "status": "running",
+            "total_chunks": len(texts),
+            "indexed_chunks": sum(len(batches[b]) for b in completed),
+            "total_batches": len(batches),
+            "completed_batches": len(completed),
+            "failed_batches": 0,
+            "resumed_batches": len(completed),
+            "retries": 0,
+            "error": None,
+        })
+        if progress_callback:
+            progress_callback(dict(progress))
+
+        # Jawaban yang mengutip file yang sedang diindeks ulang tidak lagi valid
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_sources(
+                {m.get("source_file") for m in metadatas if m.get("source_file")} | set(replace_sources or [])
+            )
+
+        print(f"Indexing {len(texts)} chunks in {len(batches)} batches "
+              f"(batch={self.embed_batch_size}, concurrency={self.embed_concurrency})")
+        pending = [b for b in range(len(batches)) if b not in completed]
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as executor:
+            futures = {
+                executor.submit(self._embed_batch_with_retry, [texts[i] for i in batches[b]]): b
+                for b in pending
+            }
+            for future in as_completed(futures):
+                b = futures[future]
+                idx = batches[b]
+                try:
+                    embeddings = future.result()
+                    # Penulisan ke Chroma dilakukan di thread ini saja (satu penulis)
+                    with self._rw_lock.write():
+                        batch_ids = [ids[i] for i in idx]
+                        existing = set(self.vectorstore._collection.get(ids=batch_ids, include=[])["ids"])
+                        self.vectorstore._collection.upsert(
+                            ids=[ids[i] for i in idx],
+                            embeddings=embeddings,
+                            metadatas=[metadatas[i] for i in idx],
+                            documents=[texts[i] for i in idx],
+                        )
+                        if self.lexical_index is not None:
+                            self.lexical_index.add(
+                                [ids[i] for i in idx], [texts[i] for i in idx], [metadatas[i] for i in idx]
+                            )
+                        self.chunk_index.add(
+                            (metadatas[i]["chunk_id"], ids[i], metadatas[i].get("source_file"))
+                            for i in idx if metadatas[i].get("chunk_id")
+                        )
+                        self._record_added([metadatas[i] for i in idx if ids[i] not in existing])
+                except Exception as e:
+                    print(f"❌ Error during indexing batch {b + 1}/{len(batches)}: {e}")
+                    progress["failed_batches"] += 1
+                    progress["error"] = str(e)
+                else:
+                    completed.add(b)
+                    journal["completed_batches"] = sorted(completed)
+                    self._save_journal(journal)
+                    progress["completed_batches"] = len(completed)
+                    progress["indexed_chunks"] += len(idx)
+                if progress_callback:
+                    progress_callback(dict(progress))
+
+        if replace_sources and not progress["failed_batches"]:
+            self._remove_stale_chunks(replace_sources, set(ids))
+
+        if not self.use_in_memory and self.persist_directory:
+            try:
                 self.vectorstore.persist()
                 print("Vectorstore persisted to disk")
-            print(f"Successfully indexed {len(documents)} chunks")
+            except Exception as e:
+                print(f"Could not persist vectorstore: {e}")
+
+        if progress["failed_batches"]:
+            progress["status"] = "failed"
+            print(f"❌ Indexing incomplete: {progress['failed_batches']} batches failed, "
+                  f"jalankan ulang untuk melanjutkan ({progress['indexed_chunks']}/{len(texts)} chunks tersimpan)")
+            if progress_callback:
+                progress_callback(dict(progress))
+            return False
+
+        self._save_journal({})
+        progress["status"] = "done"
+        if progress_callback:
+            progress_callback(dict(progress))
+        print(f"Successfully indexed {len(texts)} chunks")
+        if self.embedding_cache is not None:
+            print(f"Embedding cache: {self.embeddings.hits} hit, {self.embeddings.misses} miss")
+        return True
+
+    def _remove_stale_chunks(self, sources: List[str], keep_ids: set) -> int:
+        """Hapus chunk milik sources yang tidak ada di keep_ids (sisa versi lama file)."""
+        stale = {
+            chunk_id: meta.get("source_file")
+            for filename in sources
+            for chunk_id, meta in self.iter_metadatas(where={"source_file": filename})
+            if chunk_id not in keep_ids
+        }
+        if stale:
+            self._delete_chunk_ids(stale)
+            print(f"Removed {len(stale)} stale chunks from {len(sources)} re-indexed files")
+        return len(stale)
+
+    def _delete_chunk_ids(self, sources_by_id: Dict[str, Optional[str]]) -> None:
+        """Hapus chunk per id dari Chroma, index BM25, index chunk, dan statistik."""
+        ids = list(sources_by_id)
+        with self._rw_lock.write():
+            for start in range(0, len(ids), 500):
+                self.vectorstore._collection.delete(ids=ids[start:start + 500])
+            if self.lexical_index is not None:
+                self.lexical_index.delete_ids(ids)
+            self.chunk_index.delete_ids(ids)
+            per_file = self._stats["per_file"]
+            for filename in sources_by_id.values():
+                if filename in per_file:
+                    per_file[filename] -= 1
+                    if per_file[filename] <= 0:
+                        per_file.pop(filename)
+            self._stats["chunk_count"] = max(0, self._stats["chunk_count"] - len(ids))
+            self._stats["last_modified"] = datetime.now().isoformat()
+
+    @staticmethod
+    def _is_retryable_error(error: Exception) -> bool:
+        name = type(error).__name__
+        message = str(error).lower()
+        return (
+            "RateLimit" in name
+            or name in ("Timeout", "APIConnectionError", "ServiceUnavailableError", "TryAgain")
+            or "rate limit" in message
+            or "429" in message
+        )
+
+    def _embed_batch_with_retry(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.embed_max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.embed_max_retries or not self._is_retryable_error(e):
+                    raise
+                delay = min(60.0, self.embed_retry_base_delay * (2 ** attempt)) * (0.5 + random.random())
+                self.ingest_progress["retries"] = self.ingest_progress.get("retries", 0) + 1
+                print(f"Rate limited, retrying batch in {delay:.1f}s ({attempt + 1}/{self.embed_max_retries})")
+                time.sleep(delay)
+
+    def _journal_path(self) -> Optional[str]:
+        if self.use_in_memory or not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, "ingest_journal.json")
+
+    def _load_journal(self) -> Dict[str, Any]:
+        path = self._journal_path()
+        if not path:
+            return dict(self._journal)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
         except Exception as e:
-            print(f"❌ Error during indexing: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"Could not read ingest journal: {e}")
+            return {}
 
+    def _save_journal(self, journal: Dict[str, Any]) -> None:
+        path = self._journal_path()
+        if not path:
+            self._journal = dict(journal)
+            return
+        if not journal:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(journal, f)
+        os.replace(tmp_path, path)
+
+    @_exclusive
     def load_and_index_documents(self, directory: str) -> int:
         print(f"Loading documents from {directory}")
         docs = self.load_documents(directory)
@@ -185,70 +881,538 @@ class RAGEngine:
         print(f"Indexed {len(chunks)} chunks from {directory}")
         return len(chunks)
 
-    def query(self, query: str, debug=False) -> Dict[str, Any]:
+    def _manifest_path(self) -> Optional[str]:
+        if self.use_in_memory or not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, "index_manifest.json")
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        path = self._manifest_path()
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Could not read index manifest: {e}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        path = self._manifest_path()
+        if not path:
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _hash_file(path: str) -> Optional[str]:
+        if not os.path.exists(path):
+            return None
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def _file_fingerprint(self, path: str, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fingerprint file; hash isi hanya dihitung ulang jika ukuran/mtime berubah."""
+        stat = os.stat(path)
+        fingerprint = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "meta_sha256": self._hash_file(path + ".meta.json"),
+            "meta_in_chunks": True,
+        }
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+            fingerprint["sha256"] = previous.get("sha256")
+        else:
+            fingerprint["sha256"] = self._hash_file(path)
+        return fingerprint
+
+    @_exclusive
+    def index_file(self, path: str, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> int:
+        """(Re)index satu file: hapus chunk lamanya, indeks ulang, dan catat di manifest."""
+        filename = os.path.basename(path)
+        chunks = self.process_documents(self.load_documents(path))
+        if not self.index_documents(chunks, progress_callback=progress_callback, replace_sources=[filename]):
+            raise RuntimeError(f"Gagal mengindeks {filename}")
+
+        self._manifest[filename] = self._file_fingerprint(path)
+        self._save_manifest()
+        return len(chunks)
+
+    @staticmethod
+    def _source_files(directory: str) -> Dict[str, str]:
+        """{nama file: path} untuk file .pdf/.txt di folder dokumen."""
+        current = {}
+        if os.path.isdir(directory):
+            for file in sorted(os.listdir(directory)):
+                if file.endswith(".pdf") or file.endswith(".txt"):
+                    current[file] = os.path.join(directory, file)
+        return current
+
+    @_exclusive
+    def _seed_manifest(self, current: Dict[str, str]) -> None:
+        """Isi manifest dari file yang sudah ada di collection (index lama tanpa manifest).
+
+        Isi file dianggap sama dengan yang terindeks, jadi sync berikutnya tidak mengembed
+        ulang seluruh korpus. meta_in_chunks=False agar metadata dokumen tetap disalin ke chunk.
+        """
+        if self._manifest or not self._stats["per_file"]:
+            return
+        for filename in self._stats["per_file"]:
+            if filename in current:
+                fingerprint = self._file_fingerprint(current[filename])
+                fingerprint["meta_in_chunks"] = False
+                self._manifest[filename] = fingerprint
+            else:
+                # Tidak ada lagi di folder: dihapus oleh sync
+                self._manifest[filename] = {}
+        print(f"Manifest diisi dari {len(self._manifest)} file yang sudah terindeks")
+        self._save_manifest()
+
+    def sync_directory(
+        self,
+        directory: str,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Sinkronkan index dengan isi folder: hanya file baru, berubah, atau terhapus yang diproses."""
+        summary = {"added": [], "changed": [], "removed": [], "metadata_updated": [], "unchanged": 0,
+                   "chunks": 0, "dedup": None}
+
+        current = self._source_files(directory)
+        self._seed_manifest(current)
+
+        for filename in sorted(set(self._manifest) - set(current)):
+            self.delete_document(filename)
+            summary["removed"].append(filename)
+
+        to_index = {}
+        for filename, path in current.items():
+            previous = self._manifest.get(filename)
+            fingerprint = self._file_fingerprint(path, previous)
+            if previous is None:
+                summary["added"].append(filename)
+            elif previous.get("sha256") != fingerprint["sha256"]:
+                summary["changed"].append(filename)
+            elif (previous.get("meta_sha256") != fingerprint["meta_sha256"]
+                    or not previous.get("meta_in_chunks")):
+                # Hanya .meta.json yang berubah: perbarui metadata chunk tanpa embedding ulang
+                self.update_document_metadata(path)
+                self._manifest[filename] = fingerprint
+                summary["metadata_updated"].append(filename)
+                continue
+            else:
+                # Isi sama (mungkin hanya mtime berubah), cukup perbarui manifest
+                self._manifest[filename] = fingerprint
+                summary["unchanged"] += 1
+                continue
+            to_index[filename] = fingerprint
+
+        if to_index:
+            documents = self._load_files([current[filename] for filename in to_index])
+            chunks = self.process_documents(documents)
+            # Chunk lama file yang diproses diganti agar tidak terduplikasi
+            if not self.index_documents(chunks, progress_callback=progress_callback,
+                                        replace_sources=list(to_index)):
+                self._save_manifest()
+                raise RuntimeError("Gagal mengindeks dokumen saat sinkronisasi")
+            self._manifest.update(to_index)
+            summary["chunks"] = len(chunks)
+            summary["dedup"] = self.last_dedup_report
+
+        self._save_manifest()
+        print(f"Sync {directory}: {len(summary['added'])} baru, {len(summary['changed'])} berubah, "
+              f"{len(summary['metadata_updated'])} metadata diperbarui, "
+              f"{len(summary['removed'])} dihapus, {summary['unchanged']} tetap")
+        return summary
+
+    @staticmethod
+    def build_where(filters: Optional[Dict[str, Any]] = None, role: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Susun filter metadata ala Chroma dari filters dan role pengguna.
+
+        filters berisi field metadata chunk, mis. {"jenis_dokumen": "D3"} atau
+        {"jenis_dokumen": ["D3", "D4"]} (list menjadi $in); operator Chroma juga boleh
+        dipakai langsung. Role selain "admin" tidak pernah melihat dokumen Rahasia.
+        """
+        clauses = []
+        for key, value in (filters or {}).items():
+            if value is None or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            if isinstance(value, (list, tuple, set)):
+                value = {"$in": list(value)}
+            clauses.append({key: value})
+        if role is not None and role != "admin":
+            clauses.append({"jenis_dokumen": {"$ne": RESTRICTED_DOCUMENT_TYPE}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    @staticmethod
+    def _scope(where: Optional[Dict[str, Any]]) -> str:
+        # Kunci answer cache: jawaban untuk filter berbeda tidak saling dipakai
+        return json.dumps(where, sort_keys=True) if where else ""
+
+    def _prepare_query(self, query: str, debug_info: Dict[str, Any],
+                       where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Tahap sebelum LLM: cek index, answer cache, retrieval, dan susun prompt.
+
+        Mengembalikan dict berisi "result" bila jawaban sudah tersedia (error atau cache hit),
+        atau berisi "prompt" bila jawaban masih harus dibuat oleh LLM. where membatasi
+        chunk yang dicari (lihat build_where).
+        """
+        early = self._check_index(debug_info)
+        if early:
+            return early
+
+        # Embedding pertanyaan dihitung sekali, dipakai untuk answer cache dan pencarian
+        query_embedding = self.embeddings.embed_query(query)
+
+        cached = self._lookup_answer(query_embedding, debug_info, where)
+        if cached:
+            return cached
+
+        docs_and_scores = self._retrieve_locked(query, query_embedding, debug_info, where)
+        return self._build_prompt(query, query_embedding, docs_and_scores, debug_info)
+
+    def _check_index(self, debug_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Jumlah chunk diambil dari statistik di memori, bukan count() per pertanyaan
+        try:
+            count = self._stats["chunk_count"]
+            if count == 0:
+                # Bisa jadi proses lain baru saja mengindeks; cek ulang sekali ke collection
+                self.refresh_stats()
+                count = self._stats["chunk_count"]
+            if count == 0:
+                print("❌ Tidak ada dokumen di vectorstore.")
+                return {
+                    "result": "Maaf, tidak ada dokumen yang tersedia untuk mencari jawaban. Silakan tambahkan dokumen terlebih dahulu.",
+                    "formatted_sources": [],
+                    "debug": {"error": "no_documents"}
+                }
+
+            print(f"Found {count} documents in vectorstore for query")
+            debug_info["document_count"] = count
+
+        except Exception as e:
+            print(f"❌ Error saat mengecek jumlah dokumen: {e}")
+            # Continue anyway, let's try to query
+        return None
+
+    def _lookup_answer(self, query_embedding: List[float], debug_info: Dict[str, Any],
+                       where: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.lookup(query_embedding, scope=self._scope(where))
+        if not cached:
+            return None
+        print(f"✅ Answer cache hit (similarity {cached['similarity']}): {cached['question']}")
+        debug_info["cache_hit"] = True
+        debug_info["cached_question"] = cached["question"]
+        debug_info["cache_similarity"] = cached["similarity"]
+        return {
+            "result": cached["result"],
+            "formatted_sources": cached["formatted_sources"],
+            "debug": debug_info
+        }
+
+    def _retrieve_locked(
+        self, query: str, query_embedding: List[float], debug_info: Dict[str, Any],
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Retrieval di bawah read lock, lalu re-ranking (di luar lock) bila aktif."""
+        k = self.rerank_candidates if self.reranker is not None else 5
+        with self._rw_lock.read():
+            docs_and_scores = self._retrieve(query, query_embedding, k=k, debug_info=debug_info, where=where)
+        if self.reranker is None or not docs_and_scores:
+            return docs_and_scores
+
+        start = time.time()
+        ranked = self.reranker.rerank(query, docs_and_scores, top_n=self.rerank_top_n, threshold=self.rerank_threshold)
+        debug_info["rerank"] = {
+            "candidates": len(docs_and_scores),
+            "kept": len(ranked),
+            "scores": [round(rerank_score, 4) for _, _, rerank_score in ranked],
+            "seconds": round(time.time() - start, 3),
+        }
+        print(f"Rerank: {len(ranked)}/{len(docs_and_scores)} kandidat dipakai ({time.time() - start:.2f}s)")
+        return [(doc, score) for doc, score, _ in ranked]
+
+    def _build_prompt(
+        self,
+        query: str,
+        query_embedding: List[float],
+        docs_and_scores: List[Tuple[Document, float]],
+        debug_info: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if not docs_and_scores:
+            print("❌ Tidak ada dokumen yang relevan ditemukan.")
+            return {
+                "result": "Maaf, tidak ditemukan dokumen yang relevan dengan pertanyaan Anda.",
+                "formatted_sources": [],
+                "debug": {"error": "no_relevant_docs"}
+            }
+
+        if self.context_packer is not None:
+            # Gabung chunk yang tumpang tindih dan batasi konteks dengan anggaran token
+            context, used, report = self.context_packer.pack(docs_and_scores)
+            used_docs = {id(doc) for doc, _ in used}
+            docs_and_scores = [(doc, score) for doc, score in docs_and_scores if id(doc) in used_docs]
+            if debug_info is not None:
+                debug_info["context_packing"] = report
+            print(f"Context: {report['tokens']}/{report['budget']} token, {report['chunks_used']}/{report['chunks_in']} chunk "
+                  f"({report['merged']} digabung, {report['duplicates_dropped']} duplikat, {report['dropped']} dilewati)")
+        else:
+            context = "\n\n".join([doc.page_content for doc, _ in docs_and_scores])
+        documents = [doc for doc, _ in docs_and_scores]
+
+        # Format sources for return
+        formatted_sources = [{
+            "file": doc.metadata.get("source_file", "Unknown"),
+            "page": doc.metadata.get("page", "N/A"),
+            "chunk_id": doc.metadata.get("chunk_id", "-"),
+            "chunk_preview": doc.page_content[:100] if doc.page_content else "",
+            "score": round(float(score), 4)
+        } for doc, score in docs_and_scores]
+
+        print(f"Sending prompt to LLM with context from {len(documents)} documents")
+        return {
+            "query": query,
+            "context": context,
+            "prompt": self.template.format(context=context, question=query),
+            "query_embedding": query_embedding,
+            "formatted_sources": formatted_sources,
+        }
+
+    def prepare_query(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                      role: Optional[str] = None) -> Dict[str, Any]:
+        """Jalankan tahap retrieval saja, mis. secara spekulatif selagi pertanyaan diperjelas.
+
+        Hasilnya bisa diberikan ke query()/stream_query() lewat argumen speculative
+        (hanya dipakai bila filters dan role-nya sama).
+        """
+        where = self.build_where(filters, role)
+        try:
+            prepared = self._prepare_query(query, {}, where)
+        except Exception as e:
+            print(f"❌ Error saat retrieval spekulatif: {e}")
+            prepared = {"result": None, "formatted_sources": [], "debug": {"error": str(e)}}
+        prepared["query"] = query
+        prepared["where"] = where
+        return prepared
+
+    def _reuse_speculative(
+        self, query: str, speculative: Optional[Dict[str, Any]], debug_info: Dict[str, Any],
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Pakai hasil prepare_query() untuk pertanyaan lain bila cukup mirip dengan query."""
+        if not speculative or speculative.get("debug", {}).get("error"):
+            return None
+        if speculative.get("where") != where:
+            return None
+        same_text = normalize_text(speculative.get("query", "")).lower() == normalize_text(query).lower()
+        if "prompt" not in speculative:
+            # Jawaban dari cache hanya dipakai bila pertanyaannya persis sama
+            return speculative if same_text else None
+        if same_text:
+            debug_info["speculative_reuse"] = True
+            return speculative
+
+        query_embedding = self.embeddings.embed_query(query)
+        a = np.asarray(query_embedding, dtype=np.float32)
+        b = np.asarray(speculative["query_embedding"], dtype=np.float32)
+        similarity = float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) or 1.0))
+        debug_info["speculative_similarity"] = round(similarity, 4)
+        if similarity < self.speculative_reuse_threshold:
+            debug_info["speculative_reuse"] = False
+            return None
+
+        debug_info["speculative_reuse"] = True
+        return {
+            **speculative,
+            "query": query,
+            "prompt": self.template.format(context=speculative["context"], question=query),
+            "query_embedding": query_embedding,
+        }
+
+    def _vector_search(self, query_embedding: List[float], k: int,
+                       where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, Document, float]]:
+        results = self.vectorstore._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            (chunk_id, _lazy("Document")(page_content=text, metadata=metadata or {}), distance)
+            for chunk_id, text, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+
+    def _retrieve(
+        self,
+        query: str,
+        query_embedding: List[float],
+        k: int = 5,
+        debug_info: Optional[Dict[str, Any]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Pencarian vektor, digabung dengan BM25 lewat reciprocal rank fusion bila aktif.
+
+        Skor yang dikembalikan tetap jarak vektor Chroma (semakin kecil semakin mirip),
+        juga untuk chunk yang hanya ditemukan oleh BM25. where diteruskan ke kedua
+        pencarian sehingga chunk di luar filter tidak pernah menjadi kandidat.
+        """
+        if self.lexical_index is None:
+            hits = self._vector_search(query_embedding, k * 2, where)
+            found = {chunk_id: (doc, distance) for chunk_id, doc, distance in hits}
+            top_ids = self._collapse_duplicates(
+                [chunk_id for chunk_id, _, _ in hits], {chunk_id: doc.metadata for chunk_id, doc, _ in hits}, k
+            )
+            return [found[chunk_id] for chunk_id in top_ids]
+
+        vector_hits = self._vector_search(query_embedding, self.hybrid_candidates, where)
+        lexical_hits = self.lexical_index.search(query, k=self.hybrid_candidates, where=where)
+
+        fused = {}
+        for rank, (chunk_id, _, _) in enumerate(vector_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (60 + rank + 1)
+        for rank, (chunk_id, _, _, _) in enumerate(lexical_hits):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (60 + rank + 1)
+        metadata_of = {chunk_id: metadata for chunk_id, _, _, metadata in lexical_hits}
+        metadata_of.update({chunk_id: doc.metadata for chunk_id, doc, _ in vector_hits})
+        top_ids = self._collapse_duplicates(sorted(fused, key=fused.get, reverse=True), metadata_of, k)
+
+        found = {chunk_id: (doc, distance) for chunk_id, doc, distance in vector_hits}
+        lexical_only = [chunk_id for chunk_id in top_ids if chunk_id not in found]
+        if lexical_only:
+            lexical_docs = {
+                chunk_id: _lazy("Document")(page_content=text, metadata=metadata)
+                for chunk_id, _, text, metadata in lexical_hits
+            }
+            stored = self.vectorstore._collection.get(ids=lexical_only, include=["embeddings"])
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            for chunk_id, embedding in zip(stored["ids"], stored["embeddings"]):
+                distance = float(np.sum((np.asarray(embedding, dtype=np.float32) - query_vector) ** 2))
+                found[chunk_id] = (lexical_docs[chunk_id], distance)
+
+        if debug_info is not None:
+            debug_info["vector_hits"] = len(vector_hits)
+            debug_info["lexical_hits"] = len(lexical_hits)
+        return [found[chunk_id] for chunk_id in top_ids if chunk_id in found]
+
+    @staticmethod
+    def _collapse_duplicates(ranked_ids: List[str], metadata_of: Dict[str, Dict[str, Any]], k: int) -> List[str]:
+        """Ambil k id teratas, paling banyak satu per kelompok near-duplicate."""
+        selected = []
+        groups = set()
+        for chunk_id in ranked_ids:
+            metadata = metadata_of.get(chunk_id) or {}
+            group = metadata.get("duplicate_of") or metadata.get("chunk_id") or chunk_id
+            if group in groups:
+                continue
+            groups.add(group)
+            selected.append(chunk_id)
+            if len(selected) == k:
+                break
+        return selected
+
+    def lexical_search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                       role: Optional[str] = None) -> List[Tuple[Document, float]]:
+        """Pencarian kata kunci/rujukan pasal langsung dari index BM25, tanpa panggilan embedding."""
+        if self.lexical_index is None:
+            return []
+        with self._rw_lock.read():
+            hits = self.lexical_index.search(query, k=k, where=self.build_where(filters, role))
+        return [(_lazy("Document")(page_content=text, metadata=metadata), score) for _, score, text, metadata in hits]
+
+    def _backfill_lexical_index(self, page_size: int = 1000) -> None:
+        """Isi index BM25 dari Chroma bila collection sudah ada sebelum fitur ini."""
+        try:
+            if len(self.lexical_index) > 0 or self._stats["chunk_count"] == 0:
+                return
+            # Per halaman seperti iter_metadatas, bukan satu get() atas seluruh korpus
+            total = 0
+            while True:
+                with self._rw_lock.read():
+                    page = self.vectorstore._collection.get(
+                        include=["documents", "metadatas"], limit=page_size, offset=total
+                    )
+                ids = page.get("ids") or []
+                if ids:
+                    self.lexical_index.add(ids, page["documents"], [m or {} for m in page["metadatas"]])
+                total += len(ids)
+                if len(ids) < page_size:
+                    break
+            print(f"Lexical index dibangun dari {total} chunk yang sudah ada")
+        except Exception as e:
+            print(f"Could not backfill lexical index: {e}")
+
+    def _backfill_chunk_index(self) -> None:
+        try:
+            if len(self.chunk_index) > 0 or self._stats["chunk_count"] == 0:
+                return
+            self.chunk_index.add(
+                (meta["chunk_id"], chunk_id, meta.get("source_file"))
+                for chunk_id, meta in self.iter_metadatas() if meta.get("chunk_id")
+            )
+            print(f"Chunk index dibangun untuk {len(self.chunk_index)} chunk yang sudah ada")
+        except Exception as e:
+            print(f"Could not backfill chunk index: {e}")
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Ambil satu chunk berdasarkan chunk_id lewat index, tanpa scan collection.
+
+        Mengembalikan {"id", "text", "metadata"} atau None bila chunk tidak ada.
+        """
+        chroma_id = self.chunk_index.get_id(chunk_id)
+        if chroma_id is None:
+            return None
+        with self._rw_lock.read():
+            data = self.vectorstore._collection.get(ids=[chroma_id], include=["documents", "metadatas"])
+        if not data.get("ids"):
+            return None
+        return {"id": data["ids"][0], "text": data["documents"][0], "metadata": data["metadatas"][0] or {}}
+
+    def _store_answer(self, query: str, prepared: Dict[str, Any], answer: str,
+                      where: Optional[Dict[str, Any]] = None) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.store(query, prepared["query_embedding"], answer, prepared["formatted_sources"],
+                                    scope=self._scope(where))
+
+    def query(self, query: str, debug=False, speculative: Optional[Dict[str, Any]] = None,
+              filters: Optional[Dict[str, Any]] = None, role: Optional[str] = None) -> Dict[str, Any]:
+        """Jawab pertanyaan; filters/role membatasi chunk yang dicari (lihat build_where)."""
         if not query or len(query.strip()) == 0:
             print("❌ Pertanyaan kosong.")
             return {"result": "Pertanyaan kosong.", "formatted_sources": [], "debug": {"error": "empty_query"}}
 
         debug_info = {"query": query} if debug else {}
+        where = self.build_where(filters, role)
+        if debug and where:
+            debug_info["where"] = where
         
         try:
-            # Check if collection has documents using the direct collection API
-            try:
-                collection = self.vectorstore._collection
-                count = collection.count()
-                if count == 0:
-                    print("❌ Tidak ada dokumen di vectorstore.")
-                    return {
-                        "result": "Maaf, tidak ada dokumen yang tersedia untuk mencari jawaban. Silakan tambahkan dokumen terlebih dahulu.",
-                        "formatted_sources": [],
-                        "debug": {"error": "no_documents"}
-                    }
-                
-                print(f"Found {count} documents in vectorstore for query")
-                debug_info["document_count"] = count
-                
-            except Exception as e:
-                print(f"❌ Error saat mengecek jumlah dokumen: {e}")
-                # Continue anyway, let's try to query
-            
-            # Use the regular similarity search instead of direct vector manipulation
-            docs_and_scores = self.vectorstore.similarity_search_with_score(query, k=5)
-            
-            if not docs_and_scores:
-                print("❌ Tidak ada dokumen yang relevan ditemukan.")
-                return {
-                    "result": "Maaf, tidak ditemukan dokumen yang relevan dengan pertanyaan Anda.",
-                    "formatted_sources": [],
-                    "debug": {"error": "no_relevant_docs"}
-                }
-            
-            # Extract documents and scores
-            documents = [doc for doc, _ in docs_and_scores]
-            scores = [score for _, score in docs_and_scores]
-            
-            # Create context from documents
-            context = "\n\n".join([doc.page_content for doc in documents])
-            
-            # Format prompt
-            formatted_prompt = self.template.format(context=context, question=query)
-            
+            prepared = (self._reuse_speculative(query, speculative, debug_info, where)
+                        or self._prepare_query(query, debug_info, where))
+            if "prompt" not in prepared:
+                if "error" not in prepared["debug"] and not debug:
+                    prepared["debug"] = {}
+                return prepared
+
+            if self.llm is None:
+                return self._no_llm_response(prepared, debug_info if debug else {})
+
             # Get answer from LLM
-            print(f"Sending prompt to LLM with context from {len(documents)} documents")
-            answer = self.llm.predict(formatted_prompt)
-            
-            # Format sources for return
-            formatted_sources = [{
-                "file": doc.metadata.get("source_file", "Unknown"),
-                "page": doc.metadata.get("page", "N/A"),
-                "chunk_id": doc.metadata.get("chunk_id", "-"),
-                "chunk_preview": doc.page_content[:100] if doc.page_content else "",
-                "score": round(float(score), 4)
-            } for doc, score in docs_and_scores]
+            answer = self.llm.predict(prepared["prompt"])
+            self._store_answer(query, prepared, answer, where)
             
             return {
                 "result": answer,
-                "formatted_sources": formatted_sources,
+                "formatted_sources": prepared["formatted_sources"],
                 "debug": debug_info if debug else {}
             }
                 
@@ -259,27 +1423,336 @@ class RAGEngine:
             traceback.print_exc()
             return {"result": error_msg, "formatted_sources": [], "debug": {"error": str(e)}}
 
+    async def aquery(self, query: str, debug=False, speculative: Optional[Dict[str, Any]] = None,
+                     filters: Optional[Dict[str, Any]] = None, role: Optional[str] = None) -> Dict[str, Any]:
+        """Versi asyncio dari query() agar banyak pertanyaan bisa diproses bersamaan di satu event loop.
+
+        Panggilan OpenAI memakai session aiohttp bersama (keep-alive) dan pencarian
+        Chroma/BM25 berjalan di thread pool. Setiap tahap (embedding, retrieval, llm)
+        dibatasi stage_timeouts; bila lewat, hasilnya error "timeout" beserta nama tahapnya.
+        """
+        if not query or len(query.strip()) == 0:
+            print("❌ Pertanyaan kosong.")
+            return {"result": "Pertanyaan kosong.", "formatted_sources": [], "debug": {"error": "empty_query"}}
+
+        debug_info = {"query": query} if debug else {}
+        where = self.build_where(filters, role)
+        if debug and where:
+            debug_info["where"] = where
+        stage = "embedding"
+        try:
+            use_openai_session()
+            # Embedding speculative, refresh_stats, dan cache jawaban (SQLite) bersifat blocking
+            prepared = await asyncio.wait_for(
+                asyncio.to_thread(self._reuse_speculative, query, speculative, debug_info, where),
+                self.stage_timeouts["embedding"]
+            )
+            if prepared is None:
+                prepared = await asyncio.to_thread(self._check_index, debug_info)
+            if prepared is None:
+                query_embedding = await asyncio.wait_for(
+                    self._aembed_query(query), self.stage_timeouts["embedding"]
+                )
+                prepared = await asyncio.to_thread(self._lookup_answer, query_embedding, debug_info, where)
+                if prepared is None:
+                    stage = "retrieval"
+                    docs_and_scores = await asyncio.wait_for(
+                        asyncio.to_thread(self._retrieve_locked, query, query_embedding, debug_info, where),
+                        self.stage_timeouts["retrieval"]
+                    )
+                    prepared = self._build_prompt(query, query_embedding, docs_and_scores, debug_info)
+
+            if "prompt" not in prepared:
+                if "error" not in prepared["debug"] and not debug:
+                    prepared["debug"] = {}
+                return prepared
+
+            if self.llm is None:
+                return self._no_llm_response(prepared, debug_info if debug else {})
+
+            stage = "llm"
+            answer = await asyncio.wait_for(self.llm.apredict(prepared["prompt"]), self.stage_timeouts["llm"])
+            await asyncio.to_thread(self._store_answer, query, prepared, answer, where)
+            return {
+                "result": answer,
+                "formatted_sources": prepared["formatted_sources"],
+                "debug": debug_info if debug else {}
+            }
+
+        except asyncio.TimeoutError:
+            error_msg = f"❌ Waktu habis pada tahap {stage} ({self.stage_timeouts[stage]} detik)."
+            print(error_msg)
+            return {"result": error_msg, "formatted_sources": [], "debug": {"error": "timeout", "stage": stage}}
+        except Exception as e:
+            error_msg = f"❌ Error dalam proses query: {e}"
+            print(error_msg)
+            return {"result": error_msg, "formatted_sources": [], "debug": {"error": str(e), "stage": stage}}
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        if hasattr(self.embeddings, "aembed_query"):
+            return await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.embeddings.embed_query, query)
+
+    def stream_query(self, query: str, debug=False, speculative: Optional[Dict[str, Any]] = None,
+                     filters: Optional[Dict[str, Any]] = None, role: Optional[str] = None) -> Dict[str, Any]:
+        """Seperti query, tetapi jawaban dikirim bertahap lewat generator "stream".
+
+        "formatted_sources" sudah terisi sebelum token pertama. Setelah generator
+        habis, jawaban lengkap tersedia di "result". speculative adalah hasil
+        prepare_query() (mis. untuk pertanyaan mentah) yang dipakai ulang bila mirip.
+        """
+        response = {"result": None, "formatted_sources": [], "debug": {}}
+
+        if not query or len(query.strip()) == 0:
+            print("❌ Pertanyaan kosong.")
+            response.update({"result": "Pertanyaan kosong.", "debug": {"error": "empty_query"}})
+            response["stream"] = iter([response["result"]])
+            return response
+
+        debug_info = {"query": query} if debug else {}
+        where = self.build_where(filters, role)
+        if debug and where:
+            debug_info["where"] = where
+        try:
+            prepared = (self._reuse_speculative(query, speculative, debug_info, where)
+                        or self._prepare_query(query, debug_info, where))
+        except Exception as e:
+            error_msg = f"❌ Error dalam proses query: {e}"
+            print(error_msg)
+            prepared = {"result": error_msg, "formatted_sources": [], "debug": {"error": str(e)}}
+
+        response["formatted_sources"] = prepared["formatted_sources"]
+        if "prompt" not in prepared:
+            response["result"] = prepared["result"]
+            response["debug"] = prepared["debug"] if debug or "error" in prepared["debug"] else {}
+            response["stream"] = iter([prepared["result"]])
+            return response
+
+        response["debug"] = debug_info if debug else {}
+        if self.llm is None:
+            response.update(self._no_llm_response(prepared, response["debug"]))
+            response["stream"] = iter([response["result"]])
+            return response
+        response["stream"] = self._stream_answer(query, prepared, response, where)
+        return response
+
+    def _no_llm_response(self, prepared: Dict[str, Any], debug: Dict[str, Any]) -> Dict[str, Any]:
+        # Tanpa OPENAI_API_KEY hanya sumber hasil retrieval yang bisa ditampilkan
+        return {
+            "result": "⚠️ OPENAI_API_KEY belum diatur sehingga jawaban tidak dapat dibuat. "
+                      "Berikut potongan dokumen yang paling relevan.",
+            "formatted_sources": prepared["formatted_sources"],
+            "debug": debug,
+        }
+
+    def _stream_answer(self, query: str, prepared: Dict[str, Any], response: Dict[str, Any],
+                       where: Optional[Dict[str, Any]] = None):
+        parts = []
+        try:
+            for chunk in self.llm.stream(prepared["prompt"]):
+                token = chunk.content
+                if token:
+                    parts.append(token)
+                    yield token
+        except Exception as e:
+            error_msg = f"❌ Error dalam proses query: {e}"
+            print(error_msg)
+            response["debug"]["error"] = str(e)
+            parts.append(("\n\n" if parts else "") + error_msg)
+            response["result"] = "".join(parts)
+            yield parts[-1]
+            return
+
+        response["result"] = "".join(parts)
+        self._store_answer(query, prepared, response["result"], where)
+
+    def iter_metadatas(
+        self,
+        page_size: int = 1000,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterasi (id, metadata) per halaman tanpa memuat teks dokumen maupun embedding."""
+        offset = 0
+        while True:
+            with self._rw_lock.read():
+                page = self.vectorstore._collection.get(
+                    include=["metadatas"], limit=page_size, offset=offset, where=where
+                )
+            ids = page.get("ids") or []
+            for chunk_id, meta in zip(ids, page.get("metadatas") or []):
+                yield chunk_id, meta or {}
+            if len(ids) < page_size:
+                break
+            offset += page_size
+
+    def aggregate_files(self, page_size: int = 1000) -> Dict[str, Dict[str, Any]]:
+        """Agregasi per source_file dari scan metadata: jumlah chunk dan jumlah halaman."""
+        files = {}
+        for _, meta in self.iter_metadatas(page_size=page_size):
+            filename = meta.get("source_file")
+            if not filename:
+                continue
+            entry = files.setdefault(filename, {"chunks": 0, "pages": set()})
+            entry["chunks"] += 1
+            entry["pages"].add(meta.get("page"))
+        return {
+            filename: {"chunks": entry["chunks"], "pages": len(entry["pages"])}
+            for filename, entry in sorted(files.items())
+        }
+
     def list_indexed_files(self) -> Dict[str, int]:
         try:
-            data = self.vectorstore.get()
-            file_counts = {}
-            for meta in data.get("metadatas", []):
-                filename = meta.get("source_file")
-                if filename:
-                    file_counts[filename] = file_counts.get(filename, 0) + 1
-            return dict(sorted(file_counts.items()))
+            return {filename: entry["chunks"] for filename, entry in self.aggregate_files().items()}
         except Exception as e:
             print(f"Error listing indexed files: {e}")
             return {}
 
+    @_exclusive
+    def update_chunk(self, chunk_id: str, new_text: str) -> Dict[str, Any]:
+        """Ganti isi satu chunk: satu panggilan embedding lalu upsert dengan id yang sama.
+
+        Metadata lama dipertahankan (preview "chunk" diperbarui); index leksikal,
+        statistik, dan cache jawaban yang mengutip file tersebut ikut diperbarui.
+        """
+        chroma_id = self.chunk_index.get_id(chunk_id)
+        if chroma_id is None:
+            raise ValueError(f"Chunk {chunk_id} tidak ditemukan")
+
+        embedding = self._embed_batch_with_retry([new_text])[0]
+        with self._rw_lock.write():
+            data = self.vectorstore._collection.get(ids=[chroma_id], include=["metadatas"])
+            if not data["ids"]:
+                self.chunk_index.delete_ids([chroma_id])
+                raise ValueError(f"Chunk {chunk_id} tidak ditemukan")
+            metadata = dict(data["metadatas"][0] or {})
+            metadata["chunk"] = new_text[:100]
+            self.vectorstore._collection.upsert(
+                ids=[chroma_id], embeddings=[embedding], metadatas=[metadata], documents=[new_text]
+            )
+            if self.lexical_index is not None:
+                self.lexical_index.add([chroma_id], [new_text], [metadata])
+            self._stats["last_modified"] = datetime.now().isoformat()
+
+        if self.answer_cache is not None and metadata.get("source_file"):
+            self.answer_cache.invalidate_sources([metadata["source_file"]])
+        if not self.use_in_memory and self.persist_directory:
+            try:
+                self.vectorstore.persist()
+            except Exception as e:
+                print(f"Could not persist vectorstore: {e}")
+        print(f"Updated chunk {chunk_id}")
+        return {"id": chroma_id, "text": new_text, "metadata": metadata}
+
+    @_exclusive
+    def update_document_metadata(self, path: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Salin metadata dokumen ke semua chunk file ini tanpa embedding ulang.
+
+        metadata default dibaca dari <path>.meta.json. Mengembalikan jumlah chunk yang diperbarui.
+        """
+        filename = os.path.basename(path)
+        fields = document_metadata(metadata) if metadata is not None else read_document_metadata(path)
+        ids = [chunk_id for chunk_id, _ in self.iter_metadatas(where={"source_file": filename})]
+        if ids:
+            with self._rw_lock.write():
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    self.vectorstore._collection.update(ids=batch, metadatas=[dict(fields) for _ in batch])
+                if self.lexical_index is not None:
+                    self.lexical_index.update_metadata(ids, fields)
+                self._stats["last_modified"] = datetime.now().isoformat()
+            # Jawaban lama mungkin lolos filter yang kini tidak berlaku (mis. dokumen jadi Rahasia)
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_sources([filename])
+            if not self.use_in_memory and self.persist_directory:
+                try:
+                    self.vectorstore.persist()
+                except Exception as e:
+                    print(f"Could not persist vectorstore: {e}")
+
+        if filename in self._manifest:
+            self._manifest[filename]["meta_sha256"] = self._hash_file(path + ".meta.json")
+            self._manifest[filename]["meta_in_chunks"] = True
+            self._save_manifest()
+        print(f"Metadata {filename} diperbarui di {len(ids)} chunk")
+        return len(ids)
+
+    @_exclusive
+    def sync_document_metadata(self, directory: str) -> List[str]:
+        """Perbarui metadata chunk untuk file terindeks yang .meta.json-nya berubah.
+
+        Juga mengisi metadata dokumen pada index lama yang dibuat sebelum metadata
+        disalin ke chunk: bila manifest kosong, manifest diisi dulu dari source_file di
+        collection sehingga chunk lama mendapat jenis_dokumen (tanpa itu filter role
+        menyembunyikannya dari non-admin). Tidak ada embedding ulang.
+        """
+        self._seed_manifest(self._source_files(directory))
+        updated = []
+        for filename, entry in sorted(self._manifest.items()):
+            path = os.path.join(directory, filename)
+            if not os.path.exists(path):
+                continue
+            if entry.get("meta_in_chunks") and entry.get("meta_sha256") == self._hash_file(path + ".meta.json"):
+                continue
+            self.update_document_metadata(path)
+            updated.append(filename)
+        return updated
+
+    @_exclusive
     def delete_document(self, filename: str):
         try:
-            self.vectorstore.delete(filter={"source_file": filename})
+            with self._rw_lock.write():
+                self.vectorstore._collection.delete(where={"source_file": filename})
+                if self.lexical_index is not None:
+                    self.lexical_index.delete_source(filename)
+                self.chunk_index.delete_source(filename)
+                self._record_deleted(filename)
             print(f"Deleted document: {filename}")
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_sources([filename])
+            if self._manifest.pop(filename, None) is not None:
+                self._save_manifest()
             if not self.use_in_memory and self.persist_directory:
                 self.vectorstore.persist()
                 print(f"Changes persisted after deleting: {filename}")
         except Exception as e:
             error_msg = f"Failed to remove from vectorstore: {e}"
             print(error_msg)
-            raise RuntimeError(error_msg)
\ No newline at end of file
+            raise RuntimeError(error_msg)
+
+    @_exclusive
+    def remove_duplicate_chunks(self, page_size: int = 500) -> int:
+        """Hapus vektor duplikat (file, halaman, dan isi sama) yang tertumpuk sebelum id deterministik.
+
+        Chunk pertama yang ditemui dipertahankan; kembalikan jumlah chunk yang dihapus.
+        """
+        seen = set()
+        duplicates: Dict[str, Optional[str]] = {}
+        offset = 0
+        while True:
+            with self._rw_lock.read():
+                page = self.vectorstore._collection.get(
+                    include=["metadatas", "documents"], limit=page_size, offset=offset
+                )
+            ids = page.get("ids") or []
+            for chroma_id, text, meta in zip(ids, page.get("documents") or [], page.get("metadatas") or []):
+                meta = meta or {}
+                key = (meta.get("source_file"), meta.get("page"), text_hash(text or ""))
+                if key in seen:
+                    duplicates[chroma_id] = meta.get("source_file")
+                else:
+                    seen.add(key)
+            if len(ids) < page_size:
+                break
+            offset += page_size
+
+        if not duplicates:
+            return 0
+
+        self._delete_chunk_ids(duplicates)
+
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_sources({f for f in duplicates.values() if f})
+        if not self.use_in_memory and self.persist_directory:
+            self.vectorstore.persist()
+        print(f"Removed {len(duplicates)} duplicate chunks")
+        return len(duplicates)
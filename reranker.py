@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from typing import List, Tuple, Optional, Any, TYPE_CHECKING
+
+from embedding_cache import text_hash
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+# Cross-encoder multilingual (termasuk bahasa Indonesia), cukup kecil untuk CPU
+DEFAULT_RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderReranker:
+    """Re-ranking kandidat retrieval dengan cross-encoder lokal (sentence-transformers).
+
+    Pasangan (pertanyaan, chunk) diskor per batch; skor disimpan di cache LRU
+    sehingga pertanyaan yang sama atau mirip tidak menghitung ulang chunk yang sama.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANKER_MODEL,
+        batch_size: int = 16,
+        max_length: int = 512,
+        cache_size: int = 4096,
+        device: str = "cpu",
+        model: Optional[Any] = None,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.device = device
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _get_model(self):
+        # sentence-transformers (dan torch) baru diimpor saat pertama kali dipakai
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+            return self._model
+
+    def warm_up(self) -> None:
+        self.score("kereta api", ["perkeretaapian"])
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Skor relevansi untuk tiap teks; semakin besar semakin relevan."""
+        query_key = text_hash(query)
+        keys = [(query_key, text_hash(text)) for text in texts]
+        scores: List[Optional[float]] = [None] * len(texts)
+
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+
+        missing = {}
+        for i, key in enumerate(keys):
+            if scores[i] is None and key not in missing:
+                missing[key] = texts[i]
+        if missing:
+            predicted = self._get_model().predict(
+                [(query, text) for text in missing.values()], batch_size=self.batch_size
+            )
+            fresh = {key: float(value) for key, value in zip(missing, predicted)}
+            with self._cache_lock:
+                for key, value in fresh.items():
+                    self._cache[key] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            scores = [fresh[key] if value is None else value for key, value in zip(keys, scores)]
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        docs_and_scores: List[Tuple["Document", float]],
+        top_n: int = 5,
+        threshold: Optional[float] = None,
+    ) -> List[Tuple["Document", float, float]]:
+        """Urutkan ulang kandidat; kembalikan (dokumen, skor asli, skor rerank) teratas di atas threshold."""
+        if not docs_and_scores:
+            return []
+        rerank_scores = self.score(query, [doc.page_content for doc, _ in docs_and_scores])
+        ranked = sorted(
+            ((doc, score, rerank_score) for (doc, score), rerank_score in zip(docs_and_scores, rerank_scores)),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+        if threshold is not None:
+            ranked = [item for item in ranked if item[2] >= threshold]
+        return ranked[:top_n]
@@ -0,0 +1,57 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from answer_cache import AnswerCache
+
+
+SOURCES = [{"file": "PM_69_TAHUN_2018.pdf", "page": "6", "chunk_id": "x", "chunk_preview": "SMKP", "score": 0.31}]
+
+
+class TestAnswerCache:
+
+    def test_similar_question_hits_cache(self):
+        """A question above the similarity threshold returns the stored answer and sources."""
+        cache = AnswerCache(threshold=0.95)
+        cache.store("Apa yang dimaksud dengan SMKP?", [1.0, 0.0, 0.1], "SMKP adalah ...", SOURCES)
+
+        hit = cache.lookup([0.98, 0.0, 0.12])
+        assert hit["result"] == "SMKP adalah ..."
+        assert hit["formatted_sources"] == SOURCES
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+    def test_hits_do_not_reload_embeddings(self):
+        """Counting a hit is not a data change; the embedding matrix stays loaded."""
+        cache = AnswerCache(threshold=0.95)
+        cache.store("q", [1.0, 0.0], "a", SOURCES)
+        assert cache.lookup([1.0, 0.0])["result"] == "a"
+        matrix = cache._matrix
+        for _ in range(3):
+            assert cache.lookup([1.0, 0.0])["result"] == "a"
+        assert cache._matrix is matrix
+        assert cache._conn.execute("SELECT hits FROM answers").fetchone()[0] == 4
+
+        cache.store("q2", [0.0, 1.0], "a2", SOURCES)
+        assert cache.lookup([0.0, 1.0])["result"] == "a2"
+
+    def test_invalidate_by_source_file(self):
+        """Re-indexing or deleting a cited file removes the cached answers."""
+        cache = AnswerCache(threshold=0.9)
+        cache.store("q1", [1.0, 0.0], "a1", SOURCES)
+        cache.store("q2", [0.0, 1.0], "a2", [{"file": "SEJARAHKAI.pdf"}])
+
+        assert cache.invalidate_sources(["PM_69_TAHUN_2018.pdf"]) == 1
+        assert cache.lookup([1.0, 0.0]) is None
+        assert cache.lookup([0.0, 1.0])["result"] == "a2"
+
+    def test_invalidation_visible_to_other_connections(self, tmp_path):
+        """Engines in other processes sharing the file see invalidations."""
+        path = str(tmp_path / "answer_cache.db")
+        reader = AnswerCache(path, threshold=0.9)
+        writer = AnswerCache(path, threshold=0.9)
+        writer.store("q", [1.0, 0.0], "a", SOURCES)
+        assert reader.lookup([1.0, 0.0])["result"] == "a"
+        writer.invalidate_sources(["PM_69_TAHUN_2018.pdf"])
+        assert reader.lookup([1.0, 0.0]) is None
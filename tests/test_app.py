@@ -1,6 +1,7 @@
 import os
 import sys
 import pytest
+import numpy as np
 from unittest.mock import patch, MagicMock
 
 # Add the parent directory to sys.path
@@ -39,6 +40,7 @@ class TestApp:
         # Setup mocks
         mock_vectorstore = MagicMock()
         mock_chroma.return_value = mock_vectorstore
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
         
         # Initialize RAG engine
         engine = RAGEngine(use_in_memory=True)
@@ -54,4 +56,649 @@ class TestApp:
             
             # Check if documents were processed
             assert num_chunks > 0
-            assert mock_vectorstore.add_documents.called
\ No newline at end of file
+            assert mock_vectorstore._collection.upsert.called
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_sync_directory_only_reindexes_changes(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that sync_directory skips unchanged files and tracks removals."""
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+
+        engine = RAGEngine(use_in_memory=True)
+
+        import tempfile
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(f"{temp_dir}/a.txt", "w") as f:
+                f.write("Dokumen pertama tentang perkeretaapian.")
+            with open(f"{temp_dir}/b.txt", "w") as f:
+                f.write("Dokumen kedua tentang sinyal.")
+
+            first = engine.sync_directory(temp_dir)
+            assert first["added"] == ["a.txt", "b.txt"]
+
+            second = engine.sync_directory(temp_dir)
+            assert second["added"] == [] and second["changed"] == []
+            assert second["unchanged"] == 2
+
+            with open(f"{temp_dir}/a.txt", "w") as f:
+                f.write("Dokumen pertama yang sudah direvisi.")
+            with open(f"{temp_dir}/b.txt.meta.json", "w") as f:
+                f.write('{"jenis_dokumen": "Umum"}')
+            os.remove(f"{temp_dir}/b.txt")
+            third = engine.sync_directory(temp_dir)
+            assert third["changed"] == ["a.txt"]
+            assert third["removed"] == ["b.txt"]
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_sync_adopts_legacy_index_and_replaces_chunks_in_place(self, mock_chroma, mock_embeddings,
+                                                                   mock_chat_openai):
+        """Index lama tanpa manifest tidak diembed ulang; chunk lama file berubah dihapus setelah upsert."""
+        collection = mock_chroma.return_value._collection
+        legacy = {"old-a1": {"source_file": "a.txt", "page": 0}, "old-c1": {"source_file": "c.txt", "page": 0}}
+
+        def fake_get(ids=None, include=None, limit=None, offset=0, where=None):
+            if ids is not None or offset:
+                return {"ids": [], "metadatas": []}
+            found = [(i, m) for i, m in legacy.items() if not where or m["source_file"] == where["source_file"]]
+            return {"ids": [i for i, _ in found], "metadatas": [m for _, m in found]}
+
+        collection.get.side_effect = fake_get
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False)
+
+        import tempfile
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(f"{temp_dir}/a.txt", "w") as f:
+                f.write("Dokumen lama yang sudah terindeks.")
+            with open(f"{temp_dir}/b.txt", "w") as f:
+                f.write("Dokumen baru.")
+
+            first = engine.sync_directory(temp_dir)
+            assert first["added"] == ["b.txt"]
+            assert first["metadata_updated"] == ["a.txt"]
+            assert first["removed"] == ["c.txt"]
+            assert collection.update.call_args.kwargs["ids"] == ["old-a1"]
+
+            collection.reset_mock()
+            with open(f"{temp_dir}/a.txt", "w") as f:
+                f.write("Dokumen lama yang sudah direvisi.")
+            assert engine.sync_directory(temp_dir)["changed"] == ["a.txt"]
+            calls = [name for name, _, _ in collection.mock_calls if name in ("upsert", "delete")]
+            assert calls == ["upsert", "delete"]
+            assert collection.delete.call_args.kwargs == {"ids": ["old-a1"]}
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_metadata_backfill_for_legacy_index_without_manifest(self, mock_chroma, mock_embeddings,
+                                                                 mock_chat_openai):
+        """Chunk index lama (manifest kosong) mendapat jenis_dokumen saat warm-up agar tidak tersaring role."""
+        import json
+        import tempfile
+        collection = mock_chroma.return_value._collection
+        legacy = {"old-a1": {"source_file": "a.txt", "page": 0}, "old-b1": {"source_file": "b.txt", "page": 0}}
+
+        def fake_get(ids=None, include=None, limit=None, offset=0, where=None):
+            if ids is not None or offset:
+                return {"ids": [], "metadatas": []}
+            found = [(i, m) for i, m in legacy.items() if not where or m["source_file"] == where["source_file"]]
+            return {"ids": [i for i, _ in found], "metadatas": [m for _, m in found]}
+
+        collection.get.side_effect = fake_get
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False)
+        assert engine._manifest == {}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.txt", "b.txt"):
+                with open(f"{temp_dir}/{name}", "w") as f:
+                    f.write("Dokumen lama.")
+            with open(f"{temp_dir}/b.txt.meta.json", "w") as f:
+                json.dump({"jenis_dokumen": "D3"}, f)
+
+            assert engine.sync_document_metadata(temp_dir) == ["a.txt", "b.txt"]
+            updates = {call.kwargs["ids"][0]: call.kwargs["metadatas"][0]["jenis_dokumen"]
+                       for call in collection.update.call_args_list}
+            assert updates == {"old-a1": "Umum", "old-b1": "D3"}
+
+            # Sudah tercatat di manifest: warm-up berikutnya tidak memperbarui ulang
+            collection.update.reset_mock()
+            assert engine.sync_document_metadata(temp_dir) == []
+            collection.update.assert_not_called()
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_lexical_backfill_pages_through_collection(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Index BM25 untuk collection lama dibangun per halaman, bukan satu get() atas seluruh korpus."""
+        collection = mock_chroma.return_value._collection
+        ids = [f"c{i}" for i in range(2500)]
+
+        def fake_get(include=None, limit=None, offset=0, where=None, ids=None):
+            assert limit is not None
+            page = list(range(offset, min(offset + limit, 2500)))
+            return {
+                "ids": [f"c{i}" for i in page],
+                "documents": [f"Pasal {i} perkeretaapian" for i in page],
+                "metadatas": [{"source_file": "uu.pdf"} for _ in page],
+            }
+
+        collection.get.side_effect = fake_get
+        engine = RAGEngine(use_in_memory=True)
+        assert len(engine.lexical_index) == len(ids)
+        assert engine.lexical_search("Pasal 2499", k=1)[0][0].page_content == "Pasal 2499 perkeretaapian"
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_parallel_loading_matches_serial(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that the process pool returns the same documents in the same order."""
+        engine = RAGEngine(use_in_memory=True)
+
+        import tempfile
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ["c.txt", "a.txt", "b.txt"]:
+                with open(f"{temp_dir}/{name}", "w") as f:
+                    f.write(f"Isi dokumen {name}")
+
+            serial = engine.load_documents(temp_dir, workers=1)
+            parallel = engine.load_documents(temp_dir, workers=3)
+
+            assert [d.metadata["source_file"] for d in parallel] == ["a.txt", "b.txt", "c.txt"]
+            assert [d.page_content for d in parallel] == [d.page_content for d in serial]
+            assert all(d.metadata["page"] == "1" for d in parallel)
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_index_documents_resumes_failed_batches(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that a failed ingest resumes from the journal instead of starting over."""
+        from langchain.docstore.document import Document
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        embedded = []
+
+        def flaky_embed(texts):
+            if "gagal" in texts[0] and not embedded.count("retry"):
+                embedded.append("retry")
+                raise ValueError("server error")
+            embedded.extend(texts)
+            return [[0.1, 0.2] for _ in texts]
+
+        mock_embeddings.return_value.embed_documents.side_effect = flaky_embed
+
+        engine = RAGEngine(use_in_memory=True, embed_batch_size=2, embed_concurrency=1, use_embedding_cache=False)
+        docs = [Document(page_content=text, metadata={"source_file": "a.txt"})
+                for text in ["satu", "dua", "gagal", "empat"]]
+
+        assert engine.index_documents(docs) is False
+        assert engine.ingest_progress["failed_batches"] == 1
+        first_ids = mock_vectorstore._collection.upsert.call_args_list[0].kwargs["ids"]
+
+        assert engine.index_documents(docs) is True
+        assert engine.ingest_progress["resumed_batches"] == 1
+        assert embedded == ["satu", "dua", "retry", "gagal", "empat"]
+        assert mock_vectorstore._collection.upsert.call_count == 2
+        assert first_ids[0] not in mock_vectorstore._collection.upsert.call_args_list[1].kwargs["ids"]
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_stream_query_yields_tokens_with_sources_up_front(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that stream_query exposes sources first and the full answer after streaming."""
+        from langchain.docstore.document import Document
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": ["c1"], "metadatas": [{"source_file": "pm.pdf"}]}
+        mock_vectorstore._collection.query.return_value = {
+            "ids": [["c1"]],
+            "documents": [["SMKP adalah sistem manajemen."]],
+            "metadatas": [[{"source_file": "pm.pdf", "page": "6"}]],
+            "distances": [[0.3]],
+        }
+        mock_embeddings.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_chat_openai.return_value.stream.return_value = iter(
+            [MagicMock(content="SMKP "), MagicMock(content="adalah "), MagicMock(content="...")]
+        )
+
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False)
+        result = engine.stream_query("Apa itu SMKP?")
+
+        assert result["formatted_sources"][0]["file"] == "pm.pdf"
+        assert result["result"] is None
+        assert list(result["stream"]) == ["SMKP ", "adalah ", "..."]
+        assert result["result"] == "SMKP adalah ..."
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_engine_registry_shares_one_engine(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that every session gets the same engine for one persist directory."""
+        import tempfile
+        import threading
+        from engine_registry import get_engine, clear_engines
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            engines = []
+            threads = [
+                threading.Thread(target=lambda: engines.append(get_engine(os.path.join(temp_dir, "chroma_db"))))
+                for _ in range(8)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            clear_engines()
+
+        assert len(engines) == 8
+        assert all(engine is engines[0] for engine in engines)
+        assert mock_chroma.call_count == 1
+
+    def test_read_write_lock_blocks_reads_during_write(self):
+        """Test that readers wait for an in-flight write and then proceed."""
+        import threading
+        import time
+        from rag_engine import ReadWriteLock
+
+        lock = ReadWriteLock()
+        events = []
+
+        def reader():
+            with lock.read():
+                events.append("read")
+
+        with lock.write():
+            t = threading.Thread(target=reader)
+            t.start()
+            time.sleep(0.05)
+            events.append("write-done")
+        t.join()
+
+        assert events == ["write-done", "read"]
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_collection_stats_follow_index_and_delete(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that collection stats are maintained in memory by index and delete."""
+        from langchain.docstore.document import Document
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": [], "metadatas": []}
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+
+        engine = RAGEngine(use_in_memory=True)
+        mock_vectorstore._collection.count.reset_mock()
+        engine.index_documents([
+            Document(page_content="satu", metadata={"source_file": "a.pdf"}),
+            Document(page_content="dua", metadata={"source_file": "a.pdf"}),
+            Document(page_content="tiga", metadata={"source_file": "b.pdf"}),
+        ])
+        stats = engine.get_collection_stats()
+        assert stats["chunk_count"] == 3
+        assert stats["per_file"] == {"a.pdf": 2, "b.pdf": 1}
+        assert stats["last_modified"] is not None
+
+        engine.delete_document("a.pdf")
+        assert engine.get_collection_stats()["chunk_count"] == 1
+        mock_vectorstore._collection.count.assert_not_called()
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_list_indexed_files_pages_through_metadata(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that file listing scans metadata page by page without fetching documents."""
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        metadatas = [{"source_file": f"doc{i % 3}.pdf", "page": str(i)} for i in range(5)]
+
+        def fake_get(include=None, limit=None, offset=0, where=None, **kwargs):
+            page = metadatas[offset:offset + limit]
+            return {"ids": [f"id{offset + i}" for i in range(len(page))], "metadatas": page}
+
+        mock_vectorstore._collection.get.side_effect = fake_get
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False)
+
+        assert engine.aggregate_files(page_size=2) == {
+            "doc0.pdf": {"chunks": 2, "pages": 2},
+            "doc1.pdf": {"chunks": 2, "pages": 2},
+            "doc2.pdf": {"chunks": 1, "pages": 1},
+        }
+        assert engine.list_indexed_files() == {"doc0.pdf": 2, "doc1.pdf": 2, "doc2.pdf": 1}
+        for call in mock_vectorstore._collection.get.call_args_list:
+            assert call.kwargs["include"] == ["metadatas"]
+        mock_vectorstore.get.assert_not_called()
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_get_chunk_uses_chunk_index(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that a chunk is fetched by its id instead of scanning the collection."""
+        from langchain.docstore.document import Document
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": [], "metadatas": []}
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False)
+        engine.index_documents([
+            Document(page_content="Pasal 35", metadata={"source_file": "uu.pdf", "chunk_id": "uu.pdf_0"}),
+        ])
+        chroma_id = mock_vectorstore._collection.upsert.call_args.kwargs["ids"][0]
+
+        mock_vectorstore._collection.get.reset_mock()
+        mock_vectorstore._collection.get.return_value = {
+            "ids": [chroma_id], "documents": ["Pasal 35"], "metadatas": [{"chunk_id": "uu.pdf_0"}]
+        }
+        chunk = engine.get_chunk("uu.pdf_0")
+        assert chunk["text"] == "Pasal 35"
+        assert mock_vectorstore._collection.get.call_args.kwargs["ids"] == [chroma_id]
+
+        assert engine.get_chunk("tidak_ada") is None
+        engine.delete_document("uu.pdf")
+        assert engine.get_chunk("uu.pdf_0") is None
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_update_chunk_reembeds_only_that_chunk(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that revising a chunk costs one embedding call and keeps its id."""
+        from langchain.docstore.document import Document
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": [], "metadatas": []}
+        embed_documents = mock_embeddings.return_value.embed_documents
+        embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+
+        engine = RAGEngine(use_in_memory=True)
+        engine.index_documents([
+            Document(page_content="Pasal 34 lama", metadata={"source_file": "uu.pdf", "chunk_id": "uu.pdf_0"}),
+            Document(page_content="lainnya", metadata={"source_file": "uu.pdf", "chunk_id": "uu.pdf_1"}),
+        ])
+        chroma_id = mock_vectorstore._collection.upsert.call_args.kwargs["ids"][0]
+
+        embed_documents.reset_mock()
+        mock_vectorstore._collection.upsert.reset_mock()
+        mock_vectorstore._collection.get.return_value = {
+            "ids": [chroma_id], "metadatas": [{"source_file": "uu.pdf", "chunk_id": "uu.pdf_0", "page": "3"}]
+        }
+        updated = engine.update_chunk("uu.pdf_0", "Pasal 35 tentang prasarana")
+
+        embed_documents.assert_called_once_with(["Pasal 35 tentang prasarana"])
+        upsert = mock_vectorstore._collection.upsert.call_args.kwargs
+        assert upsert["ids"] == [chroma_id]
+        assert upsert["metadatas"][0]["page"] == "3"
+        assert updated["metadata"]["chunk"] == "Pasal 35 tentang prasarana"
+        assert engine.get_collection_stats()["chunk_count"] == 2
+        assert engine.lexical_search("Pasal 35", k=1)[0][0].page_content == "Pasal 35 tentang prasarana"
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_chunk_ids_are_deterministic_and_deduplicated(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that re-processing a file yields the same ids and duplicates collapse."""
+        from langchain.docstore.document import Document
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": [], "metadatas": []}
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+
+        engine = RAGEngine(use_in_memory=True)
+        page = Document(page_content="Pasal 35 mengatur prasarana. " * 120, metadata={"source_file": "uu.pdf", "page": "2"})
+
+        first = engine.process_documents([page])
+        second = engine.process_documents([page, page])
+        assert [c.metadata["chunk_id"] for c in first] == [c.metadata["chunk_id"] for c in second]
+        assert first[0].metadata["chunk_id"].startswith("uu.pdf_p2_0_")
+
+        engine.index_documents(second)
+        upserted = [i for call in mock_vectorstore._collection.upsert.call_args_list for i in call.kwargs["ids"]]
+        assert upserted == [c.metadata["chunk_id"] for c in first]
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_near_duplicates_collapsed_or_marked(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that near-duplicates are dropped within a file and marked across files."""
+        from langchain.docstore.document import Document
+
+        mock_chroma.return_value = MagicMock()
+        engine = RAGEngine(use_in_memory=True)
+        preamble = " ".join(f"Menimbang butir {i} tentang keselamatan perkeretaapian nasional." for i in range(12))
+        chunks = engine.process_documents([
+            Document(page_content=preamble, metadata={"source_file": "pm1.pdf", "page": "1"}),
+            Document(page_content=preamble + " Ditetapkan.", metadata={"source_file": "pm1.pdf", "page": "9"}),
+            Document(page_content=preamble, metadata={"source_file": "pm2.pdf", "page": "1"}),
+        ])
+
+        assert [c.metadata["source_file"] for c in chunks] == ["pm1.pdf", "pm2.pdf"]
+        assert chunks[1].metadata["duplicate_of"] == chunks[0].metadata["chunk_id"]
+        assert engine.last_dedup_report["removed"] == 1 and engine.last_dedup_report["marked"] == 1
+
+        metadata_of = {"a": chunks[0].metadata, "b": chunks[1].metadata, "c": {"chunk_id": "c"}}
+        assert engine._collapse_duplicates(["b", "a", "c"], metadata_of, k=5) == ["b", "c"]
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_speculative_retrieval_reused_when_similar(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that retrieval on the raw question is reused for a close refined question."""
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": ["c1"], "metadatas": [{"source_file": "pm.pdf"}]}
+        mock_vectorstore._collection.query.return_value = {
+            "ids": [["c1"]],
+            "documents": [["SMKP adalah sistem manajemen."]],
+            "metadatas": [[{"source_file": "pm.pdf", "page": "6"}]],
+            "distances": [[0.3]],
+        }
+        vectors = {"apa itu smkp?": [1.0, 0.0], "Apa yang dimaksud SMKP?": [0.99, 0.05], "Sanksi UU 23?": [0.0, 1.0]}
+        mock_embeddings.return_value.embed_query.side_effect = lambda text: vectors[text]
+        mock_chat_openai.return_value.predict.return_value = "SMKP adalah ..."
+
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False, use_answer_cache=False)
+        speculative = engine.prepare_query("apa itu smkp?")
+        assert mock_vectorstore._collection.query.call_count == 1
+
+        result = engine.query("Apa yang dimaksud SMKP?", debug=True, speculative=speculative)
+        assert result["debug"]["speculative_reuse"] is True
+        assert mock_vectorstore._collection.query.call_count == 1
+        assert "Apa yang dimaksud SMKP?" in mock_chat_openai.return_value.predict.call_args[0][0]
+
+        result = engine.query("Sanksi UU 23?", debug=True, speculative=speculative)
+        assert result["debug"]["speculative_reuse"] is False
+        assert mock_vectorstore._collection.query.call_count == 2
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_aquery_runs_concurrently_with_stage_timeouts(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Test that aquery overlaps slow LLM calls and reports the stage that timed out."""
+        import asyncio
+        import time
+        from async_http import close_sessions
+
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        mock_vectorstore._collection.get.return_value = {"ids": ["c1"], "metadatas": [{"source_file": "pm.pdf"}]}
+        mock_vectorstore._collection.query.return_value = {
+            "ids": [["c1"]],
+            "documents": [["SMKP adalah sistem manajemen."]],
+            "metadatas": [[{"source_file": "pm.pdf", "page": "6"}]],
+            "distances": [[0.3]],
+        }
+
+        async def aembed_query(text):
+            return [float(len(text)), 1.0]
+
+        async def apredict(prompt):
+            await asyncio.sleep(0.2)
+            return "jawaban"
+
+        mock_embeddings.return_value.aembed_query.side_effect = aembed_query
+        mock_chat_openai.return_value.apredict.side_effect = apredict
+
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False, use_answer_cache=False)
+
+        async def run(questions):
+            try:
+                return await asyncio.gather(*(engine.aquery(q) for q in questions))
+            finally:
+                await close_sessions()
+
+        start = time.monotonic()
+        results = asyncio.run(run([f"pertanyaan {i}" for i in range(10)]))
+        assert time.monotonic() - start < 1.0
+        assert all(r["result"] == "jawaban" for r in results)
+        assert results[0]["formatted_sources"][0]["file"] == "pm.pdf"
+
+        engine.stage_timeouts["llm"] = 0.05
+        result = asyncio.run(run(["pertanyaan lambat"]))[0]
+        assert result["debug"] == {"error": "timeout", "stage": "llm"}
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_aquery_speculative_embedding_does_not_block_loop(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """embed_query blocking untuk speculative reuse dijalankan di thread, bukan di event loop."""
+        import asyncio
+        import time
+        from async_http import close_sessions
+
+        mock_chroma.return_value._collection.get.return_value = {"ids": ["c1"], "metadatas": [{"source_file": "pm.pdf"}]}
+
+        def embed_query(text):
+            time.sleep(0.2)
+            return [1.0, 0.0]
+
+        async def apredict(prompt):
+            return "jawaban"
+
+        mock_embeddings.return_value.embed_query.side_effect = embed_query
+        mock_chat_openai.return_value.apredict.side_effect = apredict
+
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False, use_answer_cache=False)
+        speculative = {
+            "query": "pertanyaan awal", "where": None, "prompt": "p", "context": "SMKP adalah sistem manajemen.",
+            "query_embedding": [1.0, 0.0], "formatted_sources": [{"file": "pm.pdf"}], "debug": {},
+        }
+
+        async def run(questions):
+            try:
+                return await asyncio.gather(*(engine.aquery(q, speculative=speculative) for q in questions))
+            finally:
+                await close_sessions()
+
+        start = time.monotonic()
+        results = asyncio.run(run([f"pertanyaan {i}" for i in range(5)]))
+        assert time.monotonic() - start < 0.6
+        assert all(r["result"] == "jawaban" for r in results)
+
+    @patch("rag_engine.LocalEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_local_embedding_provider_records_model(self, mock_chroma, mock_local):
+        """Provider lokal mencatat modelnya di collection dan menolak collection dari model lain."""
+        collection = mock_chroma.return_value._collection
+        collection.count.return_value = 0
+        collection.metadata = None
+        collection.get.return_value = {"ids": ["a"], "metadatas": [{"source_file": "pm.pdf"}]}
+
+        with patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            engine = RAGEngine(use_in_memory=True, embedding_provider="local", embedding_threads=2,
+                               use_hybrid_search=False, use_answer_cache=False)
+        assert mock_local.call_args.kwargs["num_threads"] == 2
+        assert engine.llm is None
+        collection.modify.assert_called_once_with(
+            metadata={"embedding_model": f"local:{engine.embedding_model}"}
+        )
+
+        # Tanpa API key pertanyaan tetap mengembalikan sumber hasil retrieval
+        mock_local.return_value.embed_query.return_value = [0.1, 0.2]
+        collection.query.return_value = {
+            "ids": [["a"]], "documents": [["Isi pasal"]],
+            "metadatas": [[{"source_file": "pm.pdf", "page": 1}]], "distances": [[0.1]],
+        }
+        result = engine.query("apa isi pasal 1?")
+        assert "OPENAI_API_KEY" in result["result"]
+        assert result["formatted_sources"][0]["file"] == "pm.pdf"
+
+        # Collection lama (ada-002, tanpa catatan model) tidak boleh dipakai provider lokal
+        collection.count.return_value = 5
+        collection.metadata = {"hnsw:space": "l2"}
+        with pytest.raises(ValueError, match="openai:text-embedding-ada-002"):
+            RAGEngine(use_in_memory=True, embedding_provider="local", use_hybrid_search=False)
+
+        # Backend lain menghasilkan vektor berbeda: index torch tidak dipakai untuk onnx
+        collection.metadata = {"embedding_model": f"local:{engine.embedding_model}"}
+        with pytest.raises(ValueError, match="@onnx"):
+            RAGEngine(use_in_memory=True, embedding_provider="local", embedding_backend="onnx",
+                      use_hybrid_search=False)
+
+    def test_onnx_pooling_follows_model_config(self):
+        """ONNX pooling mengikuti mode pooling model (cls, mean, max)."""
+        from embedding_backends import LocalEmbeddings
+
+        hidden = np.array([[[1.0, 0.0], [3.0, 4.0], [9.0, 9.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0]])
+        assert LocalEmbeddings._pool(hidden, mask, "cls").tolist() == [[1.0, 0.0]]
+        assert LocalEmbeddings._pool(hidden, mask, "mean").tolist() == [[2.0, 2.0]]
+        assert LocalEmbeddings._pool(hidden, mask, "max").tolist() == [[3.0, 4.0]]
+
+        pooling = MagicMock()
+        pooling.get_config_dict.return_value = {"pooling_mode_cls_token": True, "pooling_mode_mean_tokens": False}
+        assert LocalEmbeddings._read_pooling_mode([MagicMock(spec=[]), pooling]) == "cls"
+
+    @patch("rag_engine.ChatOpenAI")
+    @patch("rag_engine.OpenAIEmbeddings")
+    @patch("rag_engine.Chroma")
+    def test_metadata_filters_pushed_into_retrieval(self, mock_chroma, mock_embeddings, mock_chat_openai):
+        """Filter dan role diteruskan ke Chroma dan BM25; answer cache dipisah per filter."""
+        collection = mock_chroma.return_value._collection
+        collection.get.return_value = {"ids": ["c1"], "metadatas": [{"source_file": "pm.pdf"}]}
+        collection.query.return_value = {
+            "ids": [["c1"]], "documents": [["SMKP adalah sistem manajemen."]],
+            "metadatas": [[{"source_file": "pm.pdf", "page": "6", "jenis_dokumen": "D3"}]],
+            "distances": [[0.3]],
+        }
+        mock_embeddings.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_chat_openai.return_value.predict.return_value = "SMKP adalah ..."
+
+        engine = RAGEngine(use_in_memory=True, use_hybrid_search=False)
+        assert RAGEngine.build_where(None, "admin") is None
+        where = RAGEngine.build_where({"jenis_dokumen": ["D3", "D4"], "upload_by": None}, "user")
+        assert where == {"$and": [{"jenis_dokumen": {"$in": ["D3", "D4"]}},
+                                  {"jenis_dokumen": {"$ne": "Rahasia"}}]}
+
+        engine.query("Apa itu SMKP?", filters={"jenis_dokumen": ["D3", "D4"]}, role="user")
+        assert collection.query.call_args.kwargs["where"] == where
+
+        # Jawaban untuk filter lain (admin tanpa filter) tidak diambil dari cache
+        result = engine.query("Apa itu SMKP?", role="admin", debug=True)
+        assert collection.query.call_args.kwargs["where"] is None
+        assert not result["debug"].get("cache_hit")
+        assert "where" not in result["debug"]
+        assert mock_chat_openai.return_value.predict.call_count == 2
+
+        # Metadata dokumen disalin ke semua chunk file tanpa embedding ulang
+        collection.get.return_value = {"ids": ["c1", "c2"], "metadatas": [{"source_file": "pm.pdf"}] * 2}
+        assert engine.update_document_metadata("railway_docs/pm.pdf", {"jenis_dokumen": "Rahasia"}) == 2
+        update = collection.update.call_args.kwargs
+        assert update["ids"] == ["c1", "c2"]
+        assert update["metadatas"][0]["jenis_dokumen"] == "Rahasia"
+        collection.upsert.assert_not_called()
+
+        # Backfill metadata index lama berjalan sekali saat warm-up engine, bukan per sesi
+        docs_dir = os.path.dirname(__file__)
+        with patch.object(engine, "sync_document_metadata") as sync:
+            engine.warm_up(background=False, docs_directory=docs_dir)
+        sync.assert_called_once_with(docs_dir)
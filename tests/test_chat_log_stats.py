@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chat_log_stats import ChatLogAggregator
+
+
+def write_log(path, history):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f)
+
+
+class TestChatLogAggregator:
+
+    def test_only_changed_files_are_parsed(self, tmp_path):
+        """Unchanged log files are served from the cached aggregate."""
+        write_log(tmp_path / "admin_2025-04-22.json", [
+            {"role": "user", "content": "Apa itu SMKP?"},
+            {"role": "assistant", "content": "SMKP adalah ...", "feedback": "NOT_OK"},
+        ])
+        write_log(tmp_path / "budi_2025-04-22.json", [
+            {"role": "user", "content": "q"},
+            {"role": "assistant", "content": "a", "feedback": "OK"},
+        ])
+
+        aggregator = ChatLogAggregator(str(tmp_path))
+        assert aggregator.refresh() == 2
+        assert aggregator.refresh() == 0
+
+        totals = aggregator.totals()
+        assert totals["questions"] == 2 and totals["answers"] == 2
+        assert totals["feedback"] == {"OK": 1, "NOT_OK": 1}
+        assert totals["negatives"][0]["pertanyaan"] == "Apa itu SMKP?"
+
+        write_log(tmp_path / "budi_2025-04-22.json", [
+            {"role": "user", "content": "q"},
+            {"role": "assistant", "content": "a", "feedback": "OK"},
+            {"role": "user", "content": "q2"},
+        ])
+        os.remove(tmp_path / "admin_2025-04-22.json")
+
+        # State tersimpan di disk, jadi instance baru pun hanya membaca file yang berubah
+        reopened = ChatLogAggregator(str(tmp_path))
+        assert reopened.refresh() == 1
+        assert reopened.totals()["questions"] == 2
+        assert reopened.totals()["negatives"] == []
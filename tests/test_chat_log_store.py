@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import gzip
+from datetime import date, timedelta
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chat_log_store import ChatLogStore
+from chat_log_stats import ChatLogAggregator
+
+
+class TestChatLogStore:
+
+    def test_append_and_filter_messages(self, tmp_path):
+        """Messages and feedback are appended as events and merged on read."""
+        store = ChatLogStore(str(tmp_path), batch_size=100)
+        question = {"role": "user", "content": "Apa itu SMKP?", "timestamp": "2025-04-22T10:00:00", "msg_id": "q1"}
+        answer = {"role": "assistant", "content": "SMKP adalah ...", "timestamp": "2025-04-22T10:00:05", "msg_id": "a1"}
+        store.log_message(question, "budi", "s1")
+        store.log_message(answer, "budi", "s1")
+        store.log_message({"role": "user", "content": "lain", "msg_id": "q2"}, "siti", "s2")
+        answer["feedback"] = "NOT_OK"
+        store.log_feedback(answer, question["content"], "budi", "s1")
+        store.flush()
+
+        segment = store.segment_path(date.today().strftime("%Y-%m-%d"))
+        with open(segment, encoding="utf-8") as f:
+            assert len(f.readlines()) == 4
+
+        assert len(store.read_messages(username="budi")) == 2
+        negatives = store.read_messages(feedback="NOT_OK")
+        assert [m["msg_id"] for m in negatives] == ["a1"]
+        assert store.read_messages(end_date=date.today() - timedelta(days=1), include_legacy=False) == []
+
+    def test_old_segments_are_compressed_and_still_counted(self, tmp_path):
+        """Rotated segments are gzipped and the aggregator continues from its byte offset."""
+        store = ChatLogStore(str(tmp_path))
+        old_day = (date.today() - timedelta(days=3)).strftime("%Y-%m-%d")
+        with open(store.segment_path(old_day), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "message", "role": "user", "username": "budi", "content": "q"}) + "\n")
+
+        aggregator = ChatLogAggregator(str(tmp_path))
+        aggregator.refresh()
+        with open(store.segment_path(old_day), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "message", "role": "assistant", "username": "budi", "content": "a"}) + "\n")
+
+        assert store.compress_old_segments() == 1
+        assert not os.path.exists(store.segment_path(old_day))
+        with gzip.open(store.segment_path(old_day, compressed=True), "rt", encoding="utf-8") as f:
+            assert len(f.readlines()) == 2
+
+        aggregator.refresh()
+        totals = aggregator.totals()
+        assert totals["questions"] == 1 and totals["answers"] == 1
+        assert len(store.read_messages(start_date=old_day, end_date=old_day)) == 2
@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain.docstore.document import Document
+
+from context_packer import ContextPacker
+
+PAGE = " ".join(f"Kalimat ke-{i} tentang prasarana perkeretaapian." for i in range(60))
+
+
+def chunk(start, end, source="uu.pdf", page="2"):
+    return Document(page_content=PAGE[start:end], metadata={"source_file": source, "page": page, "start_index": start})
+
+
+class TestContextPacker:
+
+    def test_overlapping_chunks_merge_without_repeating_text(self):
+        """Overlapping chunks from one page become a single span; contained chunks are dropped."""
+        packer = ContextPacker(token_budget=10000)
+        first, second = chunk(0, 800), chunk(600, 1400)
+        context, used, report = packer.pack([(second, 0.1), (chunk(650, 750, source="lain.pdf"), 0.2), (first, 0.3)])
+
+        assert context.split("\n\n")[0] == PAGE[0:1400]
+        assert report["merged"] == 1
+        assert report["duplicates_dropped"] == 1
+        assert [doc.metadata["start_index"] for doc, _ in used] == [0, 600]
+
+    def test_budget_is_filled_in_rank_order(self):
+        """Best-ranked text comes first and the total stays within the budget."""
+        packer = ContextPacker(token_budget=120)
+        docs = [(chunk(0, 300, page="1"), 0.1), (chunk(2000, 2300, page="5", source="b.pdf"), 0.2),
+                (chunk(1000, 1600, page="9"), 0.3)]
+        context, used, report = packer.pack(docs)
+
+        assert report["tokens"] <= 120
+        assert context.startswith(PAGE[0:300])
+        assert report["truncated"] or report["dropped"]
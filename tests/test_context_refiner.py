@@ -0,0 +1,37 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from context_refiner import needs_refinement, refine_question_with_history
+
+HISTORY = [
+    {"role": "user", "content": "Apa itu SMKP?"},
+    {"role": "assistant", "content": "SMKP adalah Sistem Manajemen Keselamatan Perkeretaapian."},
+]
+
+
+class TestContextRefiner:
+
+    def test_needs_refinement_heuristic(self):
+        """First turns and standalone questions skip the refinement call."""
+        assert not needs_refinement([], "Apa sanksinya?")
+        assert not needs_refinement(HISTORY, "Apa isi Pasal 35 UU Nomor 23 Tahun 2007?")
+        assert needs_refinement(HISTORY, "Apa sanksinya?")
+        assert needs_refinement(HISTORY, "Siapa yang wajib menerapkan sistem tersebut?")
+        assert needs_refinement(HISTORY, "kalau untuk sarana perkeretaapian khusus?")
+        assert needs_refinement(HISTORY, "Jelaskan lebih lanjut")
+        assert needs_refinement(HISTORY, "Apa sanksi pelanggaran aturan itu?")
+        # "itu"/"ini" di tengah pertanyaan bukan rujukan
+        assert not needs_refinement(HISTORY, "Apa itu PPKA?")
+        assert not needs_refinement(HISTORY, "Apa itu perkeretaapian khusus?")
+        assert needs_refinement(HISTORY, "Apa itu?")
+
+    @patch("context_refiner._get_llm")
+    def test_standalone_question_makes_no_llm_call(self, mock_get_llm):
+        """A standalone question is returned unchanged without building a client."""
+        question = "Apa isi Pasal 35 UU Nomor 23 Tahun 2007?"
+        assert refine_question_with_history(HISTORY, question) == question
+        mock_get_llm.assert_not_called()
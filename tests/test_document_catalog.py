@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from document_catalog import DocumentCatalog, get_catalog
+
+
+def _write(folder, filename, meta=None):
+    path = os.path.join(folder, filename)
+    with open(path, "w") as f:
+        f.write("isi")
+    if meta is not None:
+        with open(path + ".meta.json", "w") as f:
+            json.dump(meta, f)
+    return path
+
+
+class TestDocumentCatalog:
+
+    def test_ranked_prefix_search_with_filter_and_pagination(self, tmp_path):
+        """Filename matches outrank description matches; jenis filter and paging use one query."""
+        docs = str(tmp_path / "docs")
+        os.makedirs(docs)
+        _write(docs, "SMKP_Pedoman.pdf", {"jenis_dokumen": "D3", "deskripsi": "Pedoman keselamatan"})
+        _write(docs, "PM_69_TAHUN_2018.pdf", {"jenis_dokumen": "Umum", "deskripsi": "Tentang SMKP perkeretaapian"})
+        _write(docs, "Sejarah.txt")
+        for i in range(25):
+            _write(docs, f"lampiran_{i:02d}.txt", {"jenis_dokumen": "D1", "deskripsi": "Lampiran"})
+        catalog = DocumentCatalog(str(tmp_path / "catalog.db"))
+        assert catalog.sync(docs)["updated"] == 28
+
+        hits, total = catalog.search("smkp")
+        assert total == 2
+        assert [hit["filename"] for hit in hits] == ["SMKP_Pedoman.pdf", "PM_69_TAHUN_2018.pdf"]
+        assert catalog.search("keselamat")[0][0]["filename"] == "SMKP_Pedoman.pdf"
+        assert catalog.search("tahun 2018")[1] == 1
+        assert catalog.search("smkp", jenis_dokumen="Umum")[1] == 1
+        # Tanpa kecocokan awalan kata, query dicari sebagai potongan teks seperti pencarian lama
+        assert [hit["filename"] for hit in catalog.search("ahun")[0]] == ["PM_69_TAHUN_2018.pdf"]
+        assert catalog.search("69_TA")[1] == 1
+        assert catalog.search("zzz")[1] == 0
+        assert catalog.search(extensions=(".pdf",))[1] == 2
+        # Tanpa .meta.json dianggap Umum, seperti di index chunk
+        assert catalog.search("sejarah")[0][0]["jenis_dokumen"] == "Umum"
+
+        page_two, total = catalog.search(jenis_dokumen="D1", limit=10, offset=10)
+        assert total == 25
+        assert [hit["filename"] for hit in page_two] == [f"lampiran_{i:02d}.txt" for i in range(10, 20)]
+
+    def test_sync_and_updates_keep_catalog_current(self, tmp_path):
+        """Metadata edits, deletes and files changed outside the app are reflected."""
+        docs = str(tmp_path / "docs")
+        os.makedirs(docs)
+        path = _write(docs, "a.pdf", {"jenis_dokumen": "Umum", "deskripsi": "lama"})
+        _write(docs, "b.pdf", {"jenis_dokumen": "Umum"})
+        catalog = DocumentCatalog(str(tmp_path / "catalog.db"))
+        catalog.sync(docs)
+
+        catalog.upsert(path, {"jenis_dokumen": "Rahasia", "deskripsi": "baru"})
+        assert catalog.search("baru")[0][0]["jenis_dokumen"] == "Rahasia"
+        assert catalog.search("lama")[1] == 0
+
+        assert catalog.remove("b.pdf")
+        assert catalog.count() == 1
+
+        # Perubahan langsung di folder terlihat setelah sync, file lain tidak dibaca ulang
+        _write(docs, "c.pdf", {"deskripsi": "dokumen baru"})
+        os.remove(path)
+        summary = catalog.sync(docs)
+        assert summary == {"updated": 2, "removed": 1, "unchanged": 0}
+        assert catalog.sync(docs) == {"updated": 0, "removed": 0, "unchanged": 2}
+        reopened = DocumentCatalog(str(tmp_path / "catalog.db"))
+        assert [hit["filename"] for hit in reopened.search()[0]] == ["b.pdf", "c.pdf"]
+
+    def test_get_catalog_is_shared(self, tmp_path):
+        """Both pages get the same catalog instance for one database file."""
+        docs = str(tmp_path / "docs")
+        os.makedirs(docs)
+        _write(docs, "a.pdf")
+        path = str(tmp_path / "catalog.db")
+        catalog = get_catalog(path, docs)
+        assert get_catalog(path, docs) is catalog
+        assert catalog.count() == 1
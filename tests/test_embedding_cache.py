@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain.embeddings.base import Embeddings
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Fake embeddings that record every text sent to the 'API'."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 1.0]
+
+
+class TestEmbeddingCache:
+
+    def test_repeated_texts_are_embedded_once(self):
+        """Texts already in the cache must not reach the underlying model."""
+        base = CountingEmbeddings()
+        cached = CachedEmbeddings(base, EmbeddingCache(":memory:"), model_name="fake")
+
+        first = cached.embed_documents(["rel kereta", "sinyal"])
+        second = cached.embed_documents(["rel  kereta\n", "sinyal", "wesel"])
+
+        assert base.calls == ["rel kereta", "sinyal", "wesel"]
+        assert second[:2] == first
+        assert cached.embed_query("sinyal") == first[1]
+        assert len(base.calls) == 3
+
+    def test_cache_is_keyed_by_model(self):
+        """The same text embedded by another model is a cache miss."""
+        cache = EmbeddingCache(":memory:")
+        base = CountingEmbeddings()
+        CachedEmbeddings(base, cache, model_name="model-a").embed_query("SMKP")
+        CachedEmbeddings(base, cache, model_name="model-b").embed_query("SMKP")
+        assert base.calls == ["SMKP", "SMKP"]
+
+    def test_eviction_keeps_size_bounded(self, tmp_path):
+        """The on-disk cache never grows beyond max_entries."""
+        cache = EmbeddingCache(str(tmp_path / "cache.db"), max_entries=3)
+        cached = CachedEmbeddings(CountingEmbeddings(), cache, model_name="fake")
+        cached.embed_documents([f"pasal {i}" for i in range(10)])
+        assert len(cache) == 3
@@ -0,0 +1,116 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flat_vectorstore import FlatCollection
+
+
+def _corpus(n=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"c{i}" for i in range(n)]
+    metadatas = [{"source_file": f"doc{i % 3}.pdf", "page": i % 7} for i in range(n)]
+    documents = [f"isi chunk {i}" for i in range(n)]
+    return ids, vectors, metadatas, documents
+
+
+class TestFlatCollection:
+
+    def test_exact_top_k_matches_brute_force_and_respects_tombstones(self):
+        """Top-k equals a brute-force L2 scan, with where filters and deleted rows excluded."""
+        ids, vectors, metadatas, documents = _corpus()
+        collection = FlatCollection(initial_capacity=64)
+        collection.upsert(ids=ids[:200], embeddings=vectors[:200], metadatas=metadatas[:200], documents=documents[:200])
+        collection.upsert(ids=ids[200:], embeddings=vectors[200:], metadatas=metadatas[200:], documents=documents[200:])
+        collection.delete(ids=["c5", "c17"])
+        assert collection.count() == 298
+
+        query = vectors[5] + 0.01
+        alive = [i for i in range(300) if i not in (5, 17) and metadatas[i]["source_file"] == "doc2.pdf"]
+        expected = sorted(alive, key=lambda i: float(np.sum((vectors[i] - query) ** 2)))[:5]
+
+        result = collection.query(query_embeddings=[query.tolist()], n_results=5, where={"source_file": "doc2.pdf"})
+        assert result["ids"][0] == [ids[i] for i in expected]
+        assert result["documents"][0][0] == documents[expected[0]]
+        assert result["distances"][0] == sorted(result["distances"][0])
+
+        page = collection.get(where={"page": {"$in": [0, 1]}}, limit=3, offset=1, include=["metadatas"])
+        assert len(page["ids"]) == 3 and page["documents"] is None
+        assert all(m["page"] in (0, 1) for m in page["metadatas"])
+
+    def test_persisted_index_is_shared_between_instances(self, tmp_path):
+        """A second instance on the same directory sees appends, deletes and compaction of the first."""
+        ids, vectors, metadatas, documents = _corpus(n=50)
+        writer = FlatCollection(str(tmp_path), initial_capacity=16, compact_min_tombstones=10)
+        writer.upsert(ids=ids[:20], embeddings=vectors[:20], metadatas=metadatas[:20], documents=documents[:20])
+        writer.modify(metadata={"embedding_model": "local:test"})
+
+        reader = FlatCollection(str(tmp_path))
+        assert reader.count() == 20
+        assert reader.metadata == {"embedding_model": "local:test"}
+
+        writer.upsert(ids=ids[20:], embeddings=vectors[20:], metadatas=metadatas[20:], documents=documents[20:])
+        writer.delete(where={"source_file": "doc0.pdf"})
+        writer.delete(ids=[f"c{i}" for i in range(30)])
+        assert reader.count() == writer.count()
+
+        result = reader.query(query_embeddings=[vectors[40].tolist()], n_results=1)
+        assert result["ids"][0] == ["c40"]
+        assert reader.get(ids=["c40"], include=["embeddings"])["embeddings"][0] == vectors[40].tolist()
+
+    @pytest.mark.parametrize("mode", ["float16", "int8", "pca"])
+    def test_compressed_search_is_rescored_to_exact_results(self, tmp_path, mode):
+        """Compressed codes shrink storage; rescored top-5 matches exact search with float32 distances."""
+        rng = np.random.default_rng(1)
+        # Seperti embedding teks: sebagian besar variansi ada di sedikit arah
+        basis = rng.normal(size=(12, 64))
+        vectors = (rng.normal(size=(400, 12)) @ basis + 0.05 * rng.normal(size=(400, 64))).astype(np.float32)
+        ids = [f"c{i}" for i in range(400)]
+
+        exact = FlatCollection()
+        exact.upsert(ids=ids, embeddings=vectors)
+        compressed = FlatCollection(str(tmp_path), compression=mode, pca_components=16, min_fit_rows=100)
+        compressed.upsert(ids=ids[:50], embeddings=vectors[:50])
+        compressed.upsert(ids=ids[50:], embeddings=vectors[50:])
+        assert compressed._codes[0].nbytes < vectors[0].nbytes
+
+        # Dibuka ulang: kode dan codec dimuat dari disk, tanpa pelatihan ulang
+        reopened = FlatCollection(str(tmp_path), compression=mode, pca_components=16)
+        assert reopened._codes is not None
+
+        queries = (vectors[:20] + 0.05).tolist()
+        truth = exact.query(query_embeddings=queries, n_results=5, include=["distances"])
+        found = reopened.query(query_embeddings=queries, n_results=5, include=["distances"])
+        recall = np.mean([len(set(t) & set(f)) / 5 for t, f in zip(truth["ids"], found["ids"])])
+        assert recall >= 0.95
+        assert [f[0] for f in found["ids"]] == [t[0] for t in truth["ids"]]
+        assert np.allclose([d[0] for d in found["distances"]], [d[0] for d in truth["distances"]], atol=1e-3)
+
+    def test_failed_compaction_leaves_index_intact(self, tmp_path):
+        """A crash while replacing files keeps the old matrix, codes and row numbering usable."""
+        ids, vectors, metadatas, documents = _corpus(n=120)
+        collection = FlatCollection(str(tmp_path), compression="int8", min_fit_rows=50)
+        collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=documents)
+        collection.delete(ids=[f"c{i}" for i in range(0, 120, 2)])
+
+        with patch("flat_vectorstore.os.replace", side_effect=OSError("disk penuh")):
+            with pytest.raises(OSError):
+                collection.compact()
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+        for index in (collection, FlatCollection(str(tmp_path), compression="int8")):
+            assert index.count() == 60
+            result = index.query(query_embeddings=[vectors[41].tolist()], n_results=1)
+            assert result["ids"][0] == ["c41"] and result["documents"][0] == [documents[41]]
+
+        # Pemadatan yang berhasil mempertahankan kode tanpa melatih ulang codec
+        assert collection.compact() == 60
+        reopened = FlatCollection(str(tmp_path), compression="int8")
+        assert reopened._codes is not None and reopened._n_rows == 60
+        assert reopened.query(query_embeddings=[vectors[41].tolist()], n_results=1)["ids"][0] == ["c41"]
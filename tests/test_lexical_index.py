@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lexical_index import LexicalIndex, tokenize
+
+
+class TestLexicalIndex:
+
+    def test_tokenize_legal_references(self):
+        """Legal references are normalized into compound tokens."""
+        tokens = tokenize("Pasal 35 Undang-Undang Nomor 23 Tahun 2007 tentang Perkeretaapian")
+        assert "pasal_35" in tokens
+        assert "uu_23" in tokens
+        assert "tahun_2007" in tokens
+        assert "tentang" not in tokens
+        assert tokenize("UU 23") == ["uu_23", "uu", "23"]
+
+    def test_exact_reference_ranks_first(self):
+        """BM25 ranks the chunk containing the exact article reference first."""
+        index = LexicalIndex()
+        index.add(
+            ["a", "b", "c"],
+            [
+                "Pasal 34 mengatur sarana perkeretaapian.",
+                "Pasal 35 mengatur prasarana perkeretaapian umum.",
+                "SMKP adalah Sistem Manajemen Keselamatan Perkeretaapian.",
+            ],
+            [{"source_file": "uu.pdf"}, {"source_file": "uu.pdf"}, {"source_file": "pm.pdf"}],
+        )
+
+        assert index.search("Pasal 35 UU 23", k=1)[0][0] == "b"
+        assert index.search("apa itu SMKP?", k=1)[0][0] == "c"
+
+    def test_where_filter_and_metadata_update(self):
+        """where is applied before the top-k cut and sees updated document metadata."""
+        index = LexicalIndex()
+        index.add(
+            ["a", "b"],
+            ["Pasal 35 mengatur prasarana.", "Pasal 35 mengatur prasarana perkeretaapian umum."],
+            [{"source_file": "uu.pdf", "jenis_dokumen": "Umum"}, {"source_file": "pm.pdf"}],
+        )
+
+        where = {"jenis_dokumen": {"$ne": "Rahasia"}}
+        assert [hit[0] for hit in index.search("Pasal 35", k=1, where=where)] == ["a"]
+        index.update_metadata(["a"], {"jenis_dokumen": "Rahasia"})
+        index.update_metadata(["b"], {"jenis_dokumen": "Umum"})
+        assert [hit[0] for hit in index.search("Pasal 35", k=1, where=where)] == ["b"]
+
+        # Metadata kandidat diambil per batch, bukan satu query per chunk
+        index.add([f"r{i}" for i in range(300)], ["Pasal 35 prasarana"] * 300,
+                  [{"source_file": "rahasia.pdf", "jenis_dokumen": "Rahasia"}] * 300)
+        statements = []
+        index._conn.set_trace_callback(statements.append)
+        assert [hit[0] for hit in index.search("Pasal 35 prasarana", k=2, where=where)] == ["b"]
+        assert sum("FROM chunks WHERE id IN" in sql for sql in statements) <= 4
+
+    def test_delete_source_and_persistence(self, tmp_path):
+        """Deleted sources disappear and the index survives reopening."""
+        path = str(tmp_path / "lexical.db")
+        index = LexicalIndex(path)
+        index.add(["a", "b"], ["wesel rel", "wesel sinyal"], [{"source_file": "x.pdf"}, {"source_file": "y.pdf"}])
+        index.delete_source("x.pdf")
+
+        reopened = LexicalIndex(path)
+        assert len(reopened) == 1
+        assert [hit[0] for hit in reopened.search("wesel")] == ["b"]
@@ -0,0 +1,34 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from near_duplicates import find_near_duplicates
+
+PREAMBLE = (
+    "Menimbang bahwa untuk melaksanakan ketentuan Pasal 35 Undang-Undang Nomor 23 Tahun 2007 "
+    "tentang Perkeretaapian perlu menetapkan Peraturan Menteri Perhubungan tentang Standar "
+    "Keselamatan Perkeretaapian yang berlaku bagi penyelenggara prasarana dan sarana perkeretaapian umum "
+    "dan khusus di seluruh wilayah Negara Kesatuan Republik Indonesia. Mengingat Undang-Undang Nomor 23 "
+    "Tahun 2007 tentang Perkeretaapian (Lembaran Negara Republik Indonesia Tahun 2007 Nomor 65, Tambahan "
+    "Lembaran Negara Republik Indonesia Nomor 4722) dan Peraturan Pemerintah Nomor 56 Tahun 2009 tentang "
+    "Penyelenggaraan Perkeretaapian sebagaimana telah diubah terakhir dengan Peraturan Pemerintah Nomor 6 Tahun 2017."
+)
+
+
+class TestNearDuplicates:
+
+    def test_boilerplate_variants_are_grouped(self):
+        """Near-identical preambles map to the first occurrence; distinct text is kept."""
+        texts = [
+            PREAMBLE,
+            "Sinyal masuk harus dipasang paling sedikit 500 meter sebelum wesel pertama di stasiun.",
+            PREAMBLE.replace("Nomor 23", "No. 23") + " ",
+            PREAMBLE,
+        ]
+        assert find_near_duplicates(texts, threshold=0.85) == {2: 0, 3: 0}
+
+    def test_empty_and_short_texts(self):
+        """Texts without tokens are never treated as duplicates."""
+        assert find_near_duplicates(["", "  ", "wesel"], threshold=0.8) == {}
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain.docstore.document import Document
+
+from reranker import CrossEncoderReranker
+
+
+class KeywordModel:
+    """Cross-encoder palsu: skor = jumlah kata pertanyaan yang muncul di teks."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32):
+        self.calls.append(len(pairs))
+        return [sum(word in text.lower() for word in query.lower().split()) for query, text in pairs]
+
+
+class TestReranker:
+
+    def test_rerank_orders_filters_and_caches(self):
+        """Candidates are re-ordered by cross-encoder score, thresholded, and scores are cached."""
+        model = KeywordModel()
+        reranker = CrossEncoderReranker(model=model, batch_size=8)
+        candidates = [
+            (Document(page_content="Sejarah kereta api di Jawa"), 0.1),
+            (Document(page_content="Sanksi pidana pelanggaran sinyal"), 0.2),
+            (Document(page_content="Sanksi administratif pelanggaran sinyal kereta"), 0.3),
+        ]
+
+        ranked = reranker.rerank("sanksi pelanggaran sinyal kereta", candidates, top_n=2, threshold=2)
+        assert [doc.page_content for doc, _, _ in ranked] == [
+            "Sanksi administratif pelanggaran sinyal kereta",
+            "Sanksi pidana pelanggaran sinyal",
+        ]
+        assert ranked[0][1] == 0.3
+
+        reranker.rerank("sanksi pelanggaran sinyal kereta", candidates, top_n=2)
+        assert model.calls == [3]
@@ -0,0 +1,156 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+COMPRESSION_MODES = ("float16", "int8", "pca")
+
+
+class VectorCodec:
+    """Kompresi vektor untuk pencarian kasar; hasil akhir selalu diskor ulang dengan float32.
+
+    Produk titik x.q didekati sebagai codes @ q_proj + bias, sehingga pencarian atas
+    matriks kode tetap satu perkalian matriks per blok.
+    """
+
+    name = ""
+    dtype = np.float32
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def fitted(self) -> bool:
+        return True
+
+    @property
+    def code_dim(self) -> int:
+        return self.dim
+
+    def fit(self, vectors: np.ndarray) -> None:
+        pass
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def query_terms(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Kembalikan (q_proj [m, code_dim], bias [m]) untuk banyak query sekaligus."""
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        pass
+
+
+class Float16Codec(VectorCodec):
+    """Setengah presisi: ukuran separuh, tanpa pelatihan."""
+
+    name = "float16"
+    dtype = np.float16
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def query_terms(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return queries, np.zeros(len(queries), dtype=np.float32)
+
+
+class Int8Codec(VectorCodec):
+    """Kuantisasi skalar per dimensi ke int8 (seperempat ukuran float32).
+
+    Rentang min/max tiap dimensi dipelajari dari data; nilai di luar rentang dipotong.
+    """
+
+    name = "int8"
+    dtype = np.int8
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.scale is not None
+
+    def fit(self, vectors: np.ndarray) -> None:
+        low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        self.offset = low
+        self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.round((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def query_terms(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # x ~ (c + 128) * scale + offset  =>  x.q ~ c.(scale*q) + 128*sum(scale*q) + offset.q
+        projected = queries * self.scale
+        bias = 128.0 * projected.sum(axis=1) + queries @ self.offset
+        return projected, bias
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"offset": self.offset, "scale": self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.offset = state["offset"]
+        self.scale = state["scale"]
+
+
+class PCACodec(VectorCodec):
+    """Proyeksi PCA ke `components` dimensi (mis. 1536 -> 256), disimpan float16."""
+
+    name = "pca"
+    dtype = np.float16
+
+    def __init__(self, dim: int, components: int = 256, max_fit_rows: int = 20000):
+        super().__init__(dim)
+        self.components = min(components, dim)
+        self.max_fit_rows = max_fit_rows
+        self.mean: Optional[np.ndarray] = None
+        self.basis: Optional[np.ndarray] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.basis is not None
+
+    @property
+    def code_dim(self) -> int:
+        return self.components
+
+    def fit(self, vectors: np.ndarray) -> None:
+        if len(vectors) > self.max_fit_rows:
+            rng = np.random.default_rng(0)
+            vectors = vectors[np.sort(rng.choice(len(vectors), self.max_fit_rows, replace=False))]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        basis = np.zeros((self.dim, self.components), dtype=np.float32)
+        basis[:, :min(self.components, vt.shape[0])] = vt[:self.components].T
+        self.basis = basis
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return ((np.asarray(vectors, dtype=np.float32) - self.mean) @ self.basis).astype(np.float16)
+
+    def query_terms(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # x ~ mean + basis @ z  =>  x.q ~ z.(basis^T q) + mean.q
+        return queries @ self.basis, queries @ self.mean
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"mean": self.mean, "basis": self.basis}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.mean = state["mean"]
+        self.basis = state["basis"]
+        self.components = self.basis.shape[1]
+
+
+def make_codec(mode: str, dim: int, pca_components: int = 256) -> VectorCodec:
+    if mode == "float16":
+        return Float16Codec(dim)
+    if mode == "int8":
+        return Int8Codec(dim)
+    if mode == "pca":
+        return PCACodec(dim, components=pca_components)
+    raise ValueError(f"Mode kompresi tidak dikenal: {mode!r} (pilih salah satu dari {COMPRESSION_MODES})")